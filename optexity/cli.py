@@ -5,7 +5,6 @@ import subprocess
 import sys
 
 from dotenv import load_dotenv
-from uvicorn import run
 
 logger = logging.getLogger(__name__)
 
@@ -33,9 +32,16 @@ def install_browsers() -> None:
 
 
 def run_inference(args: argparse.Namespace) -> None:
+    from uvicorn import run
+
     from optexity.inference.child_process import get_app_with_endpoints
 
-    app = get_app_with_endpoints(is_aws=args.is_aws, child_id=args.child_process_id)
+    app = get_app_with_endpoints(
+        is_aws=args.is_aws,
+        child_id=args.child_process_id,
+        max_concurrent=args.max_concurrent_tasks,
+        pool_size=args.browser_pool_size,
+    )
     run(
         app,
         host=args.host,
@@ -43,6 +49,18 @@ def run_inference(args: argparse.Namespace) -> None:
     )
 
 
+def run_startup_profile(args: argparse.Namespace) -> None:
+    from optexity.utils.startup_profile import run_startup_profile
+
+    run_startup_profile(include_llm=args.include_llm, top=args.top)
+
+
+def run_cpu_offload_benchmark(args: argparse.Namespace) -> None:
+    from optexity.utils.cpu_offload_benchmark import run_cpu_offload_benchmark
+
+    run_cpu_offload_benchmark(workers=args.workers, files=args.files)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(prog="optexity")
     subparsers = parser.add_subparsers(dest="command", required=True)
@@ -71,9 +89,52 @@ def main() -> None:
     inference_cmd.add_argument(
         "--is_aws", "--is-aws", action="store_true", default=False
     )
+    inference_cmd.add_argument(
+        "--max_concurrent_tasks", "--max-concurrent-tasks", type=int, default=None
+    )
+    inference_cmd.add_argument(
+        "--browser_pool_size", "--browser-pool-size", type=int, default=None
+    )
 
     inference_cmd.set_defaults(func=run_inference)
 
+    # ---------------------------
+    # startup-profile
+    # ---------------------------
+    profile_cmd = subparsers.add_parser(
+        "startup_profile",
+        help="Report import and init time of the inference server",
+        aliases=["startup-profile"],
+    )
+    profile_cmd.add_argument(
+        "--include_llm",
+        "--include-llm",
+        action="store_true",
+        default=False,
+        help="Also time LLM model and agent construction (needs network)",
+    )
+    profile_cmd.add_argument(
+        "--top", type=int, default=15, help="Number of slowest modules to list"
+    )
+    profile_cmd.set_defaults(func=run_startup_profile)
+
+    # ---------------------------
+    # cpu-offload-benchmark
+    # ---------------------------
+    offload_cmd = subparsers.add_parser(
+        "cpu_offload_benchmark",
+        help="Compare event loop lag of CPU-heavy work inline, on threads and "
+        "in the CPU offload pool",
+        aliases=["cpu-offload-benchmark"],
+    )
+    offload_cmd.add_argument(
+        "--workers", type=int, default=2, help="CPU offload pool processes"
+    )
+    offload_cmd.add_argument(
+        "--files", type=int, default=20, help="Step directories in the trajectory"
+    )
+    offload_cmd.set_defaults(func=run_cpu_offload_benchmark)
+
     args = parser.parse_args()
     args.func(args)
 
@@ -5,6 +5,7 @@ from pydantic import BaseModel
 
 from optexity.inference.agents.error_handler.prompt import system_prompt
 from optexity.inference.models import GeminiModels, get_llm_model
+from optexity.schema.screenshot import Screenshot
 from optexity.schema.token_usage import TokenUsage
 
 logger = logging.getLogger(__name__)
@@ -19,8 +20,8 @@ class ErrorHandlerAgent:
     def __init__(self):
         self.model = get_llm_model(GeminiModels.GEMINI_2_5_FLASH, True)
 
-    def classify_error(
-        self, command: str, screenshot: str
+    async def classify_error(
+        self, command: str, screenshot: Screenshot | None
     ) -> tuple[str, ErrorHandlerOutput, TokenUsage]:
 
         final_prompt = f"""
@@ -29,11 +30,13 @@ class ErrorHandlerAgent:
         [/INPUT]
         """
 
-        response, token_usage = self.model.get_model_response_with_structured_output(
-            prompt=final_prompt,
-            response_schema=ErrorHandlerOutput,
-            screenshot=screenshot,
-            system_instruction=system_prompt,
+        response, token_usage = (
+            await self.model.aget_model_response_with_structured_output(
+                prompt=final_prompt,
+                response_schema=ErrorHandlerOutput,
+                screenshot=screenshot,
+                system_instruction=system_prompt,
+            )
         )
 
         return final_prompt, response, token_usage
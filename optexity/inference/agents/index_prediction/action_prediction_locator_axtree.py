@@ -5,6 +5,7 @@ from pydantic import BaseModel, Field
 
 from optexity.inference.agents.index_prediction.prompt import system_prompt
 from optexity.inference.models import GeminiModels, get_llm_model
+from optexity.schema.screenshot import Screenshot
 from optexity.schema.token_usage import TokenUsage
 
 logger = logging.getLogger(__name__)
@@ -20,8 +21,8 @@ class ActionPredictionLocatorAxtree:
     def __init__(self):
         self.model = get_llm_model(GeminiModels.GEMINI_2_5_FLASH, True)
 
-    def predict_action(
-        self, goal: str, axtree: str, screenshot: Optional[str] = None
+    async def predict_action(
+        self, goal: str, axtree: str, screenshot: Optional[Screenshot] = None
     ) -> tuple[str, IndexPredictionOutput, TokenUsage]:
 
         final_prompt = f"""
@@ -35,11 +36,13 @@ class ActionPredictionLocatorAxtree:
         [/INPUT]
         """
 
-        response, token_usage = self.model.get_model_response_with_structured_output(
-            prompt=final_prompt,
-            response_schema=IndexPredictionOutput,
-            screenshot=screenshot,
-            system_instruction=system_prompt,
+        response, token_usage = (
+            await self.model.aget_model_response_with_structured_output(
+                prompt=final_prompt,
+                response_schema=IndexPredictionOutput,
+                screenshot=screenshot,
+                system_instruction=system_prompt,
+            )
         )
 
         return final_prompt, response, token_usage
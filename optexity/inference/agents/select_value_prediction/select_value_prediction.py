@@ -18,7 +18,7 @@ class SelectValuePredictionAgent:
     def __init__(self):
         self.model = get_llm_model(GeminiModels.GEMINI_2_5_FLASH, True)
 
-    def predict_select_value(
+    async def predict_select_value(
         self, options: list[dict[str, str]], patterns: list[str]
     ) -> tuple[str, SelectValuePredictionOutput, TokenUsage]:
 
@@ -30,10 +30,12 @@ class SelectValuePredictionAgent:
         [{', '.join(patterns)}]
         """
 
-        response, token_usage = self.model.get_model_response_with_structured_output(
-            prompt=final_prompt,
-            response_schema=SelectValuePredictionOutput,
-            system_instruction=system_prompt,
+        response, token_usage = (
+            await self.model.aget_model_response_with_structured_output(
+                prompt=final_prompt,
+                response_schema=SelectValuePredictionOutput,
+                system_instruction=system_prompt,
+            )
         )
 
         return final_prompt, response, token_usage
@@ -21,7 +21,7 @@ class TwoFAExtraction:
     def __init__(self):
         self.model = get_llm_model(GeminiModels.GEMINI_2_5_FLASH, True)
 
-    def extract_code(
+    async def extract_code(
         self, instructions: str | None, messages: list[Message]
     ) -> tuple[str, TwoFAExtractionOutput, TokenUsage]:
 
@@ -39,9 +39,11 @@ class TwoFAExtraction:
         [/MESSAGES]
         """
 
-        response, token_usage = self.model.get_model_response_with_structured_output(
-            prompt=final_prompt,
-            response_schema=TwoFAExtractionOutput,
-            system_instruction=system_prompt,
+        response, token_usage = (
+            await self.model.aget_model_response_with_structured_output(
+                prompt=final_prompt,
+                response_schema=TwoFAExtractionOutput,
+                system_instruction=system_prompt,
+            )
         )
         return final_prompt, response, token_usage
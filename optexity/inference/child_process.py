@@ -1,5 +1,6 @@
 import argparse
 import asyncio
+import contextvars
 import json
 import logging
 import os
@@ -17,14 +18,22 @@ import psutil
 from fastapi import Body, FastAPI
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from uvicorn import run
 
 from optexity.inference.core.logging import (
     complete_task_in_server,
+    delete_download_staging,
     delete_local_data,
+    release_task_logging,
     save_trajectory_in_server,
 )
 from optexity.inference.infra.actual_browser import ActualBrowser
+from optexity.inference.infra.browser_pool import BrowserPool
+from optexity.inference.infra.control_plane import (
+    close_control_plane_client,
+    control_plane_metrics,
+    get_control_plane_client,
+)
+from optexity.schema.automation_check import check_automation
 from optexity.schema.inference import InferenceRequest
 from optexity.schema.memory import SystemInfo
 from optexity.schema.task import Task
@@ -34,17 +43,166 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def check_task_automation(task: Task) -> list[str]:
+    """Statically check the task's automation before it takes a browser slot.
+
+    Logs warnings and returns the errors.
+    """
+    errors = []
+    for issue in check_automation(
+        task.automation, task.input_parameters, task.secure_parameters
+    ):
+        if issue.severity == "error":
+            errors.append(str(issue))
+        else:
+            logger.warning(f"Task {task.task_id}: {issue}")
+    return errors
+
+
 class ChildProcessIdRequest(BaseModel):
     new_child_process_id: str
     new_unique_child_arn: str
 
 
+class PersistentWorker:
+    """Client for a long-lived `worker.py --serve` process.
+
+    The worker imports the inference stack and builds the LLM model once, then
+    forks a fresh process per task. Each forked task leads its own process
+    group, so a timed out task is still killed with os.killpg.
+    """
+
+    def __init__(self):
+        self.proc: asyncio.subprocess.Process | None = None
+        self._start_lock = asyncio.Lock()
+
+    def is_alive(self) -> bool:
+        return self.proc is not None and self.proc.returncode is None
+
+    async def ensure_started(self):
+        async with self._start_lock:
+            if self.is_alive():
+                return
+            worker_path = pathlib.Path(__file__).parent / "worker.py"
+            self.proc = await asyncio.create_subprocess_exec(
+                sys.executable,
+                str(worker_path),
+                "--serve",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+            )
+            await self._read_event("ready")
+            logger.info(f"Persistent worker {self.proc.pid} is ready")
+
+    async def _read_event(self, event: str) -> dict:
+        assert self.proc is not None and self.proc.stdout is not None
+        line = await self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError("Persistent worker exited unexpectedly")
+        message = json.loads(line)
+        if message.get("event") != event:
+            raise RuntimeError(f"Expected {event} from persistent worker: {message}")
+        return message
+
+    async def submit(
+        self, task: Task, unique_child_arn: str, child_process_id: int, debug_port: int
+    ) -> int:
+        """Start a task in a forked process and return its pid / process group."""
+        await self.ensure_started()
+        assert self.proc is not None and self.proc.stdin is not None
+        request = {
+            "task": task.model_dump_json(),
+            "unique_child_arn": unique_child_arn,
+            "child_process_id": child_process_id,
+            "debug_port": debug_port,
+        }
+        self.proc.stdin.write((json.dumps(request) + "\n").encode())
+        await self.proc.stdin.drain()
+        message = await self._read_event("started")
+        return message["pid"]
+
+    async def wait(self) -> int:
+        message = await self._read_event("finished")
+        return message["returncode"]
+
+    async def stop(self):
+        if self.is_alive():
+            assert self.proc is not None and self.proc.stdin is not None
+            self.proc.stdin.close()
+            try:
+                await asyncio.wait_for(self.proc.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                self.proc.kill()
+                await self.proc.wait()
+        self.proc = None
+
+
+class TaskSlot:
+    """One concurrent task lane inside this child process.
+
+    Each slot owns its own actual browser (and therefore its own CDP port and
+    user data dir) so tasks running side by side never share browser state.
+    """
+
+    def __init__(self, slot_id: int):
+        self.slot_id = slot_id
+        self.actual_browser: ActualBrowser | None = None
+        self.worker = PersistentWorker()
+        self.task_running = False
+        self.current_task_id: str | None = None
+        self.last_task_start_time: datetime | None = None
+
+    @property
+    def debug_port(self) -> int:
+        return first_debug_port() + self.slot_id
+
+    def is_stuck(self) -> bool:
+        return (
+            self.task_running
+            and self.last_task_start_time is not None
+            and datetime.now() - self.last_task_start_time > timedelta(minutes=15)
+        )
+
+    def state(self) -> dict:
+        return {
+            "slot_id": self.slot_id,
+            "task_running": self.task_running,
+            "task_id": self.current_task_id,
+            "debug_port": (
+                self.actual_browser.port
+                if self.actual_browser is not None
+                else self.debug_port
+            ),
+            "last_task_start_time": (
+                self.last_task_start_time.isoformat()
+                if self.last_task_start_time
+                else None
+            ),
+        }
+
+
+class _CurrentTaskLogFilter(logging.Filter):
+    """Only lets through records emitted while running the given task."""
+
+    def __init__(self, task_id: str):
+        super().__init__()
+        self.task_id = task_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return _current_task_id.get() == self.task_id
+
+
 child_process_id = -1
 unique_child_arn: str = str(uuid.uuid4())
-task_running = False
-last_task_start_time = None
+max_concurrent_tasks: int = settings.MAX_CONCURRENT_TASKS
+browser_pool_size: int = settings.BROWSER_POOL_SIZE
 task_queue: asyncio.Queue[Task] = asyncio.Queue()
-_global_actual_browser: ActualBrowser | None = None
+task_slots: list[TaskSlot] = []
+browser_pool: BrowserPool | None = None
+_admission_lock = asyncio.Lock()
+_current_task_id: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "current_task_id", default=None
+)
 
 
 def log_system_info(comment: str):
@@ -77,17 +235,58 @@ def log_system_info(comment: str):
     logger.info("=" * 100 + "\n")
 
 
-async def setup_browser(task: Task, unique_child_arn: str, child_process_id: int):
-    global _global_actual_browser
-    system_info = SystemInfo()
+def ports_per_child() -> int:
+    # Every slot has its own port for cold starts. The pool gets one port per
+    # warm browser plus one per slot, since each slot may be holding a pooled
+    # browser while the pool launches its replacement.
+    if browser_pool_size <= 0:
+        return max_concurrent_tasks
+    return 2 * max_concurrent_tasks + browser_pool_size
+
+
+def first_debug_port() -> int:
+    return settings.BROWSER_DEBUG_PORT_OFFSET + child_process_id * ports_per_child()
+
+
+def browser_pool_ports() -> list[int]:
+    start = first_debug_port() + max_concurrent_tasks
+    return list(range(start, first_debug_port() + ports_per_child()))
+
+
+def memory_used_fraction() -> float:
+    used, total = SystemInfo.get_effective_memory_mb()
+    return used / total
+
+
+async def wait_for_admission(slot: TaskSlot):
+    """Hold a task back until the container has memory for another browser.
+
+    A slot is always admitted when no other slot is busy, so a single task can
+    never be starved by the threshold.
+    """
+    while True:
+        other_tasks_running = any(s.task_running for s in task_slots if s is not slot)
+        if not other_tasks_running:
+            return
+        fraction = memory_used_fraction()
+        if fraction < settings.TASK_ADMISSION_MAX_MEMORY_FRACTION:
+            return
+        logger.info(
+            f"Slot {slot.slot_id} waiting for memory before starting task "
+            f"({fraction:.2f} used)"
+        )
+        await asyncio.sleep(5)
+
+
+async def setup_browser(task: Task, slot: TaskSlot, unique_child_arn: str):
     memory_exceeded = (
-        system_info.total_system_memory_used / system_info.total_system_memory > 0.6
+        memory_used_fraction() > settings.TASK_ADMISSION_MAX_MEMORY_FRACTION
     )
 
-    if _global_actual_browser is not None:
+    if slot.actual_browser is not None:
 
         restart_browser = False
-        if not await _global_actual_browser.check_browser_alive():
+        if not await slot.actual_browser.check_browser_alive():
             logger.info("CDP is not alive, restarting browser")
             restart_browser = True
 
@@ -100,36 +299,58 @@ async def setup_browser(task: Task, unique_child_arn: str, child_process_id: int
             restart_browser = True
 
         if restart_browser:
-            await _global_actual_browser.stop(graceful=True)
-            _global_actual_browser = None
+            await stop_slot_browser(slot)
+
+    if (
+        slot.actual_browser is None
+        and browser_pool is not None
+        and not task.is_dedicated
+    ):
+        slot.actual_browser = await browser_pool.acquire(
+            task.automation.browser_channel
+        )
 
-    if _global_actual_browser is None:
-        logger.info("Starting new actual browser")
-        _global_actual_browser = ActualBrowser(
+    if slot.actual_browser is None:
+        logger.info(f"Starting new actual browser for slot {slot.slot_id}")
+        slot.actual_browser = ActualBrowser(
             channel=task.automation.browser_channel,
             unique_child_arn=unique_child_arn,
-            port=9222 + child_process_id,
+            port=slot.debug_port,
             headless=False,
             is_dedicated=task.is_dedicated,
+            slot_id=slot.slot_id,
         )
         try:
-            await _global_actual_browser.start()
+            await slot.actual_browser.start()
         except Exception:
             logger.exception(
                 "Failed to start actual browser; resetting browser instance"
             )
-            _global_actual_browser = None
+            slot.actual_browser = None
             raise
 
 
+async def stop_slot_browser(slot: TaskSlot):
+    if slot.actual_browser is None:
+        return
+    browser = slot.actual_browser
+    slot.actual_browser = None
+    try:
+        await browser.stop(graceful=True)
+    finally:
+        if browser_pool is not None:
+            browser_pool.release(browser)
+            browser_pool.schedule_refill()
+
+
 async def run_automation_in_process(
-    task: Task, unique_child_arn: str, child_process_id: int
+    task: Task, slot: TaskSlot, unique_child_arn: str, child_process_id: int
 ):
 
-    global _global_actual_browser
-
+    _current_task_id.set(task.task_id)
     file_handler = logging.FileHandler(str(task.log_file_path))
     file_handler.setLevel(logging.DEBUG)
+    file_handler.addFilter(_CurrentTaskLogFilter(task.task_id))
 
     current_module = __name__.split(".")[0]  # top-level module/package
     logging.getLogger(current_module).addHandler(file_handler)
@@ -138,35 +359,46 @@ async def run_automation_in_process(
     )
     log_system_info("Memory info before starting browser")
 
-    await setup_browser(task, unique_child_arn, child_process_id)
+    await setup_browser(task, slot, unique_child_arn)
 
     log_system_info("Memory info after starting browser")
 
     logger.debug("Running automation in process")
-    worker_path = pathlib.Path(__file__).parent / "worker.py"
-
-    proc = await asyncio.create_subprocess_exec(
-        sys.executable,
-        worker_path,
-        task.model_dump_json(),
-        unique_child_arn,
-        str(child_process_id),
-        preexec_fn=os.setsid,
-    )
+    debug_port = slot.actual_browser.port
+
+    if settings.USE_PERSISTENT_WORKER:
+        pid = await slot.worker.submit(
+            task, unique_child_arn, child_process_id, debug_port
+        )
+        wait_for_exit = slot.worker.wait
+    else:
+        worker_path = pathlib.Path(__file__).parent / "worker.py"
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable,
+            worker_path,
+            task.model_dump_json(),
+            unique_child_arn,
+            str(child_process_id),
+            str(debug_port),
+            preexec_fn=os.setsid,
+        )
+        pid = proc.pid
+        wait_for_exit = proc.wait
 
     try:
         logger.debug("Waiting for automation to finish")
         # returncode = proc.wait(timeout=600)  # seconds
         returncode = await asyncio.wait_for(
-            proc.wait(), timeout=task.max_timeout_in_minutes * 60
+            wait_for_exit(), timeout=task.max_timeout_in_minutes * 60
         )
         logger.debug("Automation finished in process")
         return returncode
-    except subprocess.TimeoutExpired:
+    except (asyncio.TimeoutError, subprocess.TimeoutExpired):
         logger.info(
             f"Automation timed out after {task.max_timeout_in_minutes} minutes in process"
         )
-        os.killpg(proc.pid, signal.SIGKILL)
+        os.killpg(pid, signal.SIGKILL)
+        await wait_for_exit()
         task.status = "killed"
         task.error = f"Automation timed out after {task.max_timeout_in_minutes} minutes in process"
         task.completed_at = datetime.now(timezone.utc)
@@ -178,11 +410,10 @@ async def run_automation_in_process(
         )
         log_system_info("Memory info after automation finished in process")
 
-        if _global_actual_browser is not None and not task.is_dedicated:
+        if slot.actual_browser is not None and not task.is_dedicated:
             logger.debug("Stopping actual browser as not dedicated")
             try:
-                await _global_actual_browser.stop(graceful=True)
-                _global_actual_browser = None
+                await stop_slot_browser(slot)
             except Exception as e:
                 logger.error(f"Error stopping actual browser: {e}")
 
@@ -193,31 +424,40 @@ async def run_automation_in_process(
         logging.getLogger(current_module).removeHandler(file_handler)
 
         await save_trajectory_in_server(task)
+        await release_task_logging(task)
+        # A killed worker never reaches its own cleanup of the staging
+        # directory.
+        await delete_download_staging(task, debug_port)
         await delete_local_data(task)
 
 
-async def task_processor():
-    """Background worker that processes tasks from the queue one at a time."""
-    global task_running
-    global last_task_start_time
-    logger.info("Task processor started")
+async def task_processor(slot: TaskSlot):
+    """Background worker that processes tasks from the queue one at a time for a slot."""
+    logger.info(f"Task processor started for slot {slot.slot_id}")
 
     while True:
         try:
-            # Get next task from queue (blocks until one is available)
-            task = await task_queue.get()
-            task_running = True
-            last_task_start_time = datetime.now()
-            await run_automation_in_process(task, unique_child_arn, child_process_id)
+            # Only one idle slot pulls from the queue at a time, and it holds the
+            # task until memory admits it, so tasks still start in FIFO order.
+            async with _admission_lock:
+                task = await task_queue.get()
+                await wait_for_admission(slot)
+                slot.task_running = True
+                slot.current_task_id = task.task_id
+                slot.last_task_start_time = datetime.now()
+            await run_automation_in_process(
+                task, slot, unique_child_arn, child_process_id
+            )
 
         except asyncio.CancelledError:
-            logger.info("Task processor cancelled")
+            logger.info(f"Task processor cancelled for slot {slot.slot_id}")
             break
         except Exception as e:
-            logger.error(f"Error in task processor: {e}")
+            logger.error(f"Error in task processor for slot {slot.slot_id}: {e}")
         finally:
 
-            task_running = False
+            slot.task_running = False
+            slot.current_task_id = None
 
 
 async def register_with_master():
@@ -245,24 +485,37 @@ async def register_with_master():
         raise ValueError("Host port not found in metadata")
 
     # Register with master
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.post(
-            f"http://{settings.SERVER_URL}/register_child",
-            json={"task_arn": my_task_arn, "private_ip": my_ip, "port": my_port},
-        )
-        response.raise_for_status()
+    client = get_control_plane_client()
+    response = await client.post(
+        f"http://{settings.SERVER_URL}/register_child",
+        json={"task_arn": my_task_arn, "private_ip": my_ip, "port": my_port},
+        idempotent=True,
+    )
+    response.raise_for_status()
 
     logger.info(f"Registered with master: {response.json()}")
 
 
-def get_app_with_endpoints(is_aws: bool, child_id: int):
-    global child_process_id
+def get_app_with_endpoints(
+    is_aws: bool,
+    child_id: int,
+    max_concurrent: int | None = None,
+    pool_size: int | None = None,
+):
+    global child_process_id, max_concurrent_tasks, browser_pool_size, task_slots
     child_process_id = child_id
+    if max_concurrent is not None:
+        max_concurrent_tasks = max_concurrent
+    if pool_size is not None:
+        browser_pool_size = pool_size
+    if max_concurrent_tasks < 1:
+        raise ValueError("max_concurrent_tasks must be at least 1")
+    task_slots = [TaskSlot(slot_id) for slot_id in range(max_concurrent_tasks)]
 
     @asynccontextmanager
     async def lifespan(app: FastAPI):
-        global _global_actual_browser
         """Lifespan context manager for startup and shutdown."""
+        global browser_pool
         # Startup
 
         if is_aws:
@@ -276,58 +529,97 @@ def get_app_with_endpoints(is_aws: bool, child_id: int):
         else:
             logger.info("Not running on AWS, skipping master registration")
 
-        asyncio.create_task(task_processor())
-        logger.info("Task processor background task started")
+        if browser_pool_size > 0:
+            browser_pool = BrowserPool(
+                unique_child_arn=unique_child_arn,
+                size=browser_pool_size,
+                get_ports=browser_pool_ports,
+                channel=settings.BROWSER_POOL_CHANNEL,
+            )
+            browser_pool.schedule_refill()
+            logger.info(f"Warming up browser pool of size {browser_pool_size}")
+
+        for slot in task_slots:
+            if settings.USE_PERSISTENT_WORKER:
+                asyncio.create_task(slot.worker.ensure_started())
+            asyncio.create_task(task_processor(slot))
+        logger.info(f"Started {len(task_slots)} task processor background tasks")
         yield
         # Shutdown (if needed in the future)
         logger.info("Shutting down task processor")
 
-        if _global_actual_browser is not None:
-            logger.debug("Stopping actual browser on lifecycle end")
-            await _global_actual_browser.stop(graceful=True)
-            _global_actual_browser = None
-            logger.debug("Actual browser stopped on lifecycle end")
+        if browser_pool is not None:
+            await browser_pool.close()
+            browser_pool = None
+
+        for slot in task_slots:
+            await slot.worker.stop()
+            if slot.actual_browser is not None:
+                logger.debug(f"Stopping actual browser of slot {slot.slot_id}")
+                await slot.actual_browser.stop(graceful=True)
+                slot.actual_browser = None
+        logger.debug("Actual browsers stopped on lifecycle end")
+
+        await close_control_plane_client()
 
         logger.info("Lifecycle ended")
 
     app = FastAPI(title="Optexity Inference", lifespan=lifespan)
 
     @app.get("/is_task_running", tags=["info"])
-    async def is_task_running():
-        """Is task running endpoint."""
-        return task_running
+    async def is_task_running(per_slot: bool = False):
+        """Is task running endpoint. Pass per_slot=true for the state of every slot."""
+        if per_slot:
+            return [slot.state() for slot in task_slots]
+        return any(slot.task_running for slot in task_slots)
 
     @app.get("/health", tags=["info"])
     async def health():
         """Health check endpoint."""
-        global last_task_start_time
-        if (
-            task_running
-            and last_task_start_time
-            and datetime.now() - last_task_start_time > timedelta(minutes=15)
-        ):
+        slots = [slot.state() for slot in task_slots]
+        stuck_slots = [slot.slot_id for slot in task_slots if slot.is_stuck()]
+        if stuck_slots:
             return JSONResponse(
                 status_code=503,
                 content={
                     "status": "unhealthy",
-                    "message": "Task not finished in the last 15 minutes",
+                    "message": f"Task not finished in the last 15 minutes on slots {stuck_slots}",
+                    "slots": slots,
                 },
             )
         return JSONResponse(
             status_code=200,
             content={
                 "status": "healthy",
-                "task_running": task_running,
+                "task_running": any(slot.task_running for slot in task_slots),
+                "free_slots": sum(not slot.task_running for slot in task_slots),
                 "queued_tasks": task_queue.qsize(),
+                "warm_browsers": (
+                    len(browser_pool.warm_browsers) if browser_pool else 0
+                ),
+                "slots": slots,
             },
         )
 
+    @app.get("/control_plane_metrics", tags=["info"])
+    async def get_control_plane_metrics():
+        """Per-endpoint latency of calls this server made to the Optexity server.
+
+        Calls made by running tasks are logged by the task worker when it exits.
+        """
+        return control_plane_metrics()
+
     @app.post("/set_child_process_id", tags=["info"])
     async def set_child_process_id(request: ChildProcessIdRequest):
         """Set child process id endpoint."""
         global child_process_id, unique_child_arn
+        previous = (child_process_id, unique_child_arn)
         child_process_id = int(request.new_child_process_id)
         unique_child_arn = request.new_unique_child_arn
+        changed = (child_process_id, unique_child_arn) != previous
+        # Warm browsers were launched on the old child's ports.
+        if browser_pool is not None and changed:
+            await browser_pool.reset(unique_child_arn)
         return JSONResponse(
             content={"success": True, "message": "Child process id has been set"},
             status_code=200,
@@ -337,6 +629,17 @@ def get_app_with_endpoints(is_aws: bool, child_id: int):
     async def allocate_task(task: Task = Body(...)):
         """Get details of a specific task."""
         try:
+            errors = check_task_automation(task)
+            if errors:
+                logger.error(f"Rejecting task {task.task_id}: {errors}")
+                return JSONResponse(
+                    content={
+                        "success": False,
+                        "message": "Automation failed static checks",
+                        "errors": errors,
+                    },
+                    status_code=422,
+                )
 
             await task_queue.put(task)
             return JSONResponse(
@@ -359,19 +662,22 @@ def get_app_with_endpoints(is_aws: bool, child_id: int):
             response_data: dict | None = None
             try:
 
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    url = urljoin(settings.SERVER_URL, settings.INFERENCE_ENDPOINT)
-                    headers = {"x-api-key": settings.API_KEY}
-                    response = await client.post(
-                        url, json=inference_request.model_dump(), headers=headers
-                    )
-                    response_data = response.json()
-                    response.raise_for_status()
+                client = get_control_plane_client()
+                url = urljoin(settings.SERVER_URL, settings.INFERENCE_ENDPOINT)
+                headers = {"x-api-key": settings.API_KEY}
+                response = await client.post(
+                    url, json=inference_request.model_dump(), headers=headers
+                )
+                response_data = response.json()
+                response.raise_for_status()
 
                 assert response_data is not None
                 task_data = response_data["task"]
 
                 task = Task.model_validate_json(task_data)
+                errors = check_task_automation(task)
+                if errors:
+                    raise ValueError(f"Automation failed static checks: {errors}")
                 if task.use_proxy and settings.PROXY_URL is None:
                     raise ValueError(
                         "PROXY_URL is not set and is required when use_proxy is True"
@@ -402,6 +708,8 @@ def get_app_with_endpoints(is_aws: bool, child_id: int):
 
 def main():
     """Main function to run the server."""
+    from uvicorn import run
+
     parser = argparse.ArgumentParser(
         description="Dynamic API endpoint generator for Optexity recordings"
     )
@@ -428,10 +736,27 @@ def main():
         help="Is child process",
         default=False,
     )
+    parser.add_argument(
+        "--max_concurrent_tasks",
+        type=int,
+        default=None,
+        help="Number of tasks run side by side, each with its own browser",
+    )
+    parser.add_argument(
+        "--browser_pool_size",
+        type=int,
+        default=None,
+        help="Number of pre-launched browsers kept warm for non-dedicated tasks",
+    )
 
     args = parser.parse_args()
 
-    app = get_app_with_endpoints(is_aws=args.is_aws, child_id=args.child_process_id)
+    app = get_app_with_endpoints(
+        is_aws=args.is_aws,
+        child_id=args.child_process_id,
+        max_concurrent=args.max_concurrent_tasks,
+        pool_size=args.browser_pool_size,
+    )
 
     # Start the server (this is blocking and manages its own event loop)
     logger.info(f"Starting server on {args.host}:{args.port}")
@@ -1,6 +1,9 @@
 import asyncio
 import logging
+import time
 
+from patchright._impl._errors import TimeoutError as PatchrightTimeoutError
+from playwright._impl._errors import TimeoutError as PlaywrightTimeoutError
 from playwright.async_api import Locator
 
 from optexity.exceptions import AssertLocatorPresenceException
@@ -8,8 +11,13 @@ from optexity.inference.core.interaction.handle_select_utils import (
     SelectOptionValue,
     smart_select,
 )
-from optexity.inference.core.interaction.utils import handle_download
+from optexity.inference.core.interaction.utils import (
+    capture_browser_state,
+    handle_download,
+)
 from optexity.inference.infra.browser import Browser
+from optexity.inference.infra.locator_command import LocatorCommandError
+from optexity.inference.infra.tracing import span
 from optexity.schema.actions.interaction_action import (
     CheckAction,
     ClickElementAction,
@@ -19,11 +27,14 @@ from optexity.schema.actions.interaction_action import (
     UncheckAction,
     UploadFileAction,
 )
-from optexity.schema.memory import BrowserState, Memory
+from optexity.schema.memory import CommandStats, Memory
 from optexity.schema.task import Task
 
 logger = logging.getLogger(__name__)
 
+# First pause after a failed try; doubles up to the per-try timeout.
+RETRY_INITIAL_BACKOFF = 0.1
+
 
 async def command_based_action_with_retry(
     action: (
@@ -46,87 +57,94 @@ async def command_based_action_with_retry(
         return
 
     last_error = None
+    timeout_ms = max_timeout_seconds_per_try * 1000
+    backoff = RETRY_INITIAL_BACKOFF
+    stats = memory.command_stats.setdefault(action.command, CommandStats())
+    start = time.monotonic()
+    tries = 0
 
     logger.debug(f"Executing command-based action: {action.__class__.__name__}")
 
     for try_index in range(max_tries):
+        tries = try_index + 1
         last_error = None
         try:
-            # https://playwright.dev/docs/actionability
             locator = await browser.get_locator_from_command(action.command)
             if locator is None:
                 continue
-            if try_index == 0:
-                try:
-                    await locator.wait_for(
-                        state="visible", timeout=max_timeout_seconds_per_try * 1000
-                    )
-                except Exception as e:
-                    pass
-            is_visible = await locator.is_visible()
-
-            if is_visible:
-                await locator.scroll_into_view_if_needed(
-                    timeout=max_timeout_seconds_per_try * 1000
+
+            # https://playwright.dev/docs/actionability
+            # Returns as soon as the element is visible, instead of sleeping a
+            # fixed time between tries.
+            try:
+                with span("locator_wait", try_index=try_index):
+                    await locator.wait_for(state="visible", timeout=timeout_ms)
+            except (TimeoutError, PatchrightTimeoutError, PlaywrightTimeoutError):
+                last_error = f"error: locator not visible"
+                continue
+
+            await locator.scroll_into_view_if_needed(timeout=timeout_ms)
+            await asyncio.sleep(0.05)
+            memory.browser_states[-1] = await capture_browser_state(
+                memory, browser, "interaction"
+            )
+
+            if isinstance(action, ClickElementAction):
+                await click_locator(
+                    action,
+                    locator,
+                    browser,
+                    memory,
+                    task,
+                    max_timeout_seconds_per_try,
                 )
-                await asyncio.sleep(0.05)
-                # browser_state_summary = await browser.get_browser_state_summary()
-                memory.browser_states[-1] = BrowserState(
-                    url=await browser.get_current_page_url(),
-                    screenshot=await browser.get_screenshot(),
-                    title=await browser.get_current_page_title(),
-                    axtree=None,
+            elif isinstance(action, InputTextAction):
+                await input_text_locator(
+                    action, locator, browser, max_timeout_seconds_per_try
                 )
-
-                if isinstance(action, ClickElementAction):
-                    await click_locator(
-                        action,
-                        locator,
-                        browser,
-                        memory,
-                        task,
-                        max_timeout_seconds_per_try,
-                    )
-                elif isinstance(action, InputTextAction):
-                    await input_text_locator(
-                        action, locator, browser, max_timeout_seconds_per_try
-                    )
-                elif isinstance(action, SelectOptionAction):
-                    await select_option_locator(
-                        action,
-                        locator,
-                        browser,
-                        memory,
-                        task,
-                        max_timeout_seconds_per_try,
-                    )
-                elif isinstance(action, CheckAction):
-                    await check_locator(
-                        action, locator, max_timeout_seconds_per_try, browser
-                    )
-                elif isinstance(action, UncheckAction):
-                    await uncheck_locator(
-                        action, locator, max_timeout_seconds_per_try, browser
-                    )
-                elif isinstance(action, HoverAction):
-                    await hover_locator(locator, max_timeout_seconds_per_try)
-                elif isinstance(action, UploadFileAction):
-                    await upload_file_locator(action, locator)
-                logger.debug(
-                    f"{action.__class__.__name__} successful on try {try_index + 1}"
+            elif isinstance(action, SelectOptionAction):
+                await select_option_locator(
+                    action,
+                    locator,
+                    browser,
+                    memory,
+                    task,
+                    max_timeout_seconds_per_try,
                 )
-                return
-            else:
-                await asyncio.sleep(max_timeout_seconds_per_try)
-                last_error = f"error: locator not visible"
+            elif isinstance(action, CheckAction):
+                await check_locator(
+                    action, locator, max_timeout_seconds_per_try, browser
+                )
+            elif isinstance(action, UncheckAction):
+                await uncheck_locator(
+                    action, locator, max_timeout_seconds_per_try, browser
+                )
+            elif isinstance(action, HoverAction):
+                await hover_locator(locator, max_timeout_seconds_per_try)
+            elif isinstance(action, UploadFileAction):
+                await upload_file_locator(action, locator)
+            logger.debug(
+                f"{action.__class__.__name__} successful on try {try_index + 1}"
+            )
+            stats.record(True, tries, time.monotonic() - start, None)
+            return
+        except LocatorCommandError as e:
+            # Retrying cannot fix a command that does not parse.
+            last_error = f"error: {e}"
+            break
         except Exception as e:
+            # Actions already wait for actionability up to their timeout, so
+            # an error is either that timeout or immediate (e.g. the element
+            # was detached); back off briefly before the next try.
             last_error = f"error: {e}"
-            await asyncio.sleep(max_timeout_seconds_per_try)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_timeout_seconds_per_try)
 
     if last_error is None:
         last_error = "error in executing command"
+    stats.record(False, tries, time.monotonic() - start, last_error)
     logger.debug(
-        f"{action.__class__.__name__} failed after {max_tries} tries: {last_error}"
+        f"{action.__class__.__name__} failed after {tries} tries: {last_error}"
     )
 
     if last_error and action.assert_locator_presence:
@@ -10,7 +10,14 @@ from optexity.schema.actions.interaction_action import Locator
 from optexity.schema.memory import Memory
 
 logger = logging.getLogger(__name__)
-select_value_prediction_agent = SelectValuePredictionAgent()
+_select_value_prediction_agent: SelectValuePredictionAgent | None = None
+
+
+def get_select_value_prediction_agent() -> SelectValuePredictionAgent:
+    global _select_value_prediction_agent
+    if _select_value_prediction_agent is None:
+        _select_value_prediction_agent = SelectValuePredictionAgent()
+    return _select_value_prediction_agent
 
 
 class SelectOptionValue(BaseModel):
@@ -18,13 +25,15 @@ class SelectOptionValue(BaseModel):
     label: str
 
 
-def llm_select_match(
+async def llm_select_match(
     options: list[SelectOptionValue], patterns: list[str], memory: Memory
 ) -> list[str]:
-    final_prompt, response, token_usage = (
-        select_value_prediction_agent.predict_select_value(
-            [o.model_dump() for o in options], patterns
-        )
+    (
+        final_prompt,
+        response,
+        token_usage,
+    ) = await get_select_value_prediction_agent().predict_select_value(
+        [o.model_dump() for o in options], patterns
     )
     memory.token_usage += token_usage
     memory.browser_states[-1].final_prompt = final_prompt
@@ -134,7 +143,7 @@ async def smart_select(
                     matched_values.append(best_value)
 
     if len(matched_values) == 0:
-        matched_values = llm_select_match(options, patterns, memory)
+        matched_values = await llm_select_match(options, patterns, memory)
 
     if len(matched_values) == 0:
         matched_values = patterns
@@ -1,10 +1,9 @@
 import asyncio
 import logging
 import os
-import shutil
 import uuid
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Literal
 
 import aiofiles
 
@@ -12,13 +11,55 @@ from optexity.inference.agents.index_prediction.action_prediction_locator_axtree
     ActionPredictionLocatorAxtree,
 )
 from optexity.inference.infra.browser import Browser
+from optexity.inference.infra.download_tracker import (
+    available_path,
+    move_download,
+)
 from optexity.schema.memory import BrowserState, Memory
 from optexity.schema.task import Task
 
 logger = logging.getLogger(__name__)
 
 
-index_prediction_agent = ActionPredictionLocatorAxtree()
+_index_prediction_agent: ActionPredictionLocatorAxtree | None = None
+
+
+def get_index_prediction_agent() -> ActionPredictionLocatorAxtree:
+    global _index_prediction_agent
+    if _index_prediction_agent is None:
+        _index_prediction_agent = ActionPredictionLocatorAxtree()
+    return _index_prediction_agent
+
+
+async def capture_browser_state(
+    memory: Memory, browser: Browser, stage: Literal["step", "interaction"]
+) -> BrowserState:
+    """Browser state for the current node, with a screenshot only if the node's
+    capture policy asks for one at this stage."""
+    policy = memory.automation_state.capture_policy
+    take_screenshot = policy == "per_step" or (
+        stage == "interaction" and policy == "per_interaction"
+    )
+    return BrowserState(
+        url=await browser.get_current_page_url(),
+        screenshot=(
+            await browser.get_screenshot(dedup=True) if take_screenshot else None
+        ),
+        title=await browser.get_current_page_title(),
+        axtree=None,
+        system_info=memory.update_system_info(),
+    )
+
+
+async def capture_error_screenshot(memory: Memory, browser: Browser):
+    if memory.automation_state.capture_policy == "none":
+        return
+    if not memory.browser_states or memory.browser_states[-1].screenshot is not None:
+        return
+    try:
+        memory.browser_states[-1].screenshot = await browser.get_screenshot(dedup=True)
+    except Exception as e:
+        logger.error(f"Error capturing screenshot on error: {e}")
 
 
 async def get_index_from_prompt(
@@ -29,16 +70,21 @@ async def get_index_from_prompt(
         url=browser_state_summary.url,
         screenshot=browser_state_summary.screenshot,
         title=browser_state_summary.title,
-        axtree=browser_state_summary.dom_state.llm_representation(
-            remove_empty_nodes=task.automation.remove_empty_nodes_in_axtree
+        axtree=browser.get_axtree(
+            browser_state_summary, task.automation.remove_empty_nodes_in_axtree
         ),
+        system_info=memory.update_system_info(),
     )
 
     try:
         if memory.browser_states[-1].axtree is None:
             logger.error("Axtree is None, cannot predict action")
             return None
-        final_prompt, response, token_usage = index_prediction_agent.predict_action(
+        (
+            final_prompt,
+            response,
+            token_usage,
+        ) = await get_index_prediction_agent().predict_action(
             prompt_instructions, memory.browser_states[-1].axtree
         )
         memory.token_usage += token_usage
@@ -88,13 +134,61 @@ async def handle_download(
 ):
     download_path: Path = task.downloads_directory / download_filename
 
+    if browser.download_tracker is None:
+        downloaded = await _poll_for_download(func, browser)
+    else:
+        downloaded = await _track_download(func, browser)
+    if downloaded is None:
+        return
+    src_path, new_file = downloaded
+
+    try:
+        uuid.UUID(download_path.stem)
+        is_uuid_filename = True
+    except Exception:
+        is_uuid_filename = False
+
+    if is_uuid_filename:
+        download_path = available_path(task.downloads_directory, new_file)
+    elif not download_path.suffix:
+        suffix = Path(new_file).suffix
+        if suffix:
+            download_path = download_path.with_suffix(suffix)
+
+    move_download(src_path, download_path)
+    logger.info(f"Moved download {src_path} -> {download_path}")
+
+    # await clean_download(download_path)
+
+    if download_path.exists() and download_path.stat().st_size > 0:
+        memory.downloads.append(download_path)
+    else:
+        logger.error(f"Download file is empty or missing: {download_path}")
+
+
+async def _track_download(func: Callable, browser: Browser) -> tuple[Path, str] | None:
+    """Run `func` and wait for the download it starts, from CDP events."""
+    async with browser.download_tracker.expect(browser.download_owner) as expected:
+        await func()
+        try:
+            download = await expected.wait()
+        except asyncio.TimeoutError as e:
+            logger.error(f"Download did not complete after download action: {e}")
+            return None
+
+    if download.state != "completed":
+        logger.error(f"Download of {download.url} was {download.state}")
+        return None
+    return download.path, download.suggested_filename
+
+
+async def _poll_for_download(
+    func: Callable, browser: Browser
+) -> tuple[Path, str] | None:
+    """Run `func` and poll the downloads directory for a new file."""
     before = _snapshot_dir(browser.temp_downloads_dir)
 
-    # page = await browser.get_current_page()
-    # async with page.expect_download() as download_info:
     await func()
-    # download = await download_info.value
-    # logger.info(f"Suggested filename: {download.suggested_filename}")
 
     timeout = 30.0
     poll_interval = 0.5
@@ -120,35 +214,13 @@ async def handle_download(
         logger.error(
             f"No new file appeared in {browser.temp_downloads_dir} within {timeout}s after download action"
         )
-        return
+        return None
 
     src_path = Path(browser.temp_downloads_dir) / new_file
 
     if not await _wait_for_file_stable(src_path):
         logger.warning(f"Downloaded file {src_path} may be incomplete")
-
-    try:
-        uuid.UUID(download_path.stem)
-        is_uuid_filename = True
-    except Exception:
-        is_uuid_filename = False
-
-    if is_uuid_filename:
-        download_path = task.downloads_directory / new_file
-    elif not download_path.suffix:
-        suffix = Path(new_file).suffix
-        if suffix:
-            download_path = download_path.with_suffix(suffix)
-
-    shutil.move(str(src_path), str(download_path))
-    logger.info(f"Moved download {src_path} -> {download_path}")
-
-    # await clean_download(download_path)
-
-    if download_path.exists() and download_path.stat().st_size > 0:
-        memory.downloads.append(download_path)
-    else:
-        logger.error(f"Download file is empty or missing: {download_path}")
+    return src_path, new_file
 
 
 async def clean_download(download_path: Path):
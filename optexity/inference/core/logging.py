@@ -1,34 +1,29 @@
-import base64
-import io
+import asyncio
 import json
 import logging
 import shutil
-import tarfile
 from datetime import datetime, timezone
 from pathlib import Path
 from urllib.parse import urljoin
 
-import aiofiles
 import httpx
 
+from optexity.inference.core.state_writer import MemoryStateWriter, StepSnapshot
+from optexity.inference.core.trajectory import TrajectoryStore
+from optexity.inference.infra.control_plane import get_control_plane_client
+from optexity.inference.infra.cpu_offload import encode_json, run_cpu
+from optexity.inference.infra.multipart_stream import MultipartStream, tar_gz_stream
+from optexity.inference.infra.tracing import Span, get_tracer, traced
 from optexity.schema.automation import ActionNode
 from optexity.schema.memory import Memory
 from optexity.schema.task import Task
 from optexity.schema.token_usage import TokenUsage
 from optexity.utils.settings import settings
-from optexity.utils.utils import save_screenshot
 
 logger = logging.getLogger(__name__)
 
-
-def create_tar_in_memory(directory: Path | str, name: str) -> io.BytesIO:
-    if isinstance(directory, str):
-        directory = Path(directory)
-    tar_bytes = io.BytesIO()
-    with tarfile.open(fileobj=tar_bytes, mode="w:gz") as tar:
-        tar.add(directory, arcname=name)
-    tar_bytes.seek(0)  # rewind to start
-    return tar_bytes
+_trajectory_stores: dict[str, TrajectoryStore] = {}
+_state_writers: dict[tuple[str, str | None], MemoryStateWriter] = {}
 
 
 async def start_task_in_server(task: Task):
@@ -44,15 +39,15 @@ async def start_task_in_server(task: Task):
         }
         if task.allocated_at:
             body["allocated_at"] = task.allocated_at.isoformat()
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                url,
-                headers=headers,
-                json=body,
-            )
+        client = get_control_plane_client()
+        response = await client.post(
+            url,
+            headers=headers,
+            json=body,
+        )
 
-            response.raise_for_status()
-            return response.json()
+        response.raise_for_status()
+        return response.json()
     except httpx.HTTPStatusError as e:
         raise ValueError(
             f"Failed to start task in server: {e.response.status_code} - {e.response.text}"
@@ -79,15 +74,15 @@ async def complete_task_in_server(
         if token_usage:
             body["token_usage"] = token_usage.model_dump()
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                url,
-                headers=headers,
-                json=body,
-            )
+        client = get_control_plane_client()
+        response = await client.post(
+            url,
+            headers=headers,
+            json=body,
+        )
 
-            response.raise_for_status()
-            return response.json()
+        response.raise_for_status()
+        return response.json()
     except httpx.HTTPStatusError as e:
         logger.error(
             f"Failed to complete task in server: {e.response.status_code} - {e.response.text}"
@@ -97,6 +92,7 @@ async def complete_task_in_server(
         logger.error(f"Failed to complete task in server: {e}")
 
 
+@traced("upload", endpoint="save_output_data")
 async def save_output_data_in_server(task: Task, memory: Memory):
     try:
         if len(memory.variables.output_data) == 0 and memory.final_screenshot is None:
@@ -113,7 +109,7 @@ async def save_output_data_in_server(task: Task, memory: Memory):
         body = {
             "task_id": task.task_id,
             "output_data": output_data,
-            "final_screenshot": memory.final_screenshot,
+            "final_screenshot": None,
             "unique_child_arn": memory.unique_child_arn,
             "system_info": [
                 system_info.model_dump(mode="json")
@@ -129,15 +125,30 @@ async def save_output_data_in_server(task: Task, memory: Memory):
         if len(for_loop_status) > 0:
             body["for_loop_status"] = for_loop_status
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                url,
-                headers=headers,
-                json=body,
-            )
+        tracer = get_tracer()
+        if tracer is not None:
+            body["trace_summary"] = tracer.summary()
+
+        # The screenshot is base64 encoded together with the body, off the
+        # event loop.
+        content = await run_cpu(
+            encode_json,
+            body,
+            (
+                {"final_screenshot": memory.final_screenshot.data}
+                if memory.final_screenshot
+                else None
+            ),
+        )
+        client = get_control_plane_client()
+        response = await client.post(
+            url,
+            headers={**headers, "Content-Type": "application/json"},
+            content=content,
+        )
 
-            response.raise_for_status()
-            return response.json()
+        response.raise_for_status()
+        return response.json()
     except httpx.HTTPStatusError as e:
         logger.error(
             f"Failed to save output data in server: {e.response.status_code} - {e.response.text}"
@@ -146,6 +157,7 @@ async def save_output_data_in_server(task: Task, memory: Memory):
         logger.error(f"Failed to save output data in server: {e}")
 
 
+@traced("upload", endpoint="save_downloads")
 async def save_downloads_in_server(task: Task, memory: Memory):
     try:
         # if len(memory.downloads) == 0:
@@ -165,12 +177,19 @@ async def save_downloads_in_server(task: Task, memory: Memory):
             if download.is_file()
         ]
         if len(downloads) > 0:
-            tar_bytes = create_tar_in_memory(task.downloads_directory, task.task_id)
-            # add tar.gz
+            # add tar.gz, compressed from disk while it is uploaded
             files.append(
                 (
                     "compressed_downloads",
-                    (f"{task.task_id}.tar.gz", tar_bytes, "application/gzip"),
+                    (
+                        f"{task.task_id}.tar.gz",
+                        lambda: tar_gz_stream(
+                            task.downloads_directory,
+                            task.task_id,
+                            settings.DOWNLOADS_COMPRESSLEVEL,
+                        ),
+                        "application/gzip",
+                    ),
                 )
             )
 
@@ -182,8 +201,8 @@ async def save_downloads_in_server(task: Task, memory: Memory):
                         "screenshots",
                         (
                             data.screenshot.filename,
-                            base64.b64decode(data.screenshot.base64),
-                            "image/png",
+                            data.screenshot.image.data,
+                            data.screenshot.image.mime_type,
                         ),
                     )
                 )
@@ -193,9 +212,9 @@ async def save_downloads_in_server(task: Task, memory: Memory):
                 (
                     "screenshots",
                     (
-                        "final_screenshot.png",
-                        base64.b64decode(memory.final_screenshot),
-                        "image/png",
+                        f"final_screenshot.{memory.final_screenshot.extension}",
+                        memory.final_screenshot.data,
+                        memory.final_screenshot.mime_type,
                     ),
                 )
             )
@@ -203,14 +222,16 @@ async def save_downloads_in_server(task: Task, memory: Memory):
         if len(files) == 0:
             return
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-
-            response = await client.post(
-                url, headers=headers, data=payload, files=files
-            )
+        body = MultipartStream(payload, files)
+        client = get_control_plane_client()
+        response = await client.post(
+            url,
+            headers={**headers, "Content-Type": body.content_type},
+            content=body,
+        )
 
-            response.raise_for_status()
-            return response.json()
+        response.raise_for_status()
+        return response.json()
     except httpx.HTTPStatusError as e:
         logger.error(
             f"Failed to save downloads in server: {e.response.status_code} - {e.response.text}"
@@ -219,29 +240,54 @@ async def save_downloads_in_server(task: Task, memory: Memory):
         logger.error(f"Failed to save downloads in server: {e}")
 
 
+def get_trajectory_store(task: Task) -> TrajectoryStore:
+    if task.task_id not in _trajectory_stores:
+        _trajectory_stores[task.task_id] = TrajectoryStore(
+            task.task_directory,
+            task.task_id,
+            compresslevel=settings.TRAJECTORY_COMPRESSLEVEL,
+        )
+    return _trajectory_stores[task.task_id]
+
+
+@traced("upload", endpoint="save_trajectory")
 async def save_trajectory_in_server(task: Task):
+    """Upload the task directory, or in delta mode only the files that changed
+    since the last successful upload. The archive is built in a thread into a
+    temporary file and streamed from there."""
     try:
         url = urljoin(settings.SERVER_URL, settings.SAVE_TRAJECTORY_ENDPOINT)
         headers = {"x-api-key": task.api_key}
+        delta = settings.TRAJECTORY_UPLOAD_MODE == "delta"
+        store = get_trajectory_store(task)
+        await flush_memory_state(task)
+
+        async with store.lock:
+            tar_file, manifest, current = await store.prepare(delta)
+            if tar_file is None:
+                logger.debug("Trajectory unchanged since last upload, skipping")
+                return
+
+            with tar_file:
+                data = {
+                    "task_id": task.task_id,  # form field
+                }
+                filename = f"{task.task_id}.tar.gz"
+                if delta:
+                    data["delta_index"] = str(manifest["delta_index"])
+                    filename = f"{task.task_id}_{manifest['delta_index']}.tar.gz"
+
+                files = {
+                    "compressed_trajectory": (filename, tar_file, "application/gzip")
+                }
+                client = get_control_plane_client()
+                response = await client.post(
+                    url, headers=headers, data=data, files=files
+                )
 
-        data = {
-            "task_id": task.task_id,  # form field
-        }
-
-        tar_bytes = create_tar_in_memory(task.task_directory, task.task_id)
-        files = {
-            "compressed_trajectory": (
-                f"{task.task_id}.tar.gz",
-                tar_bytes,
-                "application/gzip",
-            )
-        }
-        async with httpx.AsyncClient(timeout=30.0) as client:
-
-            response = await client.post(url, headers=headers, data=data, files=files)
-
-            response.raise_for_status()
-            return response.json()
+                response.raise_for_status()
+                store.commit(manifest, current, delta)
+                return response.json()
     except httpx.HTTPStatusError as e:
         logger.error(
             f"Failed to save trajectory in server: {e.response.status_code} - {e.response.text}"
@@ -262,10 +308,12 @@ async def initiate_callback(task: Task):
                 "task_id": task.task_id,
                 "endpoint_name": task.endpoint_name,
             }
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(url, headers=headers, json=data)
-                response.raise_for_status()
-                callback_data = response.json()["data"]
+            client = get_control_plane_client()
+            response = await client.post(
+                url, headers=headers, json=data, idempotent=True
+            )
+            response.raise_for_status()
+            callback_data = response.json()["data"]
         except Exception as e:
             logger.error(f"Failed to get callback data: {e}")
             return
@@ -274,11 +322,11 @@ async def initiate_callback(task: Task):
             return
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    settings.LOCAL_CALLBACK_URL, json=callback_data
-                )
-                response.raise_for_status()
+            client = get_control_plane_client()
+            response = await client.post(
+                settings.LOCAL_CALLBACK_URL, json=callback_data
+            )
+            response.raise_for_status()
         except Exception as e:
             logger.error(f"Failed to initiate local callback: {e}")
             return
@@ -299,12 +347,11 @@ async def initiate_callback(task: Task):
             "callback_url": task.callback_url.model_dump(),
         }
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-
-            response = await client.post(url, headers=headers, json=data)
+        client = get_control_plane_client()
+        response = await client.post(url, headers=headers, json=data)
 
-            response.raise_for_status()
-            return response.json()
+        response.raise_for_status()
+        return response.json()
     except httpx.HTTPStatusError as e:
         logger.error(
             f"Failed to save trajectory in server: {e.response.status_code} - {e.response.text}"
@@ -313,22 +360,75 @@ async def initiate_callback(task: Task):
         logger.error(f"Failed to save trajectory in server: {e}")
 
 
+def get_state_writer(task: Task, memory: Memory) -> MemoryStateWriter:
+    key = (task.task_id, memory.logs_subdirectory)
+    if key not in _state_writers:
+        _state_writers[key] = MemoryStateWriter()
+    return _state_writers[key]
+
+
+def _task_state_writer_keys(task: Task) -> list[tuple[str, str | None]]:
+    return [key for key in _state_writers if key[0] == task.task_id]
+
+
+async def flush_memory_state(task: Task):
+    for key in _task_state_writer_keys(task):
+        await _state_writers[key].flush()
+
+
+async def close_memory_state_writer(task: Task, memory: Memory | None = None):
+    """Flush and drop the task's state writers, or only the one for `memory`."""
+    if memory is not None:
+        keys = [(task.task_id, memory.logs_subdirectory)]
+    else:
+        keys = _task_state_writer_keys(task)
+    for key in keys:
+        writer = _state_writers.pop(key, None)
+        if writer is not None:
+            await writer.flush()
+
+
+def step_directory(task: Task, memory: Memory, step_index: int) -> Path:
+    logs_directory = task.logs_directory
+    if memory.logs_subdirectory:
+        logs_directory = logs_directory / memory.logs_subdirectory
+    return logs_directory / f"step_{str(step_index)}"
+
+
+async def release_task_logging(task: Task):
+    """Flush and drop the task's state writers and trajectory store.
+
+    Both are kept per task id for the life of the process, so a long-lived
+    process releases them once the task is done, whatever the deployment.
+    """
+    await close_memory_state_writer(task)
+    store = _trajectory_stores.pop(task.task_id, None)
+    if store is not None:
+        async with store.lock:
+            store.close()
+
+
+@traced("save_state")
 async def save_latest_memory_state_locally(
     task: Task, memory: Memory, node: ActionNode | None
 ):
+    """Queue the current step's memory state to be written to its step directory.
 
+    Files are written in the background by the task's MemoryStateWriter;
+    `flush_memory_state` waits for them.
+    """
     try:
+        writer = get_state_writer(task, memory)
         browser_state = memory.browser_states[-1]
         automation_state = memory.automation_state
-        step_directory = (
-            task.logs_directory / f"step_{str(automation_state.step_index)}"
+        snapshot = StepSnapshot(
+            step_directory(task, memory, automation_state.step_index)
         )
-        step_directory.mkdir(parents=True, exist_ok=True)
+        files = snapshot.files
 
         if browser_state.screenshot:
-            await save_screenshot(
-                browser_state.screenshot, step_directory / "screenshot.png"
-            )
+            screenshot = browser_state.screenshot
+            files[f"screenshot.{screenshot.extension}"] = (screenshot, screenshot)
         else:
             logger.warning(
                 "No screenshot found for step %s", automation_state.step_index
@@ -344,76 +444,113 @@ async def save_latest_memory_state_locally(
             ],
             "token_usage": memory.token_usage.model_dump(),
             "unique_child_arn": memory.unique_child_arn,
-            "system_info": browser_state.system_info.model_dump(mode="json"),
+            "system_info": (
+                browser_state.system_info.model_dump(mode="json")
+                if browser_state.system_info
+                else None
+            ),
+            "wait_times": dict(browser_state.wait_times),
+            "command_stats": {
+                command: stats.model_dump()
+                for command, stats in memory.command_stats.items()
+            },
         }
-
-        async with aiofiles.open(step_directory / "state.json", "w") as f:
-            await f.write(json.dumps(state_dict, indent=4))
+        files["state.json"] = (lambda: json.dumps(state_dict, indent=4), None)
 
         if browser_state.axtree:
-            async with aiofiles.open(step_directory / "axtree.txt", "w") as f:
-                await f.write(browser_state.axtree)
+            files["axtree.txt"] = (browser_state.axtree, browser_state.axtree)
 
         if browser_state.final_prompt:
-            async with aiofiles.open(step_directory / "final_prompt.txt", "w") as f:
-                await f.write(browser_state.final_prompt)
+            files["final_prompt.txt"] = (browser_state.final_prompt, None)
 
         if browser_state.llm_response:
-            async with aiofiles.open(step_directory / "llm_response.json", "w") as f:
-                await f.write(json.dumps(browser_state.llm_response, indent=4))
+            files["llm_response.json"] = (
+                json.dumps(browser_state.llm_response, indent=4),
+                None,
+            )
 
         if node:
-            async with aiofiles.open(step_directory / "action_node.json", "w") as f:
-                await f.write(
-                    json.dumps(
-                        node.model_dump(exclude_none=True, exclude_defaults=True),
-                        indent=4,
-                    )
-                )
+            node_dict = node.model_dump(exclude_none=True, exclude_defaults=True)
+            files["action_node.json"] = (
+                lambda: json.dumps(node_dict, indent=4),
+                None,
+            )
 
-        async with aiofiles.open(step_directory / "input_parameters.json", "w") as f:
-            await f.write(json.dumps(task.input_parameters, indent=4))
+        input_parameters = json.dumps(task.input_parameters, indent=4)
+        files["input_parameters.json"] = (input_parameters, input_parameters)
 
-        async with aiofiles.open(step_directory / "secure_parameters.json", "w") as f:
-            secure_parameters = {
+        secure_parameters = json.dumps(
+            {
                 key: [
                     a.model_dump(exclude_none=True, exclude_defaults=True)
                     for a in value
                 ]
                 for key, value in task.secure_parameters.items()
-            }
-            await f.write(json.dumps(secure_parameters, indent=4))
-
-        async with aiofiles.open(step_directory / "generated_variables.json", "w") as f:
-            await f.write(json.dumps(memory.variables.generated_variables, indent=4))
-
-        async with aiofiles.open(step_directory / "output_data.json", "w") as f:
-            await f.write(
-                json.dumps(
-                    [
-                        output_data.model_dump(
-                            exclude_none=True,
-                            exclude={"screenshot"},
-                            exclude_defaults=True,
-                        )
-                        for output_data in memory.variables.output_data
-                    ],
-                    indent=4,
+            },
+            indent=4,
+        )
+        files["secure_parameters.json"] = (secure_parameters, secure_parameters)
+
+        generated_variables = json.dumps(memory.variables.generated_variables, indent=4)
+        files["generated_variables.json"] = (generated_variables, generated_variables)
+
+        # Only entries added since the last step are dumped; earlier output
+        # screenshots are linked from the step that first wrote them.
+        output_data = memory.variables.output_data
+        if len(writer.output_entries) > len(output_data):
+            writer.output_entries = []
+        for entry in output_data[len(writer.output_entries) :]:
+            writer.output_entries.append(
+                entry.model_dump(
+                    exclude_none=True, exclude={"screenshot"}, exclude_defaults=True
                 )
             )
+        output_entries = list(writer.output_entries)
+        files["output_data.json"] = (
+            lambda: json.dumps(output_entries, indent=4),
+            len(output_entries),
+        )
 
-        for output_data in memory.variables.output_data:
-            if output_data.screenshot:
-                async with aiofiles.open(
-                    step_directory
-                    / f"screenshot_{output_data.screenshot.filename}.png",
-                    "wb",
-                ) as f:
-                    await f.write(base64.b64decode(output_data.screenshot.base64))
+        for entry in output_data:
+            if entry.screenshot:
+                image = entry.screenshot.image
+                files[f"screenshot_{entry.screenshot.filename}.{image.extension}"] = (
+                    image,
+                    image,
+                )
+
+        await writer.submit(snapshot)
+        memory.release_screenshots(settings.SCREENSHOTS_IN_MEMORY)
     except Exception as e:
         logger.error(f"Failed to save latest memory state locally: {e}")
 
 
+async def save_step_trace_locally(task: Task, memory: Memory, node_span: Span):
+    """Queue the spans and event loop lag of a finished node to be written to
+    its step directory as trace.json."""
+    try:
+        tracer = get_tracer()
+        step_index = node_span.attributes.get("step_index")
+        # A node that failed before its step started has no step directory.
+        if tracer is None or step_index is None:
+            return
+
+        step_trace = tracer.step_trace(node_span)
+        snapshot = StepSnapshot(step_directory(task, memory, step_index))
+        snapshot.files["trace.json"] = (lambda: json.dumps(step_trace, indent=4), None)
+        await get_state_writer(task, memory).submit(snapshot)
+    except Exception as e:
+        logger.error(f"Failed to save step trace locally: {e}")
+
+
+async def delete_download_staging(task: Task, slot: int | None):
+    """Remove the task's staged partial downloads. Unlike the task directory
+    they are never kept, in any deployment."""
+    await asyncio.to_thread(
+        shutil.rmtree, task.download_staging_directory(slot), ignore_errors=True
+    )
+
+
 async def delete_local_data(task: Task):
     try:
         if settings.DEPLOYMENT == "dev" or task.task_directory is None:
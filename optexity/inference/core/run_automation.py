@@ -1,30 +1,39 @@
 import asyncio
 import logging
 import os
-import shutil
 import time
 import traceback
-from copy import deepcopy
+from collections import ChainMap
 from pathlib import Path
 
 from patchright._impl._errors import TimeoutError as PatchrightTimeoutError
 from playwright._impl._errors import TimeoutError as PlaywrightTimeoutError
+from pydantic import BaseModel
 
 from optexity.inference.core.interaction.utils import (
     _wait_for_file_stable,
+    capture_browser_state,
+    capture_error_screenshot,
     clean_download,
 )
 from optexity.inference.core.logging import (
+    close_memory_state_writer,
     complete_task_in_server,
+    delete_download_staging,
     initiate_callback,
+    release_task_logging,
     save_downloads_in_server,
     save_latest_memory_state_locally,
     save_output_data_in_server,
+    save_step_trace_locally,
     save_trajectory_in_server,
     start_task_in_server,
 )
 from optexity.inference.core.run_assertion import run_assertion_action
-from optexity.inference.core.run_extraction import run_extraction_action
+from optexity.inference.core.run_extraction import (
+    close_download_client,
+    run_extraction_action,
+)
 from optexity.inference.core.run_interaction import (
     handle_download_url_as_pdf,
     run_interaction_action,
@@ -32,22 +41,37 @@ from optexity.inference.core.run_interaction import (
 from optexity.inference.core.run_misc import run_sleep_action
 from optexity.inference.core.run_python_script import run_python_script_action
 from optexity.inference.infra.browser import Browser
+from optexity.inference.infra.cpu_offload import (
+    shutdown_cpu_executor,
+    start_cpu_executor,
+)
+from optexity.inference.infra.download_tracker import (
+    available_path,
+    move_download,
+)
+from optexity.inference.infra.network_capture import NetworkCapture
+from optexity.inference.infra.tracing import (
+    Tracer,
+    export_otlp,
+    set_attributes,
+    span,
+    traced,
+    use_tracer,
+)
 from optexity.schema.actions.interaction_action import DownloadUrlAsPdfAction
 from optexity.schema.automation import ActionNode, ForLoopNode, IfElseNode
-from optexity.schema.memory import BrowserState, ForLoopStatus, Memory, OutputData
+from optexity.schema.memory import (
+    BrowserState,
+    CommandStats,
+    ForLoopStatus,
+    Memory,
+    OutputData,
+)
 from optexity.schema.task import Task
 from optexity.utils.settings import settings
 
 logger = logging.getLogger(__name__)
 
-# TODO: static check that index for all replacement of input variables are within the bounds of the input variables
-
-# TODO: static check that all for loop expansion for generated variables have some place where generated variables are added to the memory
-
-# TODO: Check that all for loop expansion for generated variables have some place where generated variables are added to the memory
-
-# TODO: give a warning where any variable of type {variable_name[index]} is used but variable_name is not in the memory in generated variables or in input variables
-
 DRIVER_CLOSED_MARKERS = (
     "Connection closed",
     "Target closed",
@@ -64,10 +88,51 @@ def is_driver_closed_error(e: Exception) -> bool:
 
 
 async def run_automation(
-    task: Task, unique_child_arn: str, child_process_id: int, max_retries: int = 1
+    task: Task,
+    unique_child_arn: str,
+    child_process_id: int,
+    max_retries: int = 1,
+    debug_port: int | None = None,
+):
+    # Retries run in _run_automation, under the tracer and task span of the
+    # first attempt.
+    tracer = (
+        Tracer(settings.TRACE_LOOP_LAG_INTERVAL) if settings.TRACE_ENABLED else None
+    )
+    try:
+        with (
+            use_tracer(tracer),
+            span("task", task_id=task.task_id, endpoint=task.endpoint_name),
+        ):
+            await _run_automation(
+                task, unique_child_arn, child_process_id, max_retries, debug_port
+            )
+    finally:
+        if tracer is not None and settings.TRACE_OTLP_ENDPOINT:
+            await export_otlp(
+                tracer,
+                settings.TRACE_OTLP_ENDPOINT,
+                {
+                    "service.name": "optexity",
+                    "deployment.environment": settings.DEPLOYMENT,
+                    "task.id": task.task_id,
+                },
+            )
+        # Only after the last attempt, since retries share them.
+        await release_task_logging(task)
+
+
+async def _run_automation(
+    task: Task,
+    unique_child_arn: str,
+    child_process_id: int,
+    max_retries: int = 1,
+    debug_port: int | None = None,
 ):
     if max_retries <= 0:
         return
+    if debug_port is None:
+        debug_port = settings.BROWSER_DEBUG_PORT_OFFSET + child_process_id
     file_handler = logging.FileHandler(str(task.log_file_path))
     file_handler.setLevel(logging.DEBUG)
 
@@ -78,10 +143,18 @@ async def run_automation(
     logger.info(f"Task {task.task_id} started running")
     memory = None
     browser = None
+    # Before the browser starts, so the pool's forked workers hold none of
+    # its pipes.
+    start_cpu_executor()
 
     try:
         await start_task_in_server(task)
-        memory = Memory(unique_child_arn=unique_child_arn)
+        memory = Memory(
+            unique_child_arn=unique_child_arn,
+            max_browser_states=settings.MEMORY_MAX_BROWSER_STATES,
+            max_system_info_samples=settings.MEMORY_MAX_SYSTEM_INFO_SAMPLES,
+            system_info_min_interval=settings.SYSTEM_INFO_MIN_INTERVAL,
+        )
         memory.update_system_info()
 
         def _get_browser():
@@ -89,11 +162,16 @@ async def run_automation(
                 memory=memory,
                 headless=False,
                 channel=task.automation.browser_channel,
-                debug_port=9222 + child_process_id,
+                debug_port=debug_port,
                 use_proxy=task.use_proxy,
+                temp_downloads_dir=str(task.download_staging_directory(debug_port)),
                 proxy_session_id=task.proxy_session_id(
                     settings.PROXY_PROVIDER if task.use_proxy else None
                 ),
+                network_capture=NetworkCapture(
+                    url_patterns=task.automation.network_call_url_patterns(),
+                    content_types=task.automation.network_capture_content_types,
+                ),
             )
 
         browser = _get_browser()
@@ -151,12 +229,8 @@ async def run_automation(
             elif isinstance(node, IfElseNode):
                 await handle_if_else_node(node, memory, task, browser, full_automation)
             else:
-                full_automation.append(node.model_dump())
                 await run_action_node(
-                    node,
-                    task,
-                    memory,
-                    browser,
+                    node, task, memory, browser, full_automation=full_automation
                 )
 
         task.status = "success"
@@ -173,8 +247,8 @@ async def run_automation(
             logger.info(
                 f"Running automations again with {max_retries - 1} retries left"
             )
-            return await run_automation(
-                task, unique_child_arn, child_process_id, max_retries - 1
+            return await _run_automation(
+                task, unique_child_arn, child_process_id, max_retries - 1, debug_port
             )
         else:
             logger.error(f"Error running automation: {traceback.format_exc()}")
@@ -189,6 +263,10 @@ async def run_automation(
             await run_final_logging(task, memory, browser, child_process_id)
         if browser is not None:
             await browser.stop()
+        await delete_download_staging(task, debug_port)
+        await close_download_client()
+        await close_memory_state_writer(task)
+        shutdown_cpu_executor()
 
     logger.info(f"Task {task.task_id} completed with status {task.status}")
     file_handler.flush()
@@ -241,7 +319,13 @@ async def run_final_downloads_check(task: Task, memory: Memory, browser: Browser
 
         already_moved = {p.name for p in memory.downloads}
         temp_dir = browser.temp_downloads_dir
-        if os.path.isdir(temp_dir):
+        tracker = browser.download_tracker
+        if tracker is not None:
+            if not await tracker.wait_idle(timeout=30.0):
+                logger.warning(
+                    f"{len(tracker.in_progress())} downloads still in progress"
+                )
+        elif os.path.isdir(temp_dir):
             crdownload_timeout = 30.0
             crdownload_poll = 1.0
             crdownload_elapsed = 0.0
@@ -257,6 +341,7 @@ async def run_final_downloads_check(task: Task, memory: Memory, browser: Browser
                 await asyncio.sleep(crdownload_poll)
                 crdownload_elapsed += crdownload_poll
 
+        if os.path.isdir(temp_dir):
             for entry in os.scandir(temp_dir):
                 if not entry.is_file():
                     continue
@@ -266,11 +351,21 @@ async def run_final_downloads_check(task: Task, memory: Memory, browser: Browser
                     logger.warning(f"Skipping incomplete download: {entry.name}")
                     continue
                 src = Path(entry.path)
-                if not await _wait_for_file_stable(src):
-                    logger.warning(f"Skipping unstable temp download: {src}")
-                    continue
-                dest = task.downloads_directory / entry.name
-                shutil.move(str(src), str(dest))
+                # Tracked downloads are saved under their GUID.
+                tracked = tracker.downloads.get(entry.name) if tracker else None
+                if tracked is not None:
+                    if tracked.state != "completed":
+                        logger.warning(f"Skipping {tracked.state} download: {src}")
+                        continue
+                    dest = available_path(
+                        task.downloads_directory, tracked.suggested_filename
+                    )
+                else:
+                    if not await _wait_for_file_stable(src):
+                        logger.warning(f"Skipping unstable temp download: {src}")
+                        continue
+                    dest = task.downloads_directory / entry.name
+                move_download(src, dest)
                 memory.downloads.append(dest)
                 logger.info(f"Recovered leftover download: {src} -> {dest}")
 
@@ -292,14 +387,16 @@ async def run_final_logging(
         try:
             memory.automation_state.step_index += 1
             browser_state_summary = await browser.get_browser_state_summary()
-            memory.browser_states.append(
+            memory.add_browser_state(
                 BrowserState(
                     url=browser_state_summary.url,
                     screenshot=browser_state_summary.screenshot,
                     title=browser_state_summary.title,
-                    axtree=browser_state_summary.dom_state.llm_representation(
-                        remove_empty_nodes=task.automation.remove_empty_nodes_in_axtree
+                    axtree=browser.get_axtree(
+                        browser_state_summary,
+                        task.automation.remove_empty_nodes_in_axtree,
                     ),
+                    system_info=memory.update_system_info(),
                 )
             )
 
@@ -322,103 +419,180 @@ async def run_action_node(
     task: Task,
     memory: Memory,
     browser: Browser,
+    loop_indices: dict[str, int] | None = None,
+    full_automation: list[dict] | None = None,
+):
+    node_span = None
+    try:
+        with span("node", lane=memory.logs_subdirectory) as node_span:
+            await _run_action_node(
+                action_node, task, memory, browser, loop_indices, full_automation
+            )
+    finally:
+        if node_span is not None:
+            await save_step_trace_locally(task, memory, node_span)
+
+
+async def _run_action_node(
+    action_node: ActionNode,
+    task: Task,
+    memory: Memory,
+    browser: Browser,
+    loop_indices: dict[str, int] | None = None,
+    full_automation: list[dict] | None = None,
 ):
     memory.update_system_info()
-    await asyncio.sleep(action_node.before_sleep_time)
+    wait_times: dict[str, float] = {}
+    with span("before_sleep", wait_for_settle=action_node.wait_for_settle):
+        if action_node.wait_for_settle:
+            wait_times["before"] = await browser.wait_for_page_settle(
+                action_node.before_sleep_time
+            )
+        else:
+            await asyncio.sleep(action_node.before_sleep_time)
+            wait_times["before"] = action_node.before_sleep_time
     await browser.handle_new_tabs(0)
 
     memory.automation_state.step_index += 1
     memory.automation_state.try_index = 0
-
-    await action_node.replace_variables(task.input_parameters)
-    await action_node.replace_variables(task.secure_parameters)
-    await action_node.replace_variables(memory.variables.generated_variables)
-
-    # ## TODO: optimize this by taking screenshot and axtree only if needed
-    # browser_state_summary = await browser.get_browser_state_summary()
-
-    memory.browser_states.append(
-        BrowserState(
-            url=await browser.get_current_page_url(),
-            screenshot=await browser.get_screenshot(),
-            title=await browser.get_current_page_title(),
-            axtree=None,
+    set_attributes(step_index=memory.automation_state.step_index)
+
+    node = action_node
+    action_node = await node.render(
+        [
+            task.input_parameters,
+            task.secure_parameters,
+            memory.variables.generated_variables,
+        ],
+        loop_indices,
+    )
+    if full_automation is not None:
+        # Record the node as it runs, with secure parameters left as
+        # placeholders.
+        recorded = await node.render(
+            [task.input_parameters, memory.variables.generated_variables],
+            loop_indices,
         )
+        full_automation.append(recorded.model_dump())
+
+    memory.automation_state.capture_policy = (
+        action_node.capture_policy or task.automation.capture_policy
     )
+    memory.add_browser_state(await capture_browser_state(memory, browser, "step"))
 
     logger.debug(f"-----Running node new {memory.automation_state.step_index}-----")
 
     try:
-        if action_node.interaction_action:
-            ## Assuming network calls are only made during interaction actions and not during extraction actions
-            await browser.clear_network_calls()
+        with span("action", type=action_type(action_node)):
+            if action_node.interaction_action:
+                ## Assuming network calls are only made during interaction actions and not during extraction actions
+                await browser.clear_network_calls()
 
-            await run_interaction_action(
-                action_node.interaction_action, task, memory, browser, 2
-            )
-        elif action_node.extraction_action:
-            await run_extraction_action(
-                action_node.extraction_action, memory, browser, task
-            )
-        elif action_node.python_script_action:
-            await run_python_script_action(
-                action_node.python_script_action, memory, browser
+                try:
+                    await run_interaction_action(
+                        action_node.interaction_action, task, memory, browser, 2
+                    )
+                finally:
+                    browser.invalidate_page_caches()
+            elif action_node.extraction_action:
+                await run_extraction_action(
+                    action_node.extraction_action, memory, browser, task
+                )
+            elif action_node.python_script_action:
+                await run_python_script_action(
+                    action_node.python_script_action, memory, browser
+                )
+            elif action_node.sleep_action:
+                await run_sleep_action(action_node.sleep_action)
+            elif action_node.assertion_action:
+                await run_assertion_action(
+                    action_node.assertion_action, memory, browser, task
+                )
+
+        if action_node.expect_new_tab:
+            found_new_tab, total_time = await browser.handle_new_tabs(
+                action_node.max_new_tab_wait_time
             )
-        elif action_node.sleep_action:
-            await run_sleep_action(action_node.sleep_action)
-        elif action_node.assertion_action:
-            await run_assertion_action(
-                action_node.assertion_action, memory, browser, task
+            wait_times["after"] = total_time
+            if not found_new_tab:
+                logger.warning(
+                    f"No new tab found after {action_node.max_new_tab_wait_time} seconds, even though expect_new_tab is True"
+                )
+            else:
+                logger.debug(
+                    f"Switched to new tab after {total_time} seconds, as expected"
+                )
+
+        else:
+            wait_times["after"] = await sleep_for_page_to_load(
+                browser, action_node.end_sleep_time, action_node.wait_for_settle
             )
 
     except Exception as e:
         logger.error(f"Error running node {memory.automation_state.step_index}: {e}")
+        await capture_error_screenshot(memory, browser)
         raise e
     finally:
+        memory.browser_states[-1].wait_times.update(wait_times)
         await save_latest_memory_state_locally(task, memory, action_node)
         if memory.automation_state.step_index % 5 == 0:
             await save_trajectory_in_server(task)
 
-    if action_node.expect_new_tab:
-        found_new_tab, total_time = await browser.handle_new_tabs(
-            action_node.max_new_tab_wait_time
-        )
-        if not found_new_tab:
-            logger.warning(
-                f"No new tab found after {action_node.max_new_tab_wait_time} seconds, even though expect_new_tab is True"
-            )
-        else:
-            logger.debug(f"Switched to new tab after {total_time} seconds, as expected")
-
-    else:
-        await sleep_for_page_to_load(browser, action_node.end_sleep_time)
-
     logger.debug(f"-----Finished node {memory.automation_state.step_index}-----")
     memory.update_system_info()
 
 
-async def sleep_for_page_to_load(browser: Browser, sleep_time: float):
+def action_type(action_node: ActionNode) -> str | None:
+    """The kind of action a node runs, e.g. "interaction.click_element"."""
+    for name in (
+        "interaction_action",
+        "extraction_action",
+        "python_script_action",
+        "sleep_action",
+        "assertion_action",
+    ):
+        action = getattr(action_node, name)
+        if action is None:
+            continue
+        kind = name.removesuffix("_action")
+        sub_action = next(
+            (field for field, value in action if isinstance(value, BaseModel)), None
+        )
+        return f"{kind}.{sub_action}" if sub_action else kind
+    return None
+
+
+@traced("after_sleep")
+async def sleep_for_page_to_load(
+    browser: Browser, sleep_time: float, wait_for_settle: bool = False
+) -> float:
+    """Wait for the page after a node and return the time spent waiting."""
+    start = time.monotonic()
     await asyncio.sleep(0.1)
 
     sleep_time = max(0.0, sleep_time - 0.1)
 
     if float(sleep_time) == 0.0:
-        return
+        return time.monotonic() - start
+
+    if wait_for_settle:
+        await browser.wait_for_page_settle(sleep_time)
+        return time.monotonic() - start
 
     page = await browser.get_current_page()
     if page is None:
-        return
+        return time.monotonic() - start
     try:
         await page.wait_for_load_state("load", timeout=sleep_time * 1000)
     except (TimeoutError, PatchrightTimeoutError, PlaywrightTimeoutError):
         pass
+    return time.monotonic() - start
 
 
-def evaluate_condition(condition: str, memory: Memory, task: Task) -> bool:
-    return eval(
-        condition,
-        {},
-        {**task.input_parameters, **memory.variables.generated_variables},
+def evaluate_condition(if_else_node: IfElseNode, memory: Memory, task: Task) -> bool:
+    # Generated variables shadow input parameters of the same name.
+    return if_else_node.evaluate_condition(
+        ChainMap(memory.variables.generated_variables, task.input_parameters)
     )
 
 
@@ -427,13 +601,14 @@ async def handle_if_else_node(
     memory: Memory,
     task: Task,
     browser: Browser,
-    full_automation: list[ActionNode],
+    full_automation: list[dict],
+    loop_indices: dict[str, int] | None = None,
 ):
     memory.update_system_info()
     logger.debug(
         f"Handling if else node {if_else_node.condition} with if nodes {if_else_node.if_nodes} and else nodes {if_else_node.else_nodes}"
     )
-    condition_result = evaluate_condition(if_else_node.condition, memory, task)
+    condition_result = evaluate_condition(if_else_node, memory, task)
     if condition_result:
         nodes = if_else_node.if_nodes
     else:
@@ -441,17 +616,17 @@ async def handle_if_else_node(
 
     for node in nodes:
         if isinstance(node, ActionNode):
-            full_automation.append(node.model_dump())
             await run_action_node(
-                node,
-                task,
-                memory,
-                browser,
+                node, task, memory, browser, loop_indices, full_automation
             )
         elif isinstance(node, IfElseNode):
-            await handle_if_else_node(node, memory, task, browser, full_automation)
+            await handle_if_else_node(
+                node, memory, task, browser, full_automation, loop_indices
+            )
         elif isinstance(node, ForLoopNode):
-            await handle_for_loop_node(node, memory, task, browser, full_automation)
+            await handle_for_loop_node(
+                node, memory, task, browser, full_automation, loop_indices
+            )
 
     logger.debug(f"Finished handling if else node {if_else_node.condition}")
     memory.update_system_info()
@@ -462,7 +637,8 @@ async def handle_for_loop_node(
     memory: Memory,
     task: Task,
     browser: Browser,
-    full_automation: list[ActionNode],
+    full_automation: list[dict],
+    loop_indices: dict[str, int] | None = None,
 ):
     memory.update_system_info()
     if for_loop_node.variable_name in task.input_parameters:
@@ -474,32 +650,26 @@ async def handle_for_loop_node(
             f"Variable name {for_loop_node.variable_name} not found in input variables or generated variables"
         )
     memory.variables.for_loop_status.append([])
-    for index in range(len(values)):
 
-        try:
-            for node in for_loop_node.nodes:
-                new_node = deepcopy(node)
-                new_node.replace(
-                    f"{{{for_loop_node.variable_name}[index]}}",
-                    f"{{{for_loop_node.variable_name}[{index}]}}",
-                )
-                new_node.replace(
-                    f"{{index_of({for_loop_node.variable_name})}}", f"{index}"
-                )
+    if for_loop_node.parallelism > 1 and len(values) > 1:
+        await handle_parallel_for_loop_node(
+            for_loop_node, values, memory, task, browser, full_automation, loop_indices
+        )
+        memory.update_system_info()
+        return
 
-                if isinstance(new_node, IfElseNode):
-                    await handle_if_else_node(
-                        new_node, memory, task, browser, full_automation
-                    )
+    for index in range(len(values)):
 
-                else:
-                    full_automation.append(new_node.model_dump())
-                    await run_action_node(
-                        new_node,
-                        task,
-                        memory,
-                        browser,
-                    )
+        try:
+            await run_for_loop_iteration(
+                for_loop_node,
+                index,
+                memory,
+                task,
+                browser,
+                full_automation,
+                loop_indices,
+            )
             memory.variables.for_loop_status[-1].append(
                 ForLoopStatus(
                     variable_name=for_loop_node.variable_name,
@@ -539,21 +709,226 @@ async def handle_for_loop_node(
                 raise e
 
         if index < len(values) - 1:
-            for node in for_loop_node.reset_nodes:
-                if isinstance(node, IfElseNode):
-                    await handle_if_else_node(
-                        node, memory, task, browser, full_automation
+            await run_for_loop_reset_nodes(
+                for_loop_node, memory, task, browser, full_automation, loop_indices
+            )
+    memory.update_system_info()
+
+
+async def run_for_loop_iteration(
+    for_loop_node: ForLoopNode,
+    index: int,
+    memory: Memory,
+    task: Task,
+    browser: Browser,
+    full_automation: list[dict],
+    loop_indices: dict[str, int] | None = None,
+):
+    # Nodes are rendered with the loop index instead of being copied per
+    # iteration.
+    loop_indices = {**(loop_indices or {}), for_loop_node.variable_name: index}
+    for node in for_loop_node.nodes:
+        if isinstance(node, IfElseNode):
+            await handle_if_else_node(
+                node, memory, task, browser, full_automation, loop_indices
+            )
+
+        else:
+            await run_action_node(
+                node, task, memory, browser, loop_indices, full_automation
+            )
+
+
+async def run_for_loop_reset_nodes(
+    for_loop_node: ForLoopNode,
+    memory: Memory,
+    task: Task,
+    browser: Browser,
+    full_automation: list[dict],
+    loop_indices: dict[str, int] | None = None,
+):
+    for node in for_loop_node.reset_nodes:
+        if isinstance(node, IfElseNode):
+            await handle_if_else_node(
+                node, memory, task, browser, full_automation, loop_indices
+            )
+
+        else:
+            await run_action_node(
+                node, task, memory, browser, loop_indices, full_automation
+            )
+
+
+class ForLoopIterationResult:
+    """What one iteration of a parallel for loop added to its lane's memory."""
+
+    def __init__(self, lane_memory: Memory):
+        self.lane_memory = lane_memory
+        self.full_automation: list[dict] = []
+        self.error: Exception | None = None
+        self._start = self._marks()
+        self._generated_variables = dict(lane_memory.variables.generated_variables)
+
+    def _marks(self) -> tuple[int, int, int, int]:
+        return (
+            len(self.lane_memory.variables.output_data),
+            len(self.lane_memory.variables.for_loop_status),
+            len(self.lane_memory.downloads),
+            len(self.lane_memory.urls_to_downloads),
+        )
+
+    def finish(self):
+        lane = self.lane_memory
+        start, end = self._start, self._marks()
+        self.output_data = lane.variables.output_data[start[0] : end[0]]
+        self.for_loop_status = lane.variables.for_loop_status[start[1] : end[1]]
+        self.downloads = lane.downloads[start[2] : end[2]]
+        self.urls_to_downloads = lane.urls_to_downloads[start[3] : end[3]]
+        self.generated_variables = {
+            key: value
+            for key, value in lane.variables.generated_variables.items()
+            if self._generated_variables.get(key) is not value
+        }
+
+    def merge_into(self, memory: Memory):
+        memory.variables.output_data.extend(self.output_data)
+        memory.variables.for_loop_status.extend(self.for_loop_status)
+        memory.downloads.extend(self.downloads)
+        memory.urls_to_downloads.extend(self.urls_to_downloads)
+        memory.variables.generated_variables.update(self.generated_variables)
+
+
+async def handle_parallel_for_loop_node(
+    for_loop_node: ForLoopNode,
+    values: list,
+    memory: Memory,
+    task: Task,
+    browser: Browser,
+    full_automation: list[dict],
+    loop_indices: dict[str, int] | None = None,
+):
+    """Run the iterations of a for loop in up to `parallelism` browser lanes.
+
+    Each lane is a new tab of the same browser context, started at the current
+    page's URL, with its own memory. Lanes take the next index as they become
+    free and run the reset nodes between their own iterations. Outputs,
+    generated variables, downloads and statuses are merged in index order.
+    A lane starts from the generated variables as they were when the loop
+    started and only sees those of its own earlier iterations, so iterations
+    that read variables generated by earlier ones can differ from a
+    sequential run. After an error
+    with on_error_in_loop "break" or "raise", no new iterations start, and the
+    results of iterations after the first failed one are discarded.
+    """
+    status_list = memory.variables.for_loop_status[-1]
+    start_url = await browser.get_current_page_url()
+    loop_name = f"for_loop_{len(memory.variables.for_loop_status)}"
+    indices = iter(range(len(values)))
+    results: dict[int, ForLoopIterationResult] = {}
+    lane_errors: list[Exception] = []
+    stop = False
+
+    async def run_lane(lane_id: int):
+        nonlocal stop
+        lane_memory = memory.fork(f"{loop_name}_lane_{lane_id}")
+        lane_browser = None
+        try:
+            lane_browser = await browser.open_lane(
+                lane_memory,
+                NetworkCapture(
+                    url_patterns=task.automation.network_call_url_patterns(),
+                    content_types=task.automation.network_capture_content_types,
+                ),
+            )
+            await lane_browser.go_to_url(start_url)
+
+            first = True
+            for index in indices:
+                if stop:
+                    break
+                if not first:
+                    await run_for_loop_reset_nodes(
+                        for_loop_node, lane_memory, task, lane_browser, [], loop_indices
                     )
+                first = False
 
-                else:
-                    full_automation.append(node.model_dump())
-                    await run_action_node(
-                        node,
+                result = ForLoopIterationResult(lane_memory)
+                results[index] = result
+                try:
+                    await run_for_loop_iteration(
+                        for_loop_node,
+                        index,
+                        lane_memory,
                         task,
-                        memory,
-                        browser,
+                        lane_browser,
+                        result.full_automation,
+                        loop_indices,
                     )
-    memory.update_system_info()
+                except Exception as e:
+                    logger.error(
+                        f"Error running for loop node {for_loop_node.variable_name} "
+                        f"at index {index} in lane {lane_id}: {e}"
+                    )
+                    result.error = e
+                    if for_loop_node.on_error_in_loop != "continue":
+                        stop = True
+                finally:
+                    result.finish()
+        except Exception as e:
+            logger.error(f"Error in for loop lane {lane_id}: {e}")
+            lane_errors.append(e)
+            stop = True
+        finally:
+            if lane_browser is not None:
+                await lane_browser.stop()
+            await close_memory_state_writer(task, lane_memory)
+            memory.token_usage += lane_memory.token_usage
+            for command, stats in lane_memory.command_stats.items():
+                memory.command_stats.setdefault(command, CommandStats()).merge(stats)
+
+    lanes = min(for_loop_node.parallelism, len(values))
+    logger.debug(
+        f"Running {len(values)} iterations of for loop node "
+        f"{for_loop_node.variable_name} in {lanes} lanes"
+    )
+    await asyncio.gather(*(run_lane(lane_id) for lane_id in range(lanes)))
+
+    failed = [index for index, result in results.items() if result.error is not None]
+    last_index = len(values) - 1
+    if failed and for_loop_node.on_error_in_loop != "continue":
+        last_index = min(failed)
+
+    for index in range(last_index + 1):
+        result = results.get(index)
+        if result is None:
+            continue
+        result.merge_into(memory)
+        full_automation.extend(result.full_automation)
+        status_list.append(
+            ForLoopStatus(
+                variable_name=for_loop_node.variable_name,
+                index=index,
+                value=values[index],
+                status="success" if result.error is None else "error",
+                error=str(result.error) if result.error is not None else None,
+            )
+        )
+
+    if lane_errors:
+        raise lane_errors[0]
+
+    if failed and for_loop_node.on_error_in_loop == "break":
+        for index in range(last_index + 1, len(values)):
+            status_list.append(
+                ForLoopStatus(
+                    variable_name=for_loop_node.variable_name,
+                    index=index,
+                    value=values[index],
+                    status="skipped",
+                )
+            )
+    elif failed and for_loop_node.on_error_in_loop == "raise":
+        raise results[last_index].error
 
 
 async def run_post_processing_nodes(task: Task, memory: Memory, browser: Browser):
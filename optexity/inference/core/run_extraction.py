@@ -1,5 +1,9 @@
+import asyncio
 import logging
+import os
 import traceback
+from pathlib import Path
+from uuid import uuid4
 
 import aiofiles
 import httpx
@@ -20,15 +24,67 @@ from optexity.schema.memory import (
     BrowserState,
     Memory,
     NetworkRequest,
-    NetworkResponse,
     OutputData,
     ScreenshotData,
 )
 from optexity.schema.task import Task
+from optexity.utils.settings import settings
 
 logger = logging.getLogger(__name__)
 
-llm_model = get_llm_model(GeminiModels.GEMINI_2_5_FLASH, True)
+# Response bodies are written to disk in chunks of this size.
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+_download_client: httpx.AsyncClient | None = None
+
+
+def get_download_client() -> httpx.AsyncClient:
+    """Pooled client shared by network call downloads of the running task."""
+    global _download_client
+    if _download_client is None:
+        _download_client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=settings.NETWORK_DOWNLOAD_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.NETWORK_DOWNLOAD_CONCURRENCY,
+                max_keepalive_connections=settings.NETWORK_DOWNLOAD_CONCURRENCY,
+            ),
+        )
+    return _download_client
+
+
+async def close_download_client():
+    global _download_client
+    if _download_client is not None:
+        await _download_client.aclose()
+        _download_client = None
+
+
+async def stream_download(
+    method: str,
+    url: str,
+    download_path: Path,
+    headers: dict[str, str] | None = None,
+    content: bytes | None = None,
+) -> int:
+    """Stream a response body into `download_path` chunk by chunk and return
+    its size. The body goes to a hidden partial file first, which is renamed
+    into place once complete; raises on an error status."""
+    partial_path = download_path.with_name(f".{download_path.name}.part")
+    size = 0
+    try:
+        async with get_download_client().stream(
+            method, url, headers=headers, content=content
+        ) as response:
+            response.raise_for_status()
+            async with aiofiles.open(partial_path, "wb") as f:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    await f.write(chunk)
+                    size += len(chunk)
+        os.replace(partial_path, download_path)
+    finally:
+        partial_path.unlink(missing_ok=True)
+    return size
 
 
 async def run_extraction_action(
@@ -107,17 +163,15 @@ async def handle_screenshot_extraction(
     unique_identifier: str | None = None,
 ):
 
-    screenshot_base64 = await browser.get_screenshot(
-        full_page=screenshot_extraction.full_page
-    )
-    if screenshot_base64 is None:
+    screenshot = await browser.get_screenshot(full_page=screenshot_extraction.full_page)
+    if screenshot is None:
         return
 
     memory.variables.output_data.append(
         OutputData(
             unique_identifier=unique_identifier,
             screenshot=ScreenshotData(
-                filename=screenshot_extraction.filename, base64=screenshot_base64
+                filename=screenshot_extraction.filename, image=screenshot
             ),
         )
     )
@@ -135,12 +189,12 @@ async def handle_llm_extraction(
         url=browser_state_summary.url,
         screenshot=browser_state_summary.screenshot,
         title=browser_state_summary.title,
-        axtree=browser_state_summary.dom_state.llm_representation(
-            remove_empty_nodes=task.automation.remove_empty_nodes_in_axtree
+        axtree=browser.get_axtree(
+            browser_state_summary, task.automation.remove_empty_nodes_in_axtree
         ),
+        system_info=memory.update_system_info(),
     )
 
-    # TODO: fix this double calling of screenshot and axtree
     if "axtree" in llm_extraction.source:
         axtree = memory.browser_states[-1].axtree
     else:
@@ -165,11 +219,11 @@ async def handle_llm_extraction(
 
     if llm_extraction.llm_provider == "gemini":
         model_name = GeminiModels(llm_extraction.llm_model_name)
-        llm_model.model_name = model_name
+        llm_model = get_llm_model(model_name, True)
     else:
         raise ValueError(f"Invalid LLM provider: {llm_extraction.llm_provider}")
 
-    response, token_usage = llm_model.get_model_response_with_structured_output(
+    response, token_usage = await llm_model.aget_model_response_with_structured_output(
         prompt=prompt,
         response_schema=llm_extraction.build_model(),
         screenshot=screenshot,
@@ -214,23 +268,39 @@ async def handle_network_call_extraction(
     unique_identifier: str | None = None,
 ):
 
-    for network_call in browser.network_calls:
-        if network_call_extraction.url_pattern not in network_call.url:
-            continue
-
-        if network_call_extraction.download_from == "request" and isinstance(
-            network_call, NetworkRequest
-        ):
-            await download_request(
-                network_call, network_call_extraction.download_filename, task, memory
-            )
+    if network_call_extraction.download_from == "request":
+        requests_to_download = browser.network_calls.find(
+            network_call_extraction.url_pattern,
+            network_call_extraction.url_pattern_type,
+            kind="request",
+            method=network_call_extraction.method,
+        )
+        download_filename = network_call_extraction.download_filename or str(uuid4())
+        semaphore = asyncio.Semaphore(settings.NETWORK_DOWNLOAD_CONCURRENCY)
+
+        async def _download(index: int, network_call: NetworkRequest):
+            # Every match after the first gets a numbered filename so concurrent
+            # downloads never write to the same file.
+            filename = download_filename
+            if index > 0:
+                path = Path(download_filename)
+                filename = f"{path.stem}_{index}{path.suffix}"
+            async with semaphore:
+                await download_request(network_call, filename, task, memory)
+
+        await asyncio.gather(
+            *[
+                _download(index, network_call)
+                for index, network_call in enumerate(requests_to_download)
+            ]
+        )
 
-        if (
-            network_call_extraction.extract_from == "request"
-            and isinstance(network_call, NetworkRequest)
-        ) or (
-            network_call_extraction.extract_from == "response"
-            and isinstance(network_call, NetworkResponse)
+    if network_call_extraction.extract_from is not None:
+        for network_call in browser.network_calls.find(
+            network_call_extraction.url_pattern,
+            network_call_extraction.url_pattern_type,
+            kind=network_call_extraction.extract_from,
+            method=network_call_extraction.method,
         ):
             memory.variables.output_data.append(
                 OutputData(
@@ -269,20 +339,15 @@ async def download_request(
     network_call: NetworkRequest, download_filename: str, task: Task, memory: Memory
 ):
     try:
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.request(
-                network_call.method,
-                network_call.url,
-                headers=network_call.headers,
-                content=network_call.body,  # not data=
-            )
-
-            response.raise_for_status()
-
         # Save raw response to PDF
         download_path = task.downloads_directory / download_filename
-        async with aiofiles.open(download_path, "wb") as f:
-            await f.write(response.content)
+        await stream_download(
+            network_call.method,
+            network_call.url,
+            download_path,
+            headers=network_call.headers,
+            content=network_call.body,  # not data=
+        )
 
         memory.downloads.append(download_path)
     except Exception as e:
@@ -312,12 +377,12 @@ async def handle_pdf_extraction(pdf_extraction: PDFExtraction, memory: Memory):
 
     if pdf_extraction.llm_provider == "gemini":
         model_name = GeminiModels(pdf_extraction.llm_model_name)
-        llm_model.model_name = model_name
+        llm_model = get_llm_model(model_name, True)
     else:
         raise ValueError(f"Invalid LLM provider: {pdf_extraction.llm_provider}")
 
     system_instruction = "Extract the information from the PDF file and return it in the format specified by the instructions."
-    response, token_usage = llm_model.get_model_response_with_structured_output(
+    response, token_usage = await llm_model.aget_model_response_with_structured_output(
         prompt=pdf_extraction.extraction_instructions,
         response_schema=pdf_extraction.build_model(),
         pdf_url=pdf_file,
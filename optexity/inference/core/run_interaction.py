@@ -2,7 +2,7 @@ import asyncio
 import logging
 from datetime import datetime, timezone
 
-import aiofiles
+import httpx
 
 from optexity.exceptions import AssertLocatorPresenceException
 from optexity.inference.agents.error_handler.error_handler import ErrorHandlerAgent
@@ -17,6 +17,7 @@ from optexity.inference.core.interaction.handle_input import handle_input_text
 from optexity.inference.core.interaction.handle_keypress import handle_key_press
 from optexity.inference.core.interaction.handle_select import handle_select_option
 from optexity.inference.core.interaction.handle_upload import handle_upload_file
+from optexity.inference.core.run_extraction import stream_download
 from optexity.inference.infra.browser import Browser
 from optexity.schema.actions.interaction_action import (
     CloseOverlayPopupAction,
@@ -29,7 +30,14 @@ from optexity.schema.actions.interaction_action import (
 from optexity.schema.memory import BrowserState, Memory, OutputData
 from optexity.schema.task import Task
 
-error_handler_agent = ErrorHandlerAgent()
+_error_handler_agent: ErrorHandlerAgent | None = None
+
+
+def get_error_handler_agent() -> ErrorHandlerAgent:
+    global _error_handler_agent
+    if _error_handler_agent is None:
+        _error_handler_agent = ErrorHandlerAgent()
+    return _error_handler_agent
 
 
 logger = logging.getLogger(__name__)
@@ -201,16 +209,22 @@ async def handle_download_url_as_pdf(
         task.downloads_directory / download_url_as_pdf_action.download_filename
     )
 
-    resp = await browser.context.request.get(pdf_url)
+    # Streamed with the context's cookies for the URL rather than through
+    # context.request, which buffers the whole body in memory.
+    cookies = await browser.context.cookies([pdf_url])
+    headers = {"cookie": "; ".join(f"{c['name']}={c['value']}" for c in cookies)}
+    try:
+        page = await browser.get_current_page()
+        headers["user-agent"] = await page.evaluate("navigator.userAgent")
+    except Exception as e:
+        logger.debug(f"Could not read the browser user agent: {e}")
 
-    if not resp.ok:
-        logger.error(f"Failed to download PDF: {resp.status}")
+    try:
+        await stream_download("GET", pdf_url, download_path, headers=headers)
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Failed to download PDF: {e.response.status_code}")
         return
 
-    content = await resp.body()
-    async with aiofiles.open(download_path, "wb") as f:
-        await f.write(content)
-
     memory.downloads.append(download_path)
 
 
@@ -229,11 +243,16 @@ async def handle_assert_locator_presence_error(
             url=browser_state_summary.url,
             screenshot=browser_state_summary.screenshot,
             title=browser_state_summary.title,
-            axtree=browser_state_summary.dom_state.llm_representation(
-                remove_empty_nodes=task.automation.remove_empty_nodes_in_axtree
+            axtree=browser.get_axtree(
+                browser_state_summary, task.automation.remove_empty_nodes_in_axtree
             ),
+            system_info=memory.update_system_info(),
         )
-        final_prompt, response, token_usage = error_handler_agent.classify_error(
+        (
+            final_prompt,
+            response,
+            token_usage,
+        ) = await get_error_handler_agent().classify_error(
             error.command, memory.browser_states[-1].screenshot
         )
         memory.token_usage += token_usage
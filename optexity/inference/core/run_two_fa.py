@@ -8,6 +8,7 @@ import httpx
 from optexity.inference.agents.two_fa_extraction.two_fa_extraction import (
     TwoFAExtraction,
 )
+from optexity.inference.infra.control_plane import get_control_plane_client
 from optexity.schema.actions.two_fa_action import (
     EmailTwoFAAction,
     SlackTwoFAAction,
@@ -24,7 +25,14 @@ from optexity.utils.settings import settings
 
 logger = logging.getLogger(__name__)
 
-two_fa_extraction_agent = TwoFAExtraction()
+_two_fa_extraction_agent: TwoFAExtraction | None = None
+
+
+def get_two_fa_extraction_agent() -> TwoFAExtraction:
+    global _two_fa_extraction_agent
+    if _two_fa_extraction_agent is None:
+        _two_fa_extraction_agent = TwoFAExtraction()
+    return _two_fa_extraction_agent
 
 
 async def run_two_fa_action(two_fa_action: TwoFAAction, memory: Memory, task: Task):
@@ -41,7 +49,11 @@ async def run_two_fa_action(two_fa_action: TwoFAAction, memory: Memory, task: Ta
             two_fa_action.action, memory, two_fa_action.max_wait_time, task
         )
         if messages and len(messages) > 0:
-            final_prompt, response, token_usage = two_fa_extraction_agent.extract_code(
+            (
+                final_prompt,
+                response,
+                token_usage,
+            ) = await get_two_fa_extraction_agent().extract_code(
                 two_fa_action.instructions, messages
             )
             memory.token_usage += token_usage
@@ -115,15 +127,14 @@ async def fetch_messages(
         )
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-
-            response = await client.post(
-                url, json=body.model_dump(mode="json"), headers=headers
-            )
-            response.raise_for_status()
-            response_data = FetchMessagesResponse.model_validate(response.json())
+        client = get_control_plane_client()
+        response = await client.post(
+            url, json=body.model_dump(mode="json"), headers=headers, idempotent=True
+        )
+        response.raise_for_status()
+        response_data = FetchMessagesResponse.model_validate(response.json())
 
-            return response_data.messages
+        return response_data.messages
     except Exception as e:
         logger.error(f"Error fetching messages: {e}")
         return []
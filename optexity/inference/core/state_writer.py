@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from optexity.schema.screenshot import Screenshot
+
+logger = logging.getLogger(__name__)
+
+# Past this many unwritten steps, submitting waits for the writer to catch up.
+MAX_PENDING_SNAPSHOTS = 16
+
+FileContent = str | bytes | Screenshot | Callable[[], str | bytes]
+
+
+@dataclass
+class StepSnapshot:
+    """Files to write into one step directory.
+
+    Each file maps to (content, key). Content is text, bytes, a Screenshot
+    (which is then backed by the written file), or a callable producing text
+    or bytes, which runs on the writer thread. When key is not None
+    and equals the key the same file had in the previous step, that file is
+    hard linked instead of written again.
+    """
+
+    step_directory: Path
+    files: dict[str, tuple[FileContent, Any]] = field(default_factory=dict)
+
+
+class MemoryStateWriter:
+    """Write-behind persistence for the per-step memory state of one task.
+
+    Snapshots are queued on the event loop and written in order by a single
+    background task, off the critical path of the node that produced them.
+    Snapshots for the same step directory that are still queued are merged.
+    `flush` waits until everything queued so far is on disk.
+    """
+
+    def __init__(self):
+        self._pending: dict[Path, StepSnapshot] = {}
+        self._task: asyncio.Task | None = None
+        self._last: dict[str, tuple[Any, Path]] = {}
+        # Serialized output_data entries; output_data is append-only.
+        self.output_entries: list[dict] = []
+
+    async def submit(self, snapshot: StepSnapshot):
+        if len(self._pending) >= MAX_PENDING_SNAPSHOTS:
+            await self.flush()
+
+        pending = self._pending.get(snapshot.step_directory)
+        if pending is not None:
+            pending.files.update(snapshot.files)
+        else:
+            self._pending[snapshot.step_directory] = snapshot
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def flush(self):
+        while self._task is not None and not self._task.done():
+            await asyncio.shield(self._task)
+
+    async def _run(self):
+        while self._pending:
+            step_directory = next(iter(self._pending))
+            snapshot = self._pending.pop(step_directory)
+            try:
+                await asyncio.to_thread(self._write, snapshot)
+            except Exception as e:
+                logger.error(f"Failed to save memory state in {step_directory}: {e}")
+
+    def _write(self, snapshot: StepSnapshot):
+        snapshot.step_directory.mkdir(parents=True, exist_ok=True)
+        for name, (content, key) in snapshot.files.items():
+            path = snapshot.step_directory / name
+            previous = self._last.get(name)
+            if (
+                key is not None
+                and previous is not None
+                and previous[0] == key
+                and _link(previous[1], path)
+            ):
+                continue
+
+            if isinstance(content, Screenshot):
+                _atomic_write(path, content.data)
+                content.attach_file(path)
+            else:
+                _atomic_write(path, content() if callable(content) else content)
+            self._last[name] = (key, path)
+
+
+def _link(source: Path, path: Path) -> bool:
+    if source == path:
+        return source.exists()
+    try:
+        path.unlink(missing_ok=True)
+        os.link(source, path)
+    except OSError:
+        return False
+    return True
+
+
+def _atomic_write(path: Path, content: str | bytes):
+    # Replace rather than truncate: the old file may be hard linked from an
+    # earlier step.
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    if isinstance(content, str):
+        tmp_path.write_text(content)
+    else:
+        tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
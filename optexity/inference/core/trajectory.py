@@ -0,0 +1,254 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import tarfile
+import tempfile
+from pathlib import Path
+from typing import IO
+
+from optexity.inference.infra.cpu_offload import run_cpu
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = ".trajectory_manifest.json"
+
+# Two zero blocks terminate a tar archive.
+_TAR_END = gzip.compress(b"\0" * 2 * tarfile.BLOCKSIZE)
+
+# Files above this size (e.g. large downloads) are compressed straight from
+# disk into each archive instead of being read whole and cached.
+MAX_CACHED_MEMBER_SIZE = 8 * 1024 * 1024
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+class TrajectoryStore:
+    """Incremental tar.gz builder for a task directory.
+
+    Every file is compressed into its own gzip member holding its tar entry,
+    and members are cached until the file changes. A concatenation of members
+    is a valid tar.gz, so building an archive only compresses new or changed
+    files, whether it holds the whole directory or just a delta.
+
+    Cached members are kept in a temporary file rather than in memory. A
+    delta upload never sends the same member twice, so its members are
+    dropped once it succeeds.
+
+    The manifest of uploaded files (path -> size and mtime) lives in the task
+    directory, so the worker and the inference server continue the same delta
+    sequence for a task.
+    """
+
+    def __init__(self, task_directory: Path, name: str, compresslevel: int = 6):
+        self.task_directory = task_directory
+        self.name = name
+        self.compresslevel = compresslevel
+        self.manifest_path = task_directory / MANIFEST_FILENAME
+        self.lock = asyncio.Lock()
+        # path -> (signature, offset, length) of its member in _cache
+        self._members: dict[str, tuple[list[int], int, int]] = {}
+        self._cache: IO[bytes] | None = None
+        self._cache_size = 0
+
+    def _load_manifest(self) -> dict:
+        try:
+            return json.loads(self.manifest_path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"delta_index": 0, "files": {}}
+
+    def _scan(self) -> dict[str, list[int]]:
+        files = {}
+        for root, _, filenames in os.walk(self.task_directory):
+            for filename in filenames:
+                path = Path(root) / filename
+                if path == self.manifest_path:
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                relative = str(path.relative_to(self.task_directory))
+                files[relative] = [stat.st_size, stat.st_mtime_ns]
+        return files
+
+    def _write_streamed_member(
+        self, tar_file: IO[bytes], relative: str, signature: list[int]
+    ):
+        self._members.pop(relative, None)
+        path = self.task_directory / relative
+        try:
+            f = open(path, "rb")
+            mode = path.stat().st_mode & 0o7777
+        except FileNotFoundError:
+            return
+
+        info = tarfile.TarInfo(f"{self.name}/{relative}")
+        info.size = signature[0]
+        info.mtime = signature[1] // 1_000_000_000
+        info.mode = mode
+        with (
+            f,
+            gzip.GzipFile(
+                fileobj=tar_file, mode="wb", compresslevel=self.compresslevel
+            ) as member,
+        ):
+            member.write(info.tobuf(tarfile.PAX_FORMAT))
+            remaining = info.size
+            while remaining > 0:
+                chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    # The file shrank since it was scanned; keep the entry
+                    # the declared size.
+                    chunk = b"\0" * min(STREAM_CHUNK_SIZE, remaining)
+                member.write(chunk)
+                remaining -= len(chunk)
+            member.write(b"\0" * (-info.size % tarfile.BLOCKSIZE))
+
+    def _plan(self, delta: bool) -> tuple[list[str], dict, dict]:
+        manifest = self._load_manifest()
+        current = self._scan()
+        changed = [
+            path
+            for path, signature in current.items()
+            if manifest["files"].get(path) != signature
+        ]
+        if not changed:
+            return [], manifest, current
+
+        for path in list(self._members):
+            if path not in current:
+                del self._members[path]
+        return sorted(changed if delta else current), manifest, current
+
+    def _store_members(self, members: dict[str, tuple[list[int], bytes | None]]):
+        live = sum(length for _, _, length in self._members.values())
+        if self._cache is not None and self._cache_size > 2 * live:
+            self._compact()
+        for path, (signature, member) in members.items():
+            if member is None:
+                self._members.pop(path, None)
+                continue
+            if self._cache is None:
+                self._cache = tempfile.TemporaryFile()
+            self._cache.seek(self._cache_size)
+            self._cache.write(member)
+            self._members[path] = (signature, self._cache_size, len(member))
+            self._cache_size += len(member)
+
+    def _compact(self):
+        """Rewrite the cache with only the members still in use."""
+        cache = tempfile.TemporaryFile()
+        size = 0
+        for path, (signature, offset, length) in self._members.items():
+            self._copy_member(cache, offset, length)
+            self._members[path] = (signature, size, length)
+            size += length
+        self._cache.close()
+        self._cache, self._cache_size = cache, size
+
+    def _copy_member(self, out: IO[bytes], offset: int, length: int):
+        self._cache.seek(offset)
+        while length > 0:
+            chunk = self._cache.read(min(STREAM_CHUNK_SIZE, length))
+            out.write(chunk)
+            length -= len(chunk)
+
+    def _assemble(
+        self,
+        paths: list[str],
+        current: dict,
+        members: dict[str, tuple[list[int], bytes | None]],
+    ) -> IO[bytes]:
+        self._store_members(members)
+        tar_file = tempfile.TemporaryFile()
+        for path in paths:
+            if current[path][0] > MAX_CACHED_MEMBER_SIZE:
+                self._write_streamed_member(tar_file, path, current[path])
+                continue
+            cached = self._members.get(path)
+            if cached is not None and cached[0] == current[path]:
+                self._copy_member(tar_file, cached[1], cached[2])
+        tar_file.write(_TAR_END)
+        tar_file.seek(0)
+        return tar_file
+
+    async def prepare(self, delta: bool) -> tuple[IO[bytes] | None, dict, dict]:
+        """Build the archive to upload into a temporary file, off the event loop.
+
+        Members not cached yet are compressed in the CPU offload pool.
+        Returns the open tar.gz (None if nothing changed since the last
+        upload), the previous manifest and the current file signatures to
+        commit once the upload succeeded.
+        """
+        paths, manifest, current = await asyncio.to_thread(self._plan, delta)
+        if not paths:
+            return None, manifest, current
+
+        missing = [
+            path
+            for path in paths
+            if current[path][0] <= MAX_CACHED_MEMBER_SIZE
+            and (path not in self._members or self._members[path][0] != current[path])
+        ]
+        members = await asyncio.gather(
+            *(
+                run_cpu(
+                    tar_gz_member,
+                    str(self.task_directory / path),
+                    f"{self.name}/{path}",
+                    current[path],
+                    self.compresslevel,
+                )
+                for path in missing
+            )
+        )
+        built = {
+            path: (current[path], member) for path, member in zip(missing, members)
+        }
+
+        return (
+            await asyncio.to_thread(self._assemble, paths, current, built),
+            manifest,
+            current,
+        )
+
+    def commit(self, manifest: dict, current: dict, delta: bool):
+        manifest = {
+            "delta_index": manifest["delta_index"] + (1 if delta else 0),
+            "files": current,
+        }
+        self.manifest_path.write_text(json.dumps(manifest))
+        if delta:
+            self.close()
+
+    def close(self):
+        """Drop the cached members."""
+        self._members.clear()
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        self._cache_size = 0
+
+
+def tar_gz_member(
+    path: str, arcname: str, signature: list[int], compresslevel: int
+) -> bytes | None:
+    """The gzip member holding the tar entry of one file, or None if the file
+    is gone."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read(signature[0])
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return None
+
+    info = tarfile.TarInfo(arcname)
+    info.size = len(data)
+    info.mtime = signature[1] // 1_000_000_000
+    info.mode = mode
+    padding = -len(data) % tarfile.BLOCKSIZE
+    return gzip.compress(
+        info.tobuf(tarfile.PAX_FORMAT) + data + b"\0" * padding,
+        compresslevel=compresslevel,
+    )
@@ -8,7 +8,6 @@ import signal
 import time
 from typing import Literal
 
-import aiohttp
 from playwright.async_api import ProxySettings
 
 from optexity.inference.infra.utils import _download_extension, _extract_extension
@@ -75,9 +74,15 @@ class ActualBrowser:
         is_dedicated: bool = False,
         use_proxy: bool = False,
         proxy_session_id: str | None = None,
+        slot_id: int = 0,
+        user_data_dir: str | None = None,
     ):
         # self.chrome_path = find_chrome_binary(channel)
         self.user_data_dir = f"/tmp/userdata_{unique_child_arn}"
+        if slot_id > 0:
+            self.user_data_dir += f"_{slot_id}"
+        if user_data_dir is not None:
+            self.user_data_dir = user_data_dir
         self.port = port
         self.headless = headless
         self.is_dedicated = is_dedicated
@@ -213,6 +218,9 @@ class ActualBrowser:
 
             from patchright.async_api import async_playwright
 
+            if not self.is_dedicated:
+                shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
             self.playwright = await async_playwright().start()
             self.context = await self.playwright.chromium.launch_persistent_context(
                 channel=self.channel,
@@ -231,6 +239,8 @@ class ActualBrowser:
             raise e
 
     async def _wait_for_cdp(self, timeout=10):
+        import aiohttp
+
         logger.debug("Waiting for CDP")
         url = f"http://localhost:{self.port}/json/version"
         start = time.monotonic()
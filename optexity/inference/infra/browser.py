@@ -1,11 +1,12 @@
 import asyncio
-import base64
-import json
 import logging
 import os
 import re
 import shutil
-from typing import Literal
+import tempfile
+import time
+import weakref
+from typing import Callable, Literal
 from uuid import uuid4
 
 import patchright.async_api
@@ -16,7 +17,13 @@ from patchright._impl._errors import TimeoutError as PatchrightTimeoutError
 from playwright._impl._errors import TimeoutError as PlaywrightTimeoutError
 from playwright.async_api import Download, Locator, Page, Request, Response
 
+from optexity.inference.infra.cpu_offload import convert_image, run_cpu
+from optexity.inference.infra.download_tracker import DownloadTracker
+from optexity.inference.infra.locator_command import compile_locator_command
+from optexity.inference.infra.network_capture import NetworkCapture, parse_body
+from optexity.inference.infra.tracing import set_attributes, traced
 from optexity.schema.memory import Memory, NetworkRequest, NetworkResponse
+from optexity.schema.screenshot import Screenshot
 from optexity.utils.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -33,6 +40,8 @@ class Browser:
         channel: Literal["chromium", "chrome"] = "chromium",
         use_proxy: bool = False,
         proxy_session_id: str | None = None,
+        temp_downloads_dir: str | None = None,
+        network_capture: NetworkCapture | None = None,
     ):
 
         self.headless = headless
@@ -57,12 +66,47 @@ class Browser:
         self.page_to_target_id = []
         self.previous_total_pages = 0
         self.active_downloads = 0
+        self._last_screenshot: tuple[str, Screenshot] | None = None
+        self._state_summary_cache: tuple[str, BrowserStateSummary] | None = None
+        self._axtree_cache: dict[bool, str] = {}
+        # Locators built from commands, per page; locators are lazy, so one
+        # per command stays valid for the life of the page.
+        self._locators: weakref.WeakKeyDictionary[Page, dict[str, Locator]] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._inflight_requests: dict[Request, float] = {}
+        self._last_network_activity = 0.0
         self.all_active_downloads_done = asyncio.Event()
         self.all_active_downloads_done.set()
 
-        self.network_calls: list[NetworkResponse | NetworkRequest] = []
-        self.temp_downloads_dir = f"/tmp/temp_downloads"
+        self.network_calls = (
+            network_capture if network_capture is not None else NetworkCapture()
+        )
+        # Staging directory downloads are saved to before being moved into
+        # place. It must not be shared with another browser, since start()
+        # clears it. Without one, the browser stages in a directory of its own
+        # and removes it on stop.
+        self._owns_temp_downloads_dir = temp_downloads_dir is None
+        self.temp_downloads_dir = (
+            temp_downloads_dir
+            if temp_downloads_dir is not None
+            else os.path.join(
+                tempfile.gettempdir(),
+                f"optexity_downloads_{self.debug_port}_{uuid4().hex[:8]}",
+            )
+        )
         self._download_cdp_session = None
+        # Shared with lanes; only the browser that attached it closes it.
+        self.download_tracker: DownloadTracker | None = None
+        # Target id of the tab whose downloads this browser expects; None for
+        # the main browser.
+        self.download_owner: str | None = None
+        # Set on lanes opened with open_lane: the lane drives only this tab and
+        # does not own the underlying browser connection.
+        self._lane_page = None
+        # Tabs of the lanes opened from this browser; their events are handled
+        # by the lanes, not by this browser's context-wide handlers.
+        self._lane_pages: weakref.WeakSet[Page] = weakref.WeakSet()
 
     async def start(self):
         logger.debug("Starting browser")
@@ -85,10 +129,17 @@ class Browser:
                 for i in range(len(self.context.pages) - 1, 0, -1):
                     await self.context.pages[i].close()
 
-            self.context.on("request", lambda req: self.log_request(req))
-            self.context.on("response", lambda resp: self.log_response(resp))
+            self.context.on("request", self._skip_lanes(self.log_request))
+            self.context.on("request", self._skip_lanes(self._track_request_started))
+            self.context.on(
+                "requestfinished", self._skip_lanes(self._track_request_ended)
+            )
             self.context.on(
-                "response", lambda resp: self.handle_random_url_downloads(resp)
+                "requestfailed", self._skip_lanes(self._track_request_ended)
+            )
+            self.context.on("response", self._skip_lanes(self.log_response))
+            self.context.on(
+                "response", self._skip_lanes(self.handle_random_url_downloads)
             )
             ## TODO: confirm this: Commenting this out to avoid duplicate downloads as now we are using persistent session for downloads
             # self.context.on(
@@ -118,13 +169,8 @@ class Browser:
             os.makedirs(self.temp_downloads_dir, exist_ok=True)
 
             self._download_cdp_session = await self.browser.new_browser_cdp_session()
-            await self._download_cdp_session.send(
-                "Browser.setDownloadBehavior",
-                {
-                    "behavior": "allow",
-                    "downloadPath": self.temp_downloads_dir,
-                },
-            )
+            self.download_tracker = DownloadTracker(self.temp_downloads_dir)
+            await self.download_tracker.attach(self._download_cdp_session)
             logger.info(f"CDP download behavior set to: {self.temp_downloads_dir}")
 
             tabs = await self.backend_agent.browser_session.get_tabs()
@@ -140,6 +186,98 @@ class Browser:
             logger.error(f"Error starting playwright: {e}")
             raise e
 
+    async def open_lane(
+        self, memory: Memory, network_capture: NetworkCapture | None = None
+    ) -> "Browser":
+        """Open a new tab in this browser's context, driven by its own Browser.
+
+        The lane shares cookies and storage with this browser and runs
+        independently of it, e.g. for parallel for-loop iterations. Its
+        requests are captured into its own `network_capture`. Stopping the
+        lane closes only its tab.
+        """
+        if self.context is None:
+            raise ValueError("Context is not set")
+
+        lane = Browser(
+            memory=memory,
+            headless=self.headless,
+            stealth=self.stealth,
+            backend=self.backend,
+            debug_port=self.debug_port,
+            channel=self.channel,
+            temp_downloads_dir=self.temp_downloads_dir,
+            network_capture=network_capture,
+        )
+        lane.context = self.context
+        lane.download_tracker = self.download_tracker
+        lane._lane_page = await self.context.new_page()
+        lane.page = lane._lane_page
+        self._lane_pages.add(lane._lane_page)
+        try:
+            await lane._start_lane()
+        except Exception:
+            await lane.stop()
+            raise
+        return lane
+
+    def _from_lane(self, event: Request | Response) -> bool:
+        """Whether a request or response of the shared context belongs to the
+        tab of a lane opened from this browser."""
+        if not self._lane_pages:
+            return False
+        try:
+            return event.frame.page in self._lane_pages
+        except Exception:
+            # Service worker requests have no frame.
+            return False
+
+    def _skip_lanes(self, handler: Callable) -> Callable:
+        """A context-wide event handler that ignores the lanes' tabs, so their
+        traffic is not captured, downloaded or waited for twice."""
+
+        def on_event(event):
+            if self._from_lane(event):
+                return None
+            return handler(event)
+
+        return on_event
+
+    async def _start_lane(self):
+        page = self._lane_page
+        page.on("request", lambda req: self.log_request(req))
+        page.on("request", self._track_request_started)
+        page.on("requestfinished", self._track_request_ended)
+        page.on("requestfailed", self._track_request_ended)
+        page.on("response", lambda resp: self.log_response(resp))
+        page.on("response", lambda resp: self.handle_random_url_downloads(resp))
+
+        cdp_session = await self.context.new_cdp_session(page)
+        try:
+            target_info = await cdp_session.send("Target.getTargetInfo")
+        finally:
+            await cdp_session.detach()
+        target_id = target_info["targetInfo"]["targetId"]
+
+        browser_session = BrowserSession(
+            cdp_url=self.cdp_url, keep_alive=True, auto_download_pdfs=False
+        )
+        self.backend_agent = Agent(
+            task="",
+            llm=ChatGoogle(model="gemini-flash-latest"),
+            browser_session=browser_session,
+            use_vision=False,
+        )
+        await self.backend_agent.browser_session.start()
+
+        action_model = self.backend_agent.ActionModel(
+            **{"switch": {"tab_id": target_id[-4:]}}
+        )
+        await self.backend_agent.multi_act([action_model])
+        self.page_to_target_id = [target_id]
+        self.download_owner = target_id
+        logger.debug(f"Opened browser lane on tab {target_id[-4:]}")
+
     async def stop(self, force: bool = False):
 
         if self._download_cdp_session is not None:
@@ -148,6 +286,11 @@ class Browser:
             except Exception:
                 pass
             self._download_cdp_session = None
+            if self.download_tracker is not None:
+                self.download_tracker.close()
+        self.download_tracker = None
+        if self._owns_temp_downloads_dir:
+            shutil.rmtree(self.temp_downloads_dir, ignore_errors=True)
 
         logger.debug("Stopping backend agent")
         if self.backend_agent is not None:
@@ -162,6 +305,13 @@ class Browser:
                 logger.debug("Browser session reset")
             self.backend_agent = None
 
+        if self._lane_page is not None:
+            try:
+                await self._lane_page.close()
+            except Exception as e:
+                logger.debug(f"Could not close lane tab: {e}")
+            self._lane_page = None
+
         if self.browser is not None:
             logger.debug("Stopping browser")
             await self.browser.close()
@@ -180,6 +330,9 @@ class Browser:
         if self.context is None:
             raise ValueError("Context is not set")
 
+        if self._lane_page is not None:
+            return self._lane_page
+
         pages = self.context.pages
         if len(pages) == 0:
             self.page = await self.context.new_page()
@@ -193,6 +346,10 @@ class Browser:
         if self.context is None or self.backend_agent is None:
             return False, 0
 
+        if self._lane_page is not None:
+            # Other lanes open tabs in the same context; a lane stays on its tab.
+            return False, 0
+
         total_time = 0
         while total_time < max_wait_time:
             pages = self.context.pages
@@ -221,6 +378,12 @@ class Browser:
         if self.context is None or self.backend_agent is None:
             return None
 
+        if self._lane_page is not None:
+            logger.warning(
+                "Browser lanes stay on their own tab, skipping close current tab"
+            )
+            return False
+
         pages = self.context.pages
 
         if len(pages) == 1:
@@ -242,6 +405,10 @@ class Browser:
         if self.context is None or self.backend_agent is None:
             return None
 
+        if self._lane_page is not None:
+            logger.warning("Browser lanes stay on their own tab, skipping switch tab")
+            return False
+
         pages = self.context.pages
 
         if len(pages) == 1:
@@ -262,7 +429,11 @@ class Browser:
         page = await self.get_current_page()
         if page is None:
             return None
-        locator: Locator = eval(f"page.{command}")
+        locators = self._locators.setdefault(page, {})
+        locator = locators.get(command)
+        if locator is None:
+            locator = compile_locator_command(command).build(page)
+            locators[command] = locator
         return locator
 
     def get_xpath_from_index(self, index: int) -> str:
@@ -291,18 +462,59 @@ class Browser:
             )
             return None
 
-    async def get_browser_state_summary(self) -> BrowserStateSummary:
+    @traced("dom_snapshot")
+    async def get_browser_state_summary(
+        self, use_cache: bool = True
+    ) -> BrowserStateSummary:
+        """DOM snapshot and screenshot of the current page.
+
+        The last snapshot is reused while the page fingerprint is unchanged. It is
+        only cached if the page did not change while it was being taken.
+        """
         if self.backend_agent is None:
             raise ValueError("Backend agent is not set")
 
+        fingerprint = await self.get_page_fingerprint() if use_cache else None
+        if (
+            fingerprint is not None
+            and self._state_summary_cache is not None
+            and self._state_summary_cache[0] == fingerprint
+        ):
+            logger.debug("Page unchanged, reusing previous browser state summary")
+            set_attributes(cached=True)
+            return self._state_summary_cache[1]
+
         browser_state_summary = await self.backend_agent.browser_session.get_browser_state_summary(
             include_screenshot=True,  # always capture even if use_vision=False so that cloud sync is useful (it's fast now anyway)
             include_recent_events=False,
             cached=False,
         )
 
+        self._state_summary_cache = None
+        self._axtree_cache = {}
+        if fingerprint is not None and fingerprint == await self.get_page_fingerprint():
+            self._state_summary_cache = (fingerprint, browser_state_summary)
+
         return browser_state_summary
 
+    def get_axtree(
+        self, browser_state_summary: BrowserStateSummary, remove_empty_nodes: bool
+    ) -> str:
+        """LLM representation of a snapshot, memoized for the cached snapshot."""
+        cached = (
+            self._state_summary_cache is not None
+            and self._state_summary_cache[1] is browser_state_summary
+        )
+        if cached and remove_empty_nodes in self._axtree_cache:
+            return self._axtree_cache[remove_empty_nodes]
+
+        axtree = browser_state_summary.dom_state.llm_representation(
+            remove_empty_nodes=remove_empty_nodes
+        )
+        if cached:
+            self._axtree_cache[remove_empty_nodes] = axtree
+        return axtree
+
     async def get_current_page_url(self) -> str:
         try:
             page = await self.get_current_page()
@@ -377,23 +589,29 @@ class Browser:
             self.all_active_downloads_done.set()
 
     async def log_request(self, req: Request):
+        if not self.network_calls.matches_url(req.url):
+            return
         try:
-            body = req.post_data  # this is None for GET/HEAD
             # Rebuild cookies exactly like curl -b
-            cookies = await req.frame.page.context.cookies()
-            cookie_header = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+            cookie_header = await self.network_calls.get_cookie_header(
+                req.frame.page.context
+            )
 
             # Rebuild headers
             headers = dict(req.headers)
             headers["cookie"] = cookie_header
 
-            # Body as raw bytes
-            body = req.post_data
+            # Body as raw bytes, None for GET/HEAD
+            body = req.post_data_buffer
 
             self.network_calls.append(
                 NetworkRequest(
-                    url=req.url, method=req.method, headers=headers, body=body
-                )
+                    url=req.url,
+                    method=req.method,
+                    headers=headers,
+                    body=req.post_data,
+                ),
+                len(body) if body is not None else 0,
             )
 
         except Exception as e:
@@ -401,15 +619,24 @@ class Browser:
             pass
 
     async def log_response(self, response: Response):
-        try:
-            body = await response.json()
-        except Exception:
+        headers = response.headers
+        if "set-cookie" in headers:
+            self.network_calls.invalidate_cookies()
+        if not self.network_calls.matches_url(response.url):
+            return
+
+        body = None
+        content_length = 0
+        if self.network_calls.wants_body(headers):
             try:
-                body = await response.text()
+                raw = await response.body()
+                content_length = len(raw)
+                if content_length <= self.network_calls.max_body_bytes:
+                    body = parse_body(raw)
             except Exception:
-                body = None
+                pass
 
-        # Try to enrich response with request method and content length
+        # Try to enrich response with request method
         method = None
         try:
             # Playwright provides request object for a response
@@ -417,35 +644,201 @@ class Browser:
         except Exception:
             pass
 
-        content_length = 0
-        try:
-            if body is not None:
-                if isinstance(body, (str, bytes)):
-                    content_length = len(body)
-                elif isinstance(body, dict):
-                    content_length = len(json.dumps(body))
-        except Exception:
-            pass
-
         self.network_calls.append(
             NetworkResponse(
                 url=response.url,
                 method=method,
                 status=response.status,
-                headers=response.headers,
+                headers=headers,
                 body=body,
                 content_length=content_length,
-            )
+            ),
+            content_length if body is not None else 0,
         )
 
     async def clear_network_calls(self):
         self.network_calls.clear()
+        self.network_calls.invalidate_cookies()
+
+    def _track_request_started(self, req: Request):
+        now = time.monotonic()
+        self._inflight_requests[req] = now
+        self._last_network_activity = now
+
+    def _track_request_ended(self, req: Request):
+        self._inflight_requests.pop(req, None)
+        self._last_network_activity = time.monotonic()
+
+    def _network_busy(self, now: float) -> bool:
+        """True if a request finished within the quiet window or one is still in
+        flight. Requests older than PAGE_SETTLE_MAX_REQUEST_AGE (long polling,
+        streaming) are ignored."""
+        if now - self._last_network_activity < settings.PAGE_SETTLE_QUIET_TIME:
+            return True
+        return any(
+            now - started < settings.PAGE_SETTLE_MAX_REQUEST_AGE
+            for started in self._inflight_requests.values()
+        )
+
+    @traced("settle_wait")
+    async def wait_for_page_settle(self, timeout: float) -> float:
+        """Wait until the page is quiet, for at most `timeout` seconds.
+
+        The page is quiet once the network and the DOM have both been idle for
+        PAGE_SETTLE_QUIET_TIME seconds, with no navigation in between (a navigation
+        changes the page fingerprint). Returns the time spent waiting.
+        """
+        start = time.monotonic()
+        if timeout <= 0:
+            return 0.0
 
-    async def get_screenshot(self, full_page: bool = False) -> str | None:
+        page = await self.get_current_page()
+        if page is None:
+            return 0.0
+        try:
+            await page.wait_for_load_state("domcontentloaded", timeout=timeout * 1000)
+        except (TimeoutError, PatchrightTimeoutError, PlaywrightTimeoutError):
+            return time.monotonic() - start
+
+        fingerprint = await self.get_page_fingerprint()
+        last_change = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now - start >= timeout:
+                logger.debug(f"Page did not settle within {timeout} seconds")
+                break
+            if self._network_busy(now):
+                last_change = now
+            elif now - last_change >= settings.PAGE_SETTLE_QUIET_TIME:
+                break
+
+            await asyncio.sleep(
+                min(
+                    settings.PAGE_SETTLE_POLL_INTERVAL,
+                    max(0.0, timeout - (time.monotonic() - start)),
+                )
+            )
+            new_fingerprint = await self.get_page_fingerprint()
+            if new_fingerprint != fingerprint:
+                fingerprint = new_fingerprint
+                last_change = time.monotonic()
+
+        return time.monotonic() - start
+
+    async def get_page_fingerprint(self) -> str | None:
+        """Cheap identifier of what the current page shows.
+
+        Changes whenever the document, its DOM, the scroll position or the viewport
+        changes, and on input, change and focus events, which change form values
+        and focus without touching the DOM. Values set by scripts without an
+        event, canvas, video and CSS animations are not tracked.
+        """
         page = await self.get_current_page()
         if page is None:
             return None
-        screenshot_bytes = await page.screenshot(full_page=full_page)
-        screenshot_base64 = base64.b64encode(screenshot_bytes).decode("utf-8")
+        try:
+            return await page.evaluate("""() => {
+                    if (window.__optexityDocId === undefined) {
+                        window.__optexityDocId = Math.random().toString(36).slice(2);
+                        window.__optexityMutations = 0;
+                        // browser_use highlight overlays are not page changes
+                        const overlay =
+                            "#browser-use-debug-highlights, [data-browser-use-highlight], " +
+                            "[data-browser-use-interaction-highlight]";
+                        const isOverlay = (node) =>
+                            node instanceof Element &&
+                            (node.matches(overlay) || node.closest(overlay) !== null);
+                        new MutationObserver((records) => {
+                            for (const r of records) {
+                                if (
+                                    !isOverlay(r.target) &&
+                                    ![...r.addedNodes, ...r.removedNodes].some(isOverlay)
+                                ) {
+                                    window.__optexityMutations += 1;
+                                }
+                            }
+                        }).observe(document, {
+                            subtree: true,
+                            childList: true,
+                            attributes: true,
+                            characterData: true,
+                        });
+                        // Typed text, checked state, selected options and
+                        // focus are properties, invisible to the observer.
+                        for (const type of ["input", "change", "focusin", "focusout"]) {
+                            document.addEventListener(
+                                type,
+                                () => { window.__optexityMutations += 1; },
+                                true,
+                            );
+                        }
+                    }
+                    return [
+                        location.href,
+                        window.__optexityDocId,
+                        window.__optexityMutations,
+                        window.scrollX,
+                        window.scrollY,
+                        window.innerWidth,
+                        window.innerHeight,
+                    ].join("|");
+                }""")
+        except Exception as e:
+            logger.debug(f"Could not fingerprint page: {e}")
+            return None
+
+    def invalidate_page_caches(self):
+        """Forget the screenshot kept for dedup and the cached DOM snapshot, so
+        the next ones are taken anew.
+
+        Called after interactions, whose effects may not change the page
+        fingerprint.
+        """
+        self._last_screenshot = None
+        self._state_summary_cache = None
+        self._axtree_cache = {}
+
+    @traced("screenshot")
+    async def get_screenshot(
+        self, full_page: bool = False, dedup: bool = False
+    ) -> Screenshot | None:
+        page = await self.get_current_page()
+        if page is None:
+            return None
+
+        fingerprint = None
+        if dedup and not full_page:
+            fingerprint = await self.get_page_fingerprint()
+            if (
+                fingerprint is not None
+                and self._last_screenshot is not None
+                and self._last_screenshot[0] == fingerprint
+            ):
+                logger.debug("Page unchanged, reusing previous screenshot")
+                return self._last_screenshot[1]
+
+        if settings.SCREENSHOT_FORMAT == "jpeg":
+            screenshot = Screenshot(
+                await page.screenshot(
+                    full_page=full_page,
+                    type="jpeg",
+                    quality=settings.SCREENSHOT_QUALITY,
+                ),
+                "jpeg",
+            )
+        else:
+            screenshot = Screenshot(await page.screenshot(full_page=full_page), "png")
+            if settings.SCREENSHOT_FORMAT == "webp":
+                screenshot = Screenshot(
+                    await run_cpu(
+                        convert_image,
+                        screenshot.data,
+                        "webp",
+                        settings.SCREENSHOT_QUALITY,
+                    ),
+                    "webp",
+                )
 
-        return screenshot_base64
+        if fingerprint is not None:
+            self._last_screenshot = (fingerprint, screenshot)
+        return screenshot
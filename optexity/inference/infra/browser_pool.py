@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from typing import Callable, Literal
+
+from optexity.inference.infra.actual_browser import ActualBrowser
+from optexity.schema.memory import SystemInfo
+from optexity.utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPool:
+    """Keeps a few clean, already launched browsers ready for non-dedicated tasks.
+
+    Browsers handed out by the pool are never returned to it: after a task the
+    caller stops them (which wipes their user data dir) and the pool launches a
+    fresh one in the background, so every task starts from a clean profile.
+    """
+
+    def __init__(
+        self,
+        unique_child_arn: str,
+        size: int,
+        get_ports: Callable[[], list[int]],
+        channel: Literal["chromium", "chrome"] = "chromium",
+    ):
+        self.unique_child_arn = unique_child_arn
+        self.size = size
+        self.get_ports = get_ports
+        self.channel: Literal["chromium", "chrome"] = channel
+        self.warm_browsers: list[ActualBrowser] = []
+        self.leased_ports: set[int] = set()
+        self._launching_ports: set[int] = set()
+        self._refill_task: asyncio.Task | None = None
+        self._closed = False
+
+    def _memory_exceeded(self) -> bool:
+        used, total = SystemInfo.get_effective_memory_mb()
+        return used / total > settings.TASK_ADMISSION_MAX_MEMORY_FRACTION
+
+    def _free_port(self) -> int | None:
+        used_ports = (
+            {b.port for b in self.warm_browsers}
+            | self.leased_ports
+            | self._launching_ports
+        )
+        for port in self.get_ports():
+            if port not in used_ports:
+                return port
+        return None
+
+    async def acquire(
+        self, channel: Literal["chromium", "chrome"]
+    ) -> ActualBrowser | None:
+        """Hand out a warm browser, or None if the caller should cold start one."""
+        while self.warm_browsers:
+            if channel != self.channel:
+                return None
+            browser = self.warm_browsers.pop(0)
+            if await browser.check_browser_alive():
+                self.leased_ports.add(browser.port)
+                logger.info(f"Using warm browser on port {browser.port} from pool")
+                return browser
+            logger.info(f"Warm browser on port {browser.port} is dead, discarding")
+            await self._stop(browser)
+        return None
+
+    def release(self, browser: ActualBrowser):
+        """Forget a browser handed out by acquire once the caller has stopped it."""
+        self.leased_ports.discard(browser.port)
+
+    def schedule_refill(self):
+        if self._closed or self.size <= 0:
+            return
+        if self._refill_task is not None and not self._refill_task.done():
+            return
+        self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self):
+        try:
+            if self._memory_exceeded() and self.warm_browsers:
+                logger.info("Memory exceeded, recycling warm browsers")
+                while self.warm_browsers:
+                    await self._stop(self.warm_browsers.pop())
+
+            while not self._closed and len(self.warm_browsers) < self.size:
+                if self._memory_exceeded():
+                    logger.info("Memory exceeded, not launching more warm browsers")
+                    return
+                port = self._free_port()
+                if port is None:
+                    logger.warning("No free port left for a warm browser")
+                    return
+
+                browser = ActualBrowser(
+                    channel=self.channel,
+                    unique_child_arn=self.unique_child_arn,
+                    port=port,
+                    headless=False,
+                    is_dedicated=False,
+                    user_data_dir=f"/tmp/userdata_{self.unique_child_arn}_pool_{port}",
+                )
+                self._launching_ports.add(port)
+                try:
+                    await browser.start()
+                except asyncio.CancelledError:
+                    await self._stop(browser)
+                    raise
+                except Exception:
+                    logger.exception(f"Failed to launch warm browser on port {port}")
+                    await self._stop(browser)
+                    return
+                finally:
+                    self._launching_ports.discard(port)
+
+                if self._closed:
+                    await self._stop(browser)
+                    return
+                self.warm_browsers.append(browser)
+                logger.info(
+                    f"Warm browser ready on port {port} "
+                    f"({len(self.warm_browsers)}/{self.size})"
+                )
+        except Exception:
+            logger.exception("Error refilling browser pool")
+
+    async def _stop(self, browser: ActualBrowser):
+        try:
+            await browser.stop(graceful=True)
+        except Exception as e:
+            logger.error(f"Error stopping pooled browser on port {browser.port}: {e}")
+
+    async def _cancel_refill(self):
+        if self._refill_task is not None and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+
+    async def reset(self, unique_child_arn: str):
+        """Relaunch the warm browsers after the child's identity changed.
+
+        Their ports and user data dirs were derived from the old child id and
+        ARN; browsers already handed out keep running until they are released.
+        """
+        self.unique_child_arn = unique_child_arn
+        await self._cancel_refill()
+        while self.warm_browsers:
+            await self._stop(self.warm_browsers.pop())
+        self.schedule_refill()
+
+    async def close(self):
+        self._closed = True
+        await self._cancel_refill()
+        while self.warm_browsers:
+            await self._stop(self.warm_browsers.pop())
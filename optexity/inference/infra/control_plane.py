@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import time
+from typing import Any
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+
+from optexity.utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Errors raised before the request was sent, so it is always safe to retry.
+RETRY_EXCEPTIONS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+)
+# Failures the server may have acted on before they happened; only retried
+# for idempotent requests.
+IDEMPOTENT_RETRY_STATUS_CODES = {429, 502, 503, 504}
+IDEMPOTENT_RETRY_EXCEPTIONS = (*RETRY_EXCEPTIONS, httpx.RemoteProtocolError)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_status: int | None = None
+
+    def record(self, seconds: float, status: int | None, retries: int):
+        self.count += 1
+        self.retries += retries
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.last_status = status
+        if status is None or status >= 400:
+            self.errors += 1
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_ms": round(self.total_seconds / self.count * 1000, 1),
+            "max_ms": round(self.max_seconds * 1000, 1),
+            "last_status": self.last_status,
+        }
+
+
+class ControlPlaneClient:
+    """Pooled keep-alive client for calls to the Optexity server.
+
+    Relative endpoints are joined to `base_url`. Connection errors are
+    retried with exponential backoff; dropped connections and 429/5xx gateway
+    responses are retried too for idempotent requests (GET, or
+    `idempotent=True`). Latency is recorded per endpoint path. Pass `transport` (e.g. httpx.MockTransport)
+    or a local `base_url` to run against a stand-in server.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+        max_retries: int | None = None,
+    ):
+        self.base_url = base_url if base_url is not None else settings.SERVER_URL
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else settings.CONTROL_PLANE_MAX_RETRIES
+        )
+        http2 = settings.CONTROL_PLANE_HTTP2 and transport is None
+        if http2 and not _http2_available():
+            logger.debug("h2 is not installed, control plane client uses HTTP/1.1")
+            http2 = False
+        self.client = httpx.AsyncClient(
+            timeout=settings.CONTROL_PLANE_TIMEOUT,
+            http2=http2,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=settings.CONTROL_PLANE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.CONTROL_PLANE_MAX_CONNECTIONS,
+                keepalive_expiry=settings.CONTROL_PLANE_KEEPALIVE_EXPIRY,
+            ),
+        )
+        self.metrics: dict[str, EndpointMetrics] = {}
+
+    async def request(
+        self,
+        method: str,
+        endpoint: str,
+        idempotent: bool | None = None,
+        **kwargs: Any,
+    ):
+        url = urljoin(self.base_url, endpoint)
+        path = urlsplit(url).path or "/"
+        files = kwargs.get("files")
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_status_codes = IDEMPOTENT_RETRY_STATUS_CODES if idempotent else set()
+        retry_exceptions = (
+            IDEMPOTENT_RETRY_EXCEPTIONS if idempotent else RETRY_EXCEPTIONS
+        )
+
+        start = time.monotonic()
+        response: httpx.Response | None = None
+        attempt = 0
+        backoff = settings.CONTROL_PLANE_INITIAL_BACKOFF
+        try:
+            while True:
+                _rewind_files(files)
+                try:
+                    response = await self.client.request(method, url, **kwargs)
+                    if (
+                        response.status_code not in retry_status_codes
+                        or attempt >= self.max_retries
+                    ):
+                        return response
+                    reason = f"status {response.status_code}"
+                except retry_exceptions as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    reason = repr(e)
+
+                attempt += 1
+                logger.warning(
+                    f"{method} {path} failed ({reason}), "
+                    f"retry {attempt}/{self.max_retries} in {backoff:.1f}s"
+                )
+                await asyncio.sleep(backoff)
+                backoff *= 2
+        finally:
+            self.metrics.setdefault(path, EndpointMetrics()).record(
+                time.monotonic() - start,
+                response.status_code if response is not None else None,
+                attempt,
+            )
+
+    async def post(self, endpoint: str, **kwargs: Any):
+        return await self.request("POST", endpoint, **kwargs)
+
+    async def get(self, endpoint: str, **kwargs: Any):
+        return await self.request("GET", endpoint, **kwargs)
+
+    def metrics_summary(self) -> dict[str, dict]:
+        return {path: m.summary() for path, m in self.metrics.items()}
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def _rewind_files(files):
+    """Seek file objects back to the start so a retried upload sends them again."""
+    if not files:
+        return
+    items = files.values() if isinstance(files, dict) else [f for _, f in files]
+    for item in items:
+        file_obj = item[1] if isinstance(item, tuple) else item
+        if hasattr(file_obj, "seek"):
+            file_obj.seek(0)
+
+
+_control_plane_client: ControlPlaneClient | None = None
+_control_plane_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_control_plane_client() -> ControlPlaneClient:
+    """Process-wide client, recreated if the event loop changed (httpx clients
+    cannot be shared across loops)."""
+    global _control_plane_client, _control_plane_loop
+    loop = asyncio.get_running_loop()
+    if _control_plane_client is None or _control_plane_loop is not loop:
+        _control_plane_client = ControlPlaneClient()
+        _control_plane_loop = loop
+    return _control_plane_client
+
+
+def control_plane_metrics() -> dict[str, dict]:
+    if _control_plane_client is None:
+        return {}
+    return _control_plane_client.metrics_summary()
+
+
+async def close_control_plane_client():
+    global _control_plane_client, _control_plane_loop
+    if _control_plane_client is None:
+        return
+    client = _control_plane_client
+    _control_plane_client = None
+    if _control_plane_loop is asyncio.get_running_loop():
+        metrics = client.metrics_summary()
+        if metrics:
+            logger.info(f"Control plane latency: {metrics}")
+        await client.aclose()
+    _control_plane_loop = None
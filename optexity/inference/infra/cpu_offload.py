@@ -0,0 +1,89 @@
+import asyncio
+import base64
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, TypeVar
+
+from optexity.schema.screenshot import Screenshot, ScreenshotFormat
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def start_cpu_executor(workers: int | None = None) -> ProcessPoolExecutor | None:
+    """Start the process pool CPU-heavy work is offloaded to.
+
+    Workers are forked once, right away, so call this before starting
+    subprocesses (the browser, the Playwright driver) whose pipes the workers
+    must not inherit. Until it is started, or with 0 workers, `run_cpu` runs
+    work on threads instead.
+    """
+    global _executor
+    if _executor is not None:
+        return _executor
+
+    if workers is None:
+        from optexity.utils.settings import settings
+
+        workers = settings.CPU_OFFLOAD_WORKERS
+    if workers <= 0:
+        return None
+
+    _executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("fork")
+    )
+    # A fork pool launches all its workers on the first submission.
+    _executor.submit(int).result()
+    logger.debug(f"Started CPU offload pool with {workers} workers")
+    return _executor
+
+
+def shutdown_cpu_executor():
+    global _executor
+    if _executor is None:
+        return
+    executor = _executor
+    _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_cpu(func: Callable[..., T], *args: Any) -> T:
+    """Run `func(*args)` off the event loop, in the CPU pool when started.
+
+    `func` and its arguments must be picklable, i.e. module level functions
+    and plain data.
+    """
+    executor = _executor
+    if executor is None:
+        return await asyncio.to_thread(func, *args)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    except BrokenProcessPool:
+        logger.warning("CPU offload pool broke, running on threads from now on")
+        if _executor is executor:
+            shutdown_cpu_executor()
+        return await asyncio.to_thread(func, *args)
+
+
+def b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("utf-8")
+
+
+def convert_image(data: bytes, format: ScreenshotFormat, quality: int) -> bytes:
+    return Screenshot(data).convert(format, quality).data
+
+
+def encode_json(body: Any, base64_fields: dict[str, bytes] | None = None) -> bytes:
+    """JSON request body, encoded like httpx does; `base64_fields` are added
+    to it base64 encoded, so large bytes are encoded in the worker too."""
+    if base64_fields:
+        body = {**body, **{k: b64encode(v) for k, v in base64_fields.items()}}
+    return json.dumps(
+        body, ensure_ascii=False, separators=(",", ":"), allow_nan=False
+    ).encode("utf-8")
@@ -0,0 +1,215 @@
+import asyncio
+import errno
+import logging
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator
+
+logger = logging.getLogger(__name__)
+
+# How long an action may take to start its download, and how long a started
+# download may go without progress before it is given up on.
+DOWNLOAD_BEGIN_TIMEOUT = 30.0
+DOWNLOAD_STALL_TIMEOUT = 30.0
+
+
+@dataclass(eq=False)
+class TrackedDownload:
+    guid: str
+    url: str
+    suggested_filename: str
+    frame_id: str | None
+    path: Path
+    state: str = "inProgress"
+    received_bytes: int = 0
+    total_bytes: int = 0
+    # Whether an action's expectation took this download.
+    claimed: bool = False
+    last_progress: float = field(default_factory=time.monotonic)
+    finished: asyncio.Future = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+
+    async def wait(self, stall_timeout: float = DOWNLOAD_STALL_TIMEOUT) -> bool:
+        """Wait for the download to finish; True if it completed.
+
+        Raises TimeoutError when no progress is reported for `stall_timeout`
+        seconds, so large downloads that keep moving are not cut short.
+        """
+        while not self.finished.done():
+            remaining = self.last_progress + stall_timeout - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError(
+                    f"Download {self.suggested_filename} stalled at "
+                    f"{self.received_bytes}/{self.total_bytes} bytes"
+                )
+            try:
+                await asyncio.wait_for(asyncio.shield(self.finished), remaining)
+            except asyncio.TimeoutError:
+                continue
+        return self.finished.result()
+
+
+class DownloadExpectation:
+    """A download an action is about to trigger, from the tab with target id
+    `owner` (None for the main browser)."""
+
+    def __init__(self, owner: str | None):
+        self.owner = owner
+        self.started: asyncio.Future[TrackedDownload] = (
+            asyncio.get_running_loop().create_future()
+        )
+
+    async def wait(
+        self,
+        begin_timeout: float = DOWNLOAD_BEGIN_TIMEOUT,
+        stall_timeout: float = DOWNLOAD_STALL_TIMEOUT,
+    ) -> TrackedDownload:
+        download = await asyncio.wait_for(asyncio.shield(self.started), begin_timeout)
+        await download.wait(stall_timeout)
+        return download
+
+
+class DownloadTracker:
+    """Tracks browser downloads through CDP `Browser.downloadWillBegin` and
+    `Browser.downloadProgress` events.
+
+    Downloads are saved in `downloads_dir` under their GUID. Each action that
+    expects a download registers a `DownloadExpectation` before triggering it;
+    a starting download goes to the pending expectation of the tab whose
+    main frame started it, else to the oldest pending one, preferring the
+    main browser's. Downloads nobody expected stay unclaimed and are picked
+    up at the end of the task.
+    """
+
+    def __init__(self, downloads_dir: str):
+        self.downloads_dir = Path(downloads_dir)
+        self.downloads: dict[str, TrackedDownload] = {}
+        self._expectations: list[DownloadExpectation] = []
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def attach(self, cdp_session):
+        """Route the downloads of the browser `cdp_session` belongs to into
+        `downloads_dir` and start listening to their events."""
+        cdp_session.on("Browser.downloadWillBegin", self._on_download_will_begin)
+        cdp_session.on("Browser.downloadProgress", self._on_download_progress)
+        await cdp_session.send(
+            "Browser.setDownloadBehavior",
+            {
+                "behavior": "allowAndName",
+                "downloadPath": str(self.downloads_dir),
+                "eventsEnabled": True,
+            },
+        )
+
+    @asynccontextmanager
+    async def expect(
+        self, owner: str | None = None
+    ) -> AsyncIterator[DownloadExpectation]:
+        expectation = DownloadExpectation(owner)
+        self._expectations.append(expectation)
+        try:
+            yield expectation
+        finally:
+            if expectation in self._expectations:
+                self._expectations.remove(expectation)
+            if not expectation.started.done():
+                expectation.started.cancel()
+
+    def in_progress(self) -> list[TrackedDownload]:
+        return [d for d in self.downloads.values() if not d.finished.done()]
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Wait until no download is in progress; False on timeout."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def close(self):
+        for expectation in self._expectations:
+            if not expectation.started.done():
+                expectation.started.cancel()
+        self._expectations.clear()
+        for download in self.downloads.values():
+            if not download.finished.done():
+                download.finished.cancel()
+        self._idle.set()
+
+    def _on_download_will_begin(self, params: dict):
+        download = TrackedDownload(
+            guid=params["guid"],
+            url=params.get("url", ""),
+            suggested_filename=params.get("suggestedFilename") or params["guid"],
+            frame_id=params.get("frameId"),
+            path=self.downloads_dir / params["guid"],
+        )
+        self.downloads[download.guid] = download
+        self._idle.clear()
+
+        expectation = self._match_expectation(download.frame_id)
+        if expectation is not None:
+            self._expectations.remove(expectation)
+            download.claimed = True
+            expectation.started.set_result(download)
+        logger.debug(
+            f"Download {download.guid} started: {download.suggested_filename} "
+            f"from {download.url} ({'claimed' if download.claimed else 'unclaimed'})"
+        )
+
+    def _match_expectation(self, frame_id: str | None) -> DownloadExpectation | None:
+        pending = [e for e in self._expectations if not e.started.done()]
+        for expectation in pending:
+            if expectation.owner is not None and expectation.owner == frame_id:
+                return expectation
+        for expectation in pending:
+            if expectation.owner is None:
+                return expectation
+        return pending[0] if pending else None
+
+    def _on_download_progress(self, params: dict):
+        download = self.downloads.get(params["guid"])
+        if download is None or download.finished.done():
+            return
+
+        download.received_bytes = int(params.get("receivedBytes", 0))
+        download.total_bytes = int(params.get("totalBytes", 0))
+        download.last_progress = time.monotonic()
+        state = params.get("state", "inProgress")
+        if state == "inProgress":
+            return
+
+        download.state = state
+        if params.get("filePath"):
+            download.path = Path(params["filePath"])
+        download.finished.set_result(state == "completed")
+        logger.debug(f"Download {download.guid} {state}: {download.path}")
+        if not self.in_progress():
+            self._idle.set()
+
+
+def available_path(directory: Path, filename: str) -> Path:
+    """`directory / filename`, numbered like the browser does when taken."""
+    path = directory / filename
+    counter = 1
+    while path.exists():
+        path = directory / f"{Path(filename).stem} ({counter}){Path(filename).suffix}"
+        counter += 1
+    return path
+
+
+def move_download(src: Path, dest: Path):
+    """Move a finished download into place; a single atomic rename when the
+    staging directory is on the same filesystem."""
+    try:
+        os.replace(src, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(str(src), str(dest))
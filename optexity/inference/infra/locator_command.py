@@ -0,0 +1,179 @@
+import ast
+import re
+from functools import lru_cache
+from typing import Any, Callable
+
+# Locator builders a recorded command may call, and properties it may read.
+LOCATOR_METHODS = {
+    "and_",
+    "filter",
+    "frame_locator",
+    "get_by_alt_text",
+    "get_by_label",
+    "get_by_placeholder",
+    "get_by_role",
+    "get_by_test_id",
+    "get_by_text",
+    "get_by_title",
+    "locator",
+    "nth",
+    "or_",
+}
+LOCATOR_PROPERTIES = {"content_frame", "first", "last", "owner"}
+REGEX_FLAGS = {
+    "I": re.IGNORECASE,
+    "IGNORECASE": re.IGNORECASE,
+    "M": re.MULTILINE,
+    "MULTILINE": re.MULTILINE,
+    "S": re.DOTALL,
+    "DOTALL": re.DOTALL,
+}
+
+# A step maps the current target (page, locator or frame locator) to the
+# next one; it gets the page too, for nested locator arguments.
+Step = Callable[[Any, Any], Any]
+Argument = Callable[[Any], Any]
+
+
+class LocatorCommandError(ValueError):
+    pass
+
+
+class LocatorCommand:
+    """A recorded Playwright command such as
+    `get_by_role("button", name="Submit").nth(1)`, compiled into steps.
+
+    The command is parsed, never evaluated. Only locator builders,
+    literal arguments, `re.compile(...)` and nested `page.` locators are
+    accepted. `build` replays the steps on a page; the result is a lazy
+    locator and can be reused for as long as the page lives.
+    """
+
+    __slots__ = ("command", "steps")
+
+    def __init__(self, command: str):
+        self.command = command
+        try:
+            tree = ast.parse(f"page.{command.strip()}", mode="eval")
+        except SyntaxError as e:
+            raise LocatorCommandError(f"Invalid locator command {command!r}: {e.msg}")
+        self.steps = _compile_chain(tree.body, command)
+
+    def build(self, page: Any) -> Any:
+        return _replay(self.steps, page)
+
+
+@lru_cache(maxsize=1024)
+def compile_locator_command(command: str) -> LocatorCommand:
+    return LocatorCommand(command)
+
+
+def _replay(steps: list[Step], page: Any) -> Any:
+    target = page
+    for step in steps:
+        target = step(target, page)
+    return target
+
+
+def _compile_chain(node: ast.expr, command: str) -> list[Step]:
+    if isinstance(node, ast.Name) and node.id == "page":
+        return []
+
+    if isinstance(node, ast.Attribute):
+        if node.attr not in LOCATOR_PROPERTIES:
+            raise LocatorCommandError(
+                f"Property {node.attr} is not allowed in locator command {command!r}"
+            )
+        name = node.attr
+        return [
+            *_compile_chain(node.value, command),
+            lambda target, page: getattr(target, name),
+        ]
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        name = node.func.attr
+        if name not in LOCATOR_METHODS:
+            raise LocatorCommandError(
+                f"Method {name} is not allowed in locator command {command!r}"
+            )
+        if any(keyword.arg is None for keyword in node.keywords):
+            raise LocatorCommandError(
+                f"Argument unpacking is not allowed in locator command {command!r}"
+            )
+        args = [_compile_argument(arg, command) for arg in node.args]
+        kwargs = {
+            keyword.arg: _compile_argument(keyword.value, command)
+            for keyword in node.keywords
+        }
+
+        def call(target: Any, page: Any) -> Any:
+            return getattr(target, name)(
+                *(arg(page) for arg in args),
+                **{key: value(page) for key, value in kwargs.items()},
+            )
+
+        return [*_compile_chain(node.func.value, command), call]
+
+    raise LocatorCommandError(
+        f"{type(node).__name__} is not allowed in locator command {command!r}"
+    )
+
+
+def _compile_argument(node: ast.expr, command: str) -> Argument:
+    if _is_regex(node):
+        pattern = _literal(node.args[0], command)
+        flags = _regex_flags(node.args[1], command) if len(node.args) > 1 else 0
+        try:
+            regex = re.compile(pattern, flags)
+        except (re.error, TypeError) as e:
+            raise LocatorCommandError(
+                f"Invalid regex in locator command {command!r}: {e}"
+            )
+        return lambda page: regex
+
+    if _is_page_chain(node):
+        steps = _compile_chain(node, command)
+        return lambda page: _replay(steps, page)
+
+    value = _literal(node, command)
+    return lambda page: value
+
+
+def _is_regex(node: ast.expr) -> bool:
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == "compile"
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "re"
+        and 1 <= len(node.args) <= 2
+        and not node.keywords
+    )
+
+
+def _is_page_chain(node: ast.expr) -> bool:
+    while isinstance(node, (ast.Attribute, ast.Call)):
+        node = node.func if isinstance(node, ast.Call) else node.value
+    return isinstance(node, ast.Name) and node.id == "page"
+
+
+def _regex_flags(node: ast.expr, command: str) -> int:
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+        return _regex_flags(node.left, command) | _regex_flags(node.right, command)
+    if (
+        isinstance(node, ast.Attribute)
+        and isinstance(node.value, ast.Name)
+        and node.value.id == "re"
+        and node.attr in REGEX_FLAGS
+    ):
+        return REGEX_FLAGS[node.attr]
+    raise LocatorCommandError(f"Unsupported regex flags in locator command {command!r}")
+
+
+def _literal(node: ast.expr, command: str) -> Any:
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        raise LocatorCommandError(
+            f"Arguments must be literals in locator command {command!r}"
+        )
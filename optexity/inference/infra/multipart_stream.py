@@ -0,0 +1,112 @@
+import asyncio
+import gzip
+import logging
+import os
+import tarfile
+from pathlib import Path
+from typing import AsyncIterator, Callable
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+# Bytes, or a callable opening a fresh async stream of chunks.
+PartContent = bytes | Callable[[], AsyncIterator[bytes]]
+
+
+class MultipartStream:
+    """A multipart/form-data request body streamed part by part.
+
+    File parts are (field name, (filename, content, content type)) like
+    httpx `files`; streamed content is produced while the request is sent,
+    so it is never held in memory as a whole. Every iteration starts the
+    streams over, so a retried request sends the same body again. Pass it as
+    `content` with `content_type` as the Content-Type header.
+    """
+
+    def __init__(
+        self,
+        data: dict[str, str],
+        files: list[tuple[str, tuple[str, PartContent, str]]],
+    ):
+        self.data = data
+        self.files = files
+        self.boundary = uuid4().hex
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for name, value in self.data.items():
+            yield self._part_header(name) + value.encode() + b"\r\n"
+
+        for name, (filename, content, content_type) in self.files:
+            yield self._part_header(name, filename, content_type)
+            if isinstance(content, bytes):
+                yield content
+            else:
+                async for chunk in content():
+                    yield chunk
+            yield b"\r\n"
+
+        yield f"--{self.boundary}--\r\n".encode()
+
+    def _part_header(
+        self, name: str, filename: str | None = None, content_type: str | None = None
+    ) -> bytes:
+        disposition = f'form-data; name="{_quote(name)}"'
+        if filename is not None:
+            disposition += f'; filename="{_quote(filename)}"'
+        header = f"--{self.boundary}\r\nContent-Disposition: {disposition}\r\n"
+        if content_type is not None:
+            header += f"Content-Type: {content_type}\r\n"
+        return (header + "\r\n").encode()
+
+
+def _quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r\n", " ")
+
+
+async def tar_gz_stream(
+    directory: Path, arcname: str, compresslevel: int = 6
+) -> AsyncIterator[bytes]:
+    """Stream a tar.gz of `directory`, built from disk in a thread and read
+    through a pipe, so memory stays bounded by the pipe and chunk size.
+
+    A thread rather than the CPU pool: zlib releases the GIL while it
+    compresses, and the data never has to cross a process boundary.
+    """
+    read_fd, write_fd = os.pipe()
+    writer = asyncio.ensure_future(
+        asyncio.to_thread(_write_tar_gz, write_fd, directory, arcname, compresslevel)
+    )
+    try:
+        while chunk := await asyncio.to_thread(os.read, read_fd, CHUNK_SIZE):
+            yield chunk
+        await writer
+    finally:
+        # Closing the read end stops a writer still running with a broken pipe.
+        os.close(read_fd)
+        if not writer.done():
+            writer.add_done_callback(_log_writer_error)
+
+
+def _write_tar_gz(write_fd: int, directory: Path, arcname: str, compresslevel: int):
+    try:
+        with os.fdopen(write_fd, "wb") as pipe:
+            with (
+                gzip.GzipFile(
+                    fileobj=pipe, mode="wb", compresslevel=compresslevel
+                ) as gz,
+                tarfile.open(fileobj=gz, mode="w|") as tar,
+            ):
+                tar.add(directory, arcname=arcname)
+    except BrokenPipeError:
+        pass
+
+
+def _log_writer_error(writer: asyncio.Future):
+    if not writer.cancelled() and writer.exception() is not None:
+        logger.debug(f"Archive writer stopped: {writer.exception()}")
@@ -0,0 +1,236 @@
+import fnmatch
+import json
+import logging
+import re
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Iterator, Literal
+from urllib.parse import urlsplit
+
+from optexity.schema.memory import NetworkRequest, NetworkResponse
+from optexity.utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+UrlPatternType = Literal["substring", "glob", "regex"]
+UrlPattern = tuple[str, UrlPatternType]
+NetworkCall = NetworkRequest | NetworkResponse
+
+# Static assets are never used by network call extraction.
+DEFAULT_EXCLUDED_CONTENT_TYPES = [
+    "image/",
+    "font/",
+    "video/",
+    "audio/",
+    "text/css",
+    "javascript",
+]
+
+
+@lru_cache(maxsize=256)
+def compile_url_pattern(
+    pattern: str, pattern_type: UrlPatternType = "substring"
+) -> Callable[[str], bool]:
+    if pattern_type == "regex":
+        return re.compile(pattern).search
+    if pattern_type == "glob":
+        return re.compile(fnmatch.translate(pattern)).match
+    return lambda url: pattern in url
+
+
+class NetworkCapture:
+    """Bounded, indexed store for the network calls an automation can extract from.
+
+    Only calls whose URL matches one of `url_patterns` are kept (None keeps
+    every call, an empty list none). Response bodies are only fetched for kept
+    calls whose content type is wanted and whose declared size fits
+    NETWORK_CAPTURE_MAX_BODY_BYTES. Once the stored calls (URL, headers and
+    body) exceed NETWORK_CAPTURE_MAX_BYTES, or there are more than
+    NETWORK_CAPTURE_MAX_CALLS of them, the oldest calls are dropped.
+
+    Each kept call is indexed by the declared patterns it matches and by host,
+    so `find` does not scan every captured call.
+    """
+
+    def __init__(
+        self,
+        url_patterns: list[UrlPattern] | None = None,
+        content_types: list[str] | None = None,
+        max_bytes: int | None = None,
+        max_body_bytes: int | None = None,
+        max_calls: int | None = None,
+    ):
+        self.url_patterns = url_patterns
+        self.content_types = content_types
+        self.max_bytes = (
+            max_bytes if max_bytes is not None else settings.NETWORK_CAPTURE_MAX_BYTES
+        )
+        self.max_body_bytes = (
+            max_body_bytes
+            if max_body_bytes is not None
+            else settings.NETWORK_CAPTURE_MAX_BODY_BYTES
+        )
+        self.max_calls = (
+            max_calls if max_calls is not None else settings.NETWORK_CAPTURE_MAX_CALLS
+        )
+        # seq -> (call, size, index buckets holding seq)
+        self._calls: dict[int, tuple[NetworkCall, int, list[deque[int]]]] = {}
+        self._first_seq = 0
+        self._next_seq = 0
+        self._total_bytes = 0
+        self._by_pattern: dict[UrlPattern, deque[int]] = {}
+        self._by_host: dict[str, deque[int]] = {}
+        self._cookie_header: tuple[float, str] | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.url_patterns is None or len(self.url_patterns) > 0
+
+    def _matching_patterns(self, url: str) -> list[UrlPattern]:
+        if self.url_patterns is None:
+            return []
+        return [
+            pattern
+            for pattern in self.url_patterns
+            if compile_url_pattern(*pattern)(url)
+        ]
+
+    def matches_url(self, url: str) -> bool:
+        if self.url_patterns is None:
+            return True
+        return len(self._matching_patterns(url)) > 0
+
+    def wants_body(self, headers: dict[str, str]) -> bool:
+        content_type = headers.get("content-type", "").lower()
+        if self.content_types is not None:
+            if not any(t in content_type for t in self.content_types):
+                return False
+        elif any(t in content_type for t in DEFAULT_EXCLUDED_CONTENT_TYPES):
+            return False
+
+        try:
+            content_length = int(headers.get("content-length", "0"))
+        except ValueError:
+            content_length = 0
+        return content_length <= self.max_body_bytes
+
+    def append(self, call: NetworkCall, body_size: int):
+        """Store `call`, whose body took `body_size` bytes."""
+        seq = self._next_seq
+        self._next_seq += 1
+        size = body_size + len(call.url) + _headers_size(call.headers)
+
+        buckets = [
+            self._by_pattern.setdefault(pattern, deque())
+            for pattern in self._matching_patterns(call.url)
+        ]
+        buckets.append(self._by_host.setdefault(urlsplit(call.url).netloc, deque()))
+        for bucket in buckets:
+            bucket.append(seq)
+        self._calls[seq] = (call, size, buckets)
+        self._total_bytes += size
+
+        while len(self._calls) > 1 and (
+            self._total_bytes > self.max_bytes or len(self._calls) > self.max_calls
+        ):
+            self._drop_oldest()
+
+    def _drop_oldest(self):
+        dropped, dropped_size, buckets = self._calls.pop(self._first_seq)
+        self._first_seq += 1
+        self._total_bytes -= dropped_size
+        # Buckets hold seqs in order, so the dropped call is first in each.
+        for bucket in buckets:
+            bucket.popleft()
+        host = urlsplit(dropped.url).netloc
+        if not self._by_host.get(host, True):
+            del self._by_host[host]
+
+    def clear(self):
+        self._calls.clear()
+        self._by_pattern.clear()
+        self._by_host.clear()
+        self._first_seq = self._next_seq
+        self._total_bytes = 0
+
+    def _candidates(self, pattern: UrlPattern | None) -> Iterator[int]:
+        if pattern is None:
+            return iter(list(self._calls))
+        if pattern in self._by_pattern:
+            return iter(list(self._by_pattern[pattern]))
+
+        # Pattern not declared up front: narrow to one host when the pattern
+        # starts with a scheme and host, otherwise scan everything.
+        text, pattern_type = pattern
+        if pattern_type == "substring" and text.startswith(("http://", "https://")):
+            host = urlsplit(text).netloc
+            if host:
+                return iter(list(self._by_host.get(host, ())))
+        return iter(list(self._calls))
+
+    def find(
+        self,
+        url_pattern: str | None = None,
+        pattern_type: UrlPatternType = "substring",
+        kind: Literal["request", "response"] | None = None,
+        method: str | None = None,
+    ) -> list[NetworkCall]:
+        """Captured calls matching the pattern, oldest first."""
+        pattern = (url_pattern, pattern_type) if url_pattern else None
+        matcher = compile_url_pattern(*pattern) if pattern else None
+        kind_type = {"request": NetworkRequest, "response": NetworkResponse}.get(
+            kind or ""
+        )
+
+        matches = []
+        for seq in self._candidates(pattern):
+            call, _, _ = self._calls[seq]
+            if kind_type is not None and not isinstance(call, kind_type):
+                continue
+            if method is not None and (call.method or "").upper() != method.upper():
+                continue
+            if matcher is not None and not matcher(call.url):
+                continue
+            matches.append(call)
+        return matches
+
+    def __iter__(self) -> Iterator[NetworkCall]:
+        return iter([call for call, _, _ in self._calls.values()])
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def invalidate_cookies(self):
+        self._cookie_header = None
+
+    async def get_cookie_header(self, context) -> str:
+        """Cookie header for the context, cached for NETWORK_CAPTURE_COOKIE_TTL
+        seconds or until a response sets a cookie."""
+        now = time.monotonic()
+        if (
+            self._cookie_header is not None
+            and now - self._cookie_header[0] < settings.NETWORK_CAPTURE_COOKIE_TTL
+        ):
+            return self._cookie_header[1]
+
+        cookies = await context.cookies()
+        cookie_header = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+        self._cookie_header = (now, cookie_header)
+        return cookie_header
+
+
+def _headers_size(headers: dict[str, str] | None) -> int:
+    if not headers:
+        return 0
+    return sum(len(name) + len(value) for name, value in headers.items())
+
+
+def parse_body(raw: bytes) -> dict | list | str | None:
+    try:
+        return json.loads(raw)
+    except Exception:
+        try:
+            return raw.decode("utf-8")
+        except Exception:
+            return None
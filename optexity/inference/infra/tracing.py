@@ -0,0 +1,320 @@
+import asyncio
+import bisect
+import functools
+import logging
+import secrets
+import statistics
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Spans that get the event loop lag seen while they ran as attributes.
+LAG_SPANS = {"task", "node"}
+OTLP_EXPORT_TIMEOUT = 10.0
+
+_tracer: ContextVar["Tracer | None"] = ContextVar("tracer", default=None)
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+@dataclass(eq=False)
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class LoopLagMonitor:
+    """Samples how late a sleep of `interval` seconds wakes up, i.e. how long
+    the event loop was kept from handling anything else (such as CDP events).
+
+    A longer interval is cheaper but underestimates short stalls that end
+    before the sleep is due.
+    """
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.times: list[int] = []
+        self.lags: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self.times.append(time.time_ns())
+            self.lags.append(lag)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
+
+    def window(self, start_ns: int, end_ns: int) -> list[tuple[int, float]]:
+        """(time_ns, lag) samples taken between `start_ns` and `end_ns`."""
+        lo = bisect.bisect_left(self.times, start_ns)
+        hi = bisect.bisect_right(self.times, end_ns)
+        return list(zip(self.times[lo:hi], self.lags[lo:hi]))
+
+    def summary(self, lags: list[float] | None = None) -> tuple[float, float]:
+        """(max, p99) of `lags`, by default of all samples, in seconds."""
+        lags = sorted(self.lags if lags is None else lags)
+        if not lags:
+            return 0.0, 0.0
+        return lags[-1], lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+
+
+class Tracer:
+    """Records the span tree of one task: task, node, action and the
+    sub-operations timed with `span` or `traced`, plus event loop lag.
+
+    Spans are kept in the order they finish. The tracer and the current span
+    live in context variables, so concurrent asyncio tasks (such as parallel
+    for loop lanes) each extend the tree from where they were started.
+    """
+
+    def __init__(self, lag_interval: float):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: list[Span] = []
+        self.lag_monitor = LoopLagMonitor(lag_interval)
+
+    def start(self):
+        self.lag_monitor.start()
+
+    def stop(self):
+        self.lag_monitor.stop()
+
+    def _finish(self, span: Span):
+        span.end_ns = time.time_ns()
+        if span.name in LAG_SPANS:
+            lags = [
+                lag for _, lag in self.lag_monitor.window(span.start_ns, span.end_ns)
+            ]
+            max_lag, p99_lag = self.lag_monitor.summary(lags)
+            span.attributes["loop_lag.max_ms"] = round(max_lag * 1000, 3)
+            span.attributes["loop_lag.p99_ms"] = round(p99_lag * 1000, 3)
+        self.spans.append(span)
+
+    def subtree(self, root: Span) -> list[Span]:
+        """`root` and its finished descendants, in the order they finished."""
+        ids = {root.span_id}
+        spans = []
+        # Children finish before their parents, so walking backwards from
+        # the root reaches every parent before its children.
+        for span in reversed(self.spans):
+            if span.end_ns < root.start_ns:
+                break
+            if span is root or span.parent_id in ids:
+                ids.add(span.span_id)
+                spans.append(span)
+        return spans[::-1]
+
+    def step_trace(self, node: Span) -> dict:
+        """The trace of one node, as stored in its step directory."""
+        end_ns = node.end_ns if node.end_ns is not None else time.time_ns()
+        return {
+            "trace_id": self.trace_id,
+            "spans": [span.to_dict() for span in self.subtree(node)],
+            "loop_lag_ms": [
+                [t, round(lag * 1000, 3)]
+                for t, lag in self.lag_monitor.window(node.start_ns, end_ns)
+            ],
+        }
+
+    def summary(self) -> dict:
+        """Count, total and max duration per span name, and event loop lag."""
+        spans: dict[str, dict[str, float]] = {}
+        for span in self.spans:
+            entry = spans.setdefault(
+                span.name, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            entry["count"] += 1
+            entry["errors"] += span.error is not None
+            entry["total_ms"] += span.duration_ms
+            entry["max_ms"] = max(entry["max_ms"], span.duration_ms)
+        for entry in spans.values():
+            entry["total_ms"] = round(entry["total_ms"], 3)
+            entry["max_ms"] = round(entry["max_ms"], 3)
+
+        lags = self.lag_monitor.lags
+        max_lag, p99_lag = self.lag_monitor.summary()
+        return {
+            "trace_id": self.trace_id,
+            "spans": spans,
+            "loop_lag": {
+                "samples": len(lags),
+                "max_ms": round(max_lag * 1000, 3),
+                "p99_ms": round(p99_lag * 1000, 3),
+                "mean_ms": round(statistics.fmean(lags) * 1000, 3) if lags else 0.0,
+            },
+        }
+
+
+def get_tracer() -> Tracer | None:
+    return _tracer.get()
+
+
+@contextmanager
+def use_tracer(tracer: Tracer | None) -> Iterator[Tracer | None]:
+    """Make `tracer` current, with its lag monitor running, for the block.
+    With None, tracing stays off."""
+    if tracer is None:
+        yield None
+        return
+
+    token = _tracer.set(tracer)
+    tracer.start()
+    try:
+        yield tracer
+    finally:
+        tracer.stop()
+        _tracer.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """Time the block as a child of the current span; yields None and records
+    nothing when no tracer is current."""
+    tracer = _tracer.get()
+    if tracer is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        trace_id=tracer.trace_id,
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id if parent is not None else None,
+        attributes=attributes,
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        tracer._finish(current)
+
+
+def traced(name: str, **attributes: Any) -> Callable:
+    """Decorator timing every call of a coroutine function as a span."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def set_attributes(**attributes: Any):
+    """Add attributes to the current span, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict]:
+    return [
+        {"key": key, "value": _otlp_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+def to_otlp(tracer: Tracer, resource: dict[str, Any]) -> dict:
+    """The finished spans as an OTLP/JSON ExportTraceServiceRequest."""
+    spans = []
+    for span in tracer.spans:
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": _otlp_attributes(span.attributes),
+            # STATUS_CODE_ERROR or STATUS_CODE_UNSET
+            "status": (
+                {"code": 2, "message": span.error} if span.error else {"code": 0}
+            ),
+        }
+        if span.parent_id is not None:
+            otlp_span["parentSpanId"] = span.parent_id
+        spans.append(otlp_span)
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes(resource)},
+                "scopeSpans": [{"scope": {"name": "optexity"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+async def export_otlp(tracer: Tracer, endpoint: str, resource: dict[str, Any]):
+    """Send the finished spans to an OTLP/HTTP collector, e.g.
+    http://localhost:4318/v1/traces. Failures are logged, never raised."""
+    try:
+        async with httpx.AsyncClient(timeout=OTLP_EXPORT_TIMEOUT) as client:
+            response = await client.post(endpoint, json=to_otlp(tracer, resource))
+            response.raise_for_status()
+        logger.debug(f"Exported {len(tracer.spans)} spans to {endpoint}")
+    except Exception as e:
+        logger.warning(f"Failed to export trace to {endpoint}: {e}")
@@ -24,6 +24,13 @@ def get_llm_model(
     return model
 
 
+def reset_llm_connections():
+    """Give every cached model fresh clients, so a forked process does not
+    share pooled connections with its parent or siblings."""
+    for model in _model_cache.values():
+        model.reset_connections()
+
+
 def _create_model_with_backoff(
     model_name: GeminiModels | HumanModels | OpenAIModels, use_structured_output: bool
 ) -> LLMModel:
@@ -1,14 +1,15 @@
-import base64
 import logging
 import os
 from pathlib import Path
 from typing import Optional
 
+import aiofiles
 import httpx
 from google import genai
 from google.genai import types
 from pydantic import BaseModel, ValidationError
 
+from optexity.schema.screenshot import Screenshot
 from optexity.utils.utils import is_local_path, is_url
 
 from .llm_model import GeminiModels, LLMModel, TokenUsage
@@ -28,74 +29,62 @@ class Gemini(LLMModel):
         except Exception as e:
             raise ValueError("Invalid GOOGLE_API_KEY")
 
-    def _get_model_response_with_structured_output(
+    def reset_connections(self):
+        # The key was checked when the model was built; a fresh client opens
+        # its own connections on first use.
+        self.client = genai.Client(api_key=self.api_key)
+
+    def _build_contents(
         self,
         prompt: str,
-        response_schema: type[BaseModel],
-        screenshot: Optional[str] = None,
-        pdf_url: Optional[str | Path] = None,
-        system_instruction: Optional[str] = None,
-    ) -> tuple[BaseModel, TokenUsage]:
-
-        if pdf_url is not None and screenshot is not None:
-            raise ValueError("Cannot use both screenshot and pdf_url")
-
-        final_prompt = prompt
-
+        screenshot: Optional[Screenshot | str] = None,
+        pdf_data: Optional[bytes] = None,
+    ):
         if screenshot is not None:
-            final_prompt = [
+            if isinstance(screenshot, str):
+                screenshot = Screenshot.from_base64(screenshot)
+            return [
                 types.Part.from_bytes(
-                    data=base64.b64decode(screenshot),
-                    mime_type="image/png",
+                    data=screenshot.data,
+                    mime_type=screenshot.mime_type,
                 ),
                 prompt,
             ]
-        if pdf_url is not None:
-            if is_local_path(pdf_url):
-                final_prompt = [
-                    types.Part.from_bytes(
-                        data=Path(str(pdf_url)).read_bytes(),
-                        mime_type="application/pdf",
-                    ),
-                    prompt,
-                ]
-            elif is_url(pdf_url):
-                doc_data = httpx.get(str(pdf_url)).content
-                final_prompt = [
-                    types.Part.from_bytes(
-                        data=doc_data,
-                        mime_type="application/pdf",
-                    ),
-                    prompt,
-                ]
-        response = None
+        if pdf_data is not None:
+            return [
+                types.Part.from_bytes(
+                    data=pdf_data,
+                    mime_type="application/pdf",
+                ),
+                prompt,
+            ]
+        return prompt
+
+    def _get_generate_config(
+        self, response_schema: type[BaseModel], system_instruction: Optional[str]
+    ) -> dict:
+        if self.use_structured_output:
+            return {
+                "response_mime_type": "application/json",
+                "system_instruction": system_instruction,
+                "response_json_schema": response_schema.model_json_schema(),
+            }
+        return {"system_instruction": system_instruction}
+
+    def _parse_structured_response(
+        self, response: types.GenerateContentResponse, response_schema: type[BaseModel]
+    ) -> tuple[BaseModel | None, TokenUsage]:
         parsed_response = None
         token_usage = TokenUsage()
 
         try:
             if self.use_structured_output:
-                response = self.client.models.generate_content(
-                    model=self.model_name.value,
-                    contents=final_prompt,
-                    config={
-                        "response_mime_type": "application/json",
-                        "system_instruction": system_instruction,
-                        "response_json_schema": response_schema.model_json_schema(),
-                    },
-                )
-
                 if isinstance(response.parsed, BaseModel):
                     parsed_response = response.parsed
                 else:
                     parsed_response = response_schema.model_validate(response.parsed)
             else:
-                response = self.client.models.generate_content(
-                    model=self.model_name.value,
-                    contents=final_prompt,
-                    config={"system_instruction": system_instruction},
-                )
-
-                parsed_response: BaseModel = self.parse_from_completion(
+                parsed_response = self.parse_from_completion(
                     str(response.candidates[0].content.parts[0].text), response_schema
                 )
 
@@ -113,6 +102,62 @@ class Gemini(LLMModel):
 
         return parsed_response, token_usage
 
+    def _get_model_response_with_structured_output(
+        self,
+        prompt: str,
+        response_schema: type[BaseModel],
+        screenshot: Optional[Screenshot | str] = None,
+        pdf_url: Optional[str | Path] = None,
+        system_instruction: Optional[str] = None,
+    ) -> tuple[BaseModel, TokenUsage]:
+
+        if pdf_url is not None and screenshot is not None:
+            raise ValueError("Cannot use both screenshot and pdf_url")
+
+        pdf_data = None
+        if pdf_url is not None:
+            if is_local_path(pdf_url):
+                pdf_data = Path(str(pdf_url)).read_bytes()
+            elif is_url(pdf_url):
+                pdf_data = httpx.get(str(pdf_url)).content
+
+        response = self.client.models.generate_content(
+            model=self.model_name.value,
+            contents=self._build_contents(prompt, screenshot, pdf_data),
+            config=self._get_generate_config(response_schema, system_instruction),
+        )
+
+        return self._parse_structured_response(response, response_schema)
+
+    async def _aget_model_response_with_structured_output(
+        self,
+        prompt: str,
+        response_schema: type[BaseModel],
+        screenshot: Optional[Screenshot | str] = None,
+        pdf_url: Optional[str | Path] = None,
+        system_instruction: Optional[str] = None,
+    ) -> tuple[BaseModel, TokenUsage]:
+
+        if pdf_url is not None and screenshot is not None:
+            raise ValueError("Cannot use both screenshot and pdf_url")
+
+        pdf_data = None
+        if pdf_url is not None:
+            if is_local_path(pdf_url):
+                async with aiofiles.open(str(pdf_url), "rb") as f:
+                    pdf_data = await f.read()
+            elif is_url(pdf_url):
+                async with httpx.AsyncClient(follow_redirects=True) as client:
+                    pdf_data = (await client.get(str(pdf_url))).content
+
+        response = await self.client.aio.models.generate_content(
+            model=self.model_name.value,
+            contents=self._build_contents(prompt, screenshot, pdf_data),
+            config=self._get_generate_config(response_schema, system_instruction),
+        )
+
+        return self._parse_structured_response(response, response_schema)
+
     def _get_model_response(
         self, prompt: str, system_instruction: Optional[str] = None
     ) -> tuple[str, TokenUsage]:
@@ -122,6 +167,22 @@ class Gemini(LLMModel):
             contents=prompt,
             config={"system_instruction": system_instruction},
         )
+        return self._parse_text_response(response)
+
+    async def _aget_model_response(
+        self, prompt: str, system_instruction: Optional[str] = None
+    ) -> tuple[str, TokenUsage]:
+
+        response = await self.client.aio.models.generate_content(
+            model=self.model_name.value,
+            contents=prompt,
+            config={"system_instruction": system_instruction},
+        )
+        return self._parse_text_response(response)
+
+    def _parse_text_response(
+        self, response: types.GenerateContentResponse
+    ) -> tuple[str, TokenUsage]:
         if response.usage_metadata is not None:
             token_usage = self.get_token_usage(
                 input_tokens=response.usage_metadata.prompt_token_count,
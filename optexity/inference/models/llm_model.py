@@ -1,4 +1,5 @@
 import ast
+import asyncio
 import logging
 import re
 import time
@@ -9,6 +10,8 @@ from typing import Optional
 import tokencost.costs
 from pydantic import BaseModel, ValidationError
 
+from optexity.inference.infra.tracing import set_attributes, traced
+from optexity.schema.screenshot import Screenshot
 from optexity.schema.token_usage import TokenUsage
 
 logger = logging.getLogger(__name__)
@@ -46,6 +49,10 @@ class LLMModel:
         self.model_name = model_name
         self.use_structured_output = use_structured_output
 
+    def reset_connections(self):
+        """Replace clients whose connections were inherited from the parent
+        process; called in a forked task before the model is used."""
+
     def _get_model_response(
         self, prompt: str, system_instruction: Optional[str] = None
     ) -> tuple[str, TokenUsage]:
@@ -55,7 +62,22 @@ class LLMModel:
         self,
         prompt: str,
         response_schema: type[BaseModel],
-        screenshot: Optional[str] = None,
+        screenshot: Optional[Screenshot | str] = None,
+        pdf_url: Optional[str | Path] = None,
+        system_instruction: Optional[str] = None,
+    ) -> tuple[BaseModel, TokenUsage]:
+        raise NotImplementedError("This method should be implemented by subclasses.")
+
+    async def _aget_model_response(
+        self, prompt: str, system_instruction: Optional[str] = None
+    ) -> tuple[str, TokenUsage]:
+        raise NotImplementedError("This method should be implemented by subclasses.")
+
+    async def _aget_model_response_with_structured_output(
+        self,
+        prompt: str,
+        response_schema: type[BaseModel],
+        screenshot: Optional[Screenshot | str] = None,
         pdf_url: Optional[str | Path] = None,
         system_instruction: Optional[str] = None,
     ) -> tuple[BaseModel, TokenUsage]:
@@ -81,7 +103,7 @@ class LLMModel:
         self,
         prompt: str,
         response_schema: type[BaseModel],
-        screenshot: Optional[str] = None,
+        screenshot: Optional[Screenshot | str] = None,
         pdf_url: Optional[str | Path] = None,
         system_instruction: Optional[str] = None,
     ) -> tuple[BaseModel, TokenUsage]:
@@ -117,6 +139,65 @@ class LLMModel:
             + last_exception
         )
 
+    @traced("llm_call")
+    async def aget_model_response(
+        self, prompt: str, system_instruction: Optional[str] = None
+    ) -> tuple[str, TokenUsage]:
+        set_attributes(model=self.model_name.value, structured_output=False)
+
+        max_retries = 3
+        for i in range(max_retries):
+            try:
+                return await self._aget_model_response(prompt, system_instruction)
+            except Exception as e:
+                logger.error(f"LLM Error during inference: {e}")
+                if i < max_retries - 1:
+                    logger.info(f"Retrying... {i + 1}/{max_retries}")
+                    await asyncio.sleep(5)
+                continue
+        raise Exception("Max retries exceeded for LLM")
+
+    @traced("llm_call")
+    async def aget_model_response_with_structured_output(
+        self,
+        prompt: str,
+        response_schema: type[BaseModel],
+        screenshot: Optional[Screenshot | str] = None,
+        pdf_url: Optional[str | Path] = None,
+        system_instruction: Optional[str] = None,
+    ) -> tuple[BaseModel, TokenUsage]:
+        set_attributes(model=self.model_name.value, structured_output=True)
+
+        total_token_usage = TokenUsage()
+        max_retries = 3
+        last_exception = ""
+        for i in range(max_retries):
+            try:
+                parsed_response, token_usage = (
+                    await self._aget_model_response_with_structured_output(
+                        prompt=prompt,
+                        response_schema=response_schema,
+                        screenshot=screenshot,
+                        pdf_url=pdf_url,
+                        system_instruction=system_instruction,
+                    )
+                )
+                total_token_usage += token_usage
+                if parsed_response is not None:
+                    return parsed_response, total_token_usage
+            except Exception as e:
+                logger.error(f"LLM with structured output Error during inference: {e}")
+                if i < max_retries - 1:
+                    logger.info(f"Retrying... {i + 1}/{max_retries}")
+                    await asyncio.sleep(20)
+                last_exception = str(e)
+
+        raise Exception(
+            "Max retries exceeded for LLM with structured output"
+            + "\n"
+            + last_exception
+        )
+
     def extract_json_objects(self, text):
         stack = []  # Stack to track `{` positions
         json_candidates = []  # Potential JSON substrings
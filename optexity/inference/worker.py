@@ -1,18 +1,130 @@
 import asyncio
 import json
+import logging
+import os
 import sys
 
+if __name__ == "__main__" and "--serve" in sys.argv:
+    # stdout carries the protocol with the parent; anything the inference stack
+    # prints or logs to stdout is redirected to stderr before it is imported.
+    _protocol_out = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+
 from optexity.inference.core.run_automation import run_automation
+from optexity.inference.infra.control_plane import close_control_plane_client
+from optexity.inference.models import reset_llm_connections
 from optexity.schema.task import Task
 
+logger = logging.getLogger(__name__)
+
+
+async def run_task(
+    task: Task, unique_child_arn: str, child_process_id: int, debug_port: int | None
+):
+    try:
+        await run_automation(
+            task, unique_child_arn, child_process_id, debug_port=debug_port
+        )
+    finally:
+        await close_control_plane_client()
+
 
 async def main():
     task = Task.model_validate_json(sys.argv[1])
     unique_child_arn = sys.argv[2]
     child_process_id = int(sys.argv[3])
+    debug_port = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    await run_task(task, unique_child_arn, child_process_id, debug_port)
+
+
+def warm_up():
+    """Build the shared LLM model and agents once so forked tasks inherit them.
+
+    Building the model opens a connection to check the API key; forked tasks
+    replace its clients with `reset_llm_connections`.
+    """
+    from optexity.inference.core.interaction.handle_select_utils import (
+        get_select_value_prediction_agent,
+    )
+    from optexity.inference.core.interaction.utils import get_index_prediction_agent
+    from optexity.inference.core.run_interaction import get_error_handler_agent
+    from optexity.inference.core.run_two_fa import get_two_fa_extraction_agent
+    from optexity.inference.models import GeminiModels, get_llm_model
+
+    try:
+        get_llm_model(GeminiModels.GEMINI_2_5_FLASH, True)
+        get_error_handler_agent()
+        get_index_prediction_agent()
+        get_select_value_prediction_agent()
+        get_two_fa_extraction_agent()
+    except Exception as e:
+        logger.warning(f"Could not warm up LLM model in worker: {e}")
+
+
+def run_forked_task(request: dict) -> int:
+    pid = os.fork()
+    if pid != 0:
+        return pid
+
+    # Child: own process group so the parent can kill the whole task tree.
+    exit_code = 0
+    try:
+        os.setsid()
+        sys.stdin.close()
+        _protocol_out.close()
+        reset_llm_connections()
+        task = Task.model_validate_json(request["task"])
+        asyncio.run(
+            run_task(
+                task,
+                request["unique_child_arn"],
+                request["child_process_id"],
+                request["debug_port"],
+            )
+        )
+    except BaseException:
+        logger.exception("Forked task process failed")
+        exit_code = 1
+    finally:
+        logging.shutdown()
+        os._exit(exit_code)
+
+
+def send(message: dict):
+    _protocol_out.write(json.dumps(message) + "\n")
+    _protocol_out.flush()
+
+
+def serve():
+    """Long-lived worker: read one JSON task per line and run it in a fork.
+
+    Replies with a "started" message carrying the pid (also the process group
+    id) and a "finished" message with the return code once the task exits.
+    """
+    warm_up()
+    send({"event": "ready"})
 
-    await run_automation(task, unique_child_arn, child_process_id)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = run_forked_task(request)
+        send({"event": "started", "pid": pid})
+        _, status = os.waitpid(pid, 0)
+        send(
+            {
+                "event": "finished",
+                "pid": pid,
+                "returncode": os.waitstatus_to_exitcode(status),
+            }
+        )
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if "--serve" in sys.argv:
+        serve()
+    else:
+        asyncio.run(main())
@@ -1,8 +1,9 @@
-from typing import Literal, Optional
+from typing import ClassVar, Literal, Optional
 
 from pydantic import BaseModel, field_validator, model_validator
 
 from optexity.schema.actions.extraction_action import LLMExtraction
+from optexity.schema.template import TemplatedModel
 
 
 class LLMAssertion(LLMExtraction):
@@ -34,11 +35,13 @@ class PythonScriptAssertion(BaseModel):
         return v
 
 
-class AssertionAction(BaseModel):
+class AssertionAction(TemplatedModel):
     network_call: Optional[NetworkCallAssertion] = None
     llm: Optional[LLMAssertion] = None
     python_script: Optional[PythonScriptAssertion] = None
 
+    template_fields: ClassVar[dict[str, bool]] = {"llm": False}
+
     @model_validator(mode="after")
     def validate_one_assertion(self):
         """Ensure exactly one of the extraction types is set and matches the type."""
@@ -55,12 +58,3 @@ class AssertionAction(BaseModel):
             )
 
         return self
-
-    def replace(self, pattern: str, replacement: str):
-        if self.network_call:
-            pass
-        if self.llm:
-            self.llm.replace(pattern, replacement)
-        if self.python_script:
-            pass
-        return self
@@ -1,13 +1,14 @@
-from typing import Any, List, Literal, Optional
+from typing import Any, ClassVar, List, Literal, Optional
 from uuid import uuid4
 
 from pydantic import BaseModel, Field, field_validator, model_validator
 
 from optexity.schema.actions.two_fa_action import TwoFAAction
+from optexity.schema.template import TemplatedModel
 from optexity.utils.utils import build_model
 
 
-class LLMExtraction(BaseModel):
+class LLMExtraction(TemplatedModel):
     source: list[Literal["axtree", "screenshot"]] = ["axtree"]
     extraction_format: dict
     extraction_instructions: str
@@ -15,6 +16,8 @@ class LLMExtraction(BaseModel):
     llm_provider: Literal["gemini"] = "gemini"
     llm_model_name: str = "gemini-2.5-flash"
 
+    template_fields: ClassVar[dict[str, bool]] = {"extraction_instructions": False}
+
     def build_model(self):
         return build_model(self.extraction_format)
 
@@ -53,15 +56,11 @@ class LLMExtraction(BaseModel):
 
         return self
 
-    def replace(self, pattern: str, replacement: str):
-        self.extraction_instructions = self.extraction_instructions.replace(
-            pattern, replacement
-        )
-        return self
-
 
-class NetworkCallExtraction(BaseModel):
+class NetworkCallExtraction(TemplatedModel):
     url_pattern: Optional[str] = None
+    url_pattern_type: Literal["substring", "glob", "regex"] = "substring"
+    method: Optional[str] = None
     extract_from: None | Literal["request", "response"] = "response"
     download_from: None | Literal["request", "response"] = "response"
     download_filename: str | None = None
@@ -77,14 +76,13 @@ class NetworkCallExtraction(BaseModel):
 
         return data
 
-    def replace(self, pattern: str, replacement: str):
-        return self
-
 
-class PythonScriptExtraction(BaseModel):
+class PythonScriptExtraction(TemplatedModel):
     script: str
     ## TODO: add output to memory variables
 
+    template_fields: ClassVar[dict[str, bool]] = {"script": False}
+
     @field_validator("script")
     @classmethod
     def validate_script(cls, v: str):
@@ -92,10 +90,6 @@ class PythonScriptExtraction(BaseModel):
             raise ValueError("Script cannot be empty")
         return v
 
-    def replace(self, pattern: str, replacement: str):
-        self.script = self.script.replace(pattern, replacement)
-        return self
-
 
 class ScreenshotExtraction(BaseModel):
     filename: str
@@ -106,13 +100,15 @@ class StateExtraction(BaseModel):
     pass
 
 
-class PDFExtraction(BaseModel):
+class PDFExtraction(TemplatedModel):
     filename: str
     extraction_format: dict
     extraction_instructions: str
     llm_provider: Literal["gemini"] = "gemini"
     llm_model_name: str = "gemini-2.5-flash"
 
+    template_fields: ClassVar[dict[str, bool]] = {"extraction_instructions": False}
+
     def build_model(self):
         return build_model(self.extraction_format)
 
@@ -126,14 +122,8 @@ class PDFExtraction(BaseModel):
             return v
         raise ValueError("extraction_format must be either a string or a dict")
 
-    def replace(self, pattern: str, replacement: str):
-        self.extraction_instructions = self.extraction_instructions.replace(
-            pattern, replacement
-        )
-        return self
-
 
-class ExtractionAction(BaseModel):
+class ExtractionAction(TemplatedModel):
     unique_identifier: str | None = None
     network_call: Optional[NetworkCallExtraction] = None
     llm: Optional[LLMExtraction] = None
@@ -143,6 +133,13 @@ class ExtractionAction(BaseModel):
     two_fa_action: TwoFAAction | None = None
     pdf: Optional[PDFExtraction] = None
 
+    template_fields: ClassVar[dict[str, bool]] = {
+        "network_call": False,
+        "llm": False,
+        "python_script": False,
+        "unique_identifier": False,
+    }
+
     @model_validator(mode="after")
     def validate_one_extraction(self):
         """Ensure exactly one of the extraction types is set and matches the type."""
@@ -163,16 +160,3 @@ class ExtractionAction(BaseModel):
             )
 
         return self
-
-    def replace(self, pattern: str, replacement: str):
-        if self.network_call:
-            self.network_call.replace(pattern, replacement)
-        if self.llm:
-            self.llm.replace(pattern, replacement)
-        if self.python_script:
-            self.python_script.replace(pattern, replacement)
-        if self.unique_identifier:
-            self.unique_identifier = self.unique_identifier.replace(
-                pattern, replacement
-            )
-        return self
@@ -1,10 +1,11 @@
 from enum import Enum, unique
-from typing import Any, Literal
+from typing import Any, ClassVar, Literal
 from uuid import uuid4
 
 from pydantic import BaseModel, Field, model_validator
 
 from optexity.schema.actions.prompts import overlay_popup_prompt
+from optexity.schema.template import TemplatedModel
 
 
 class Locator(BaseModel):
@@ -19,7 +20,7 @@ class DialogAction(BaseModel):
     prompt_instructions: str
 
 
-class BaseAction(BaseModel):
+class BaseAction(TemplatedModel):
     xpath: str | None = None
     command: str | None = None
     prompt_instructions: str
@@ -27,6 +28,12 @@ class BaseAction(BaseModel):
     skip_prompt: bool = False
     assert_locator_presence: bool = False
 
+    template_fields: ClassVar[dict[str, bool]] = {
+        "prompt_instructions": False,
+        "xpath": False,
+        "command": True,
+    }
+
     @model_validator(mode="after")
     def validate_one_extraction(cls, model: "BaseAction"):
         """Ensure exactly one of the extraction types is set and matches the type."""
@@ -50,16 +57,6 @@ class BaseAction(BaseModel):
 
         return model
 
-    def replace(self, pattern: str, replacement: str):
-        if self.prompt_instructions:
-            self.prompt_instructions = self.prompt_instructions.replace(
-                pattern, replacement
-            )
-        if self.xpath:
-            self.xpath = self.xpath.replace(pattern, replacement)
-        if self.command:
-            self.command = self.command.replace(pattern, replacement).strip('"')
-
 
 class CheckAction(BaseAction):
     pass
@@ -78,6 +75,12 @@ class SelectOptionAction(BaseAction):
     expect_download: bool = False
     download_filename: str | None = None
 
+    template_fields: ClassVar[dict[str, bool]] = {
+        **BaseAction.template_fields,
+        "select_values": True,
+        "download_filename": True,
+    }
+
     @model_validator(mode="after")
     def set_download_filename(cls, model: "SelectOptionAction"):
 
@@ -86,19 +89,6 @@ class SelectOptionAction(BaseAction):
 
         return model
 
-    def replace(self, pattern: str, replacement: str):
-        super().replace(pattern, replacement)
-        if self.select_values:
-            self.select_values = [
-                value.replace(pattern, replacement).strip('"')
-                for value in self.select_values
-            ]
-        if self.download_filename:
-            self.download_filename = self.download_filename.replace(
-                pattern, replacement
-            ).strip('"')
-        return self
-
 
 class ClickElementAction(BaseAction):
     double_click: bool = False
@@ -106,6 +96,11 @@ class ClickElementAction(BaseAction):
     download_filename: str | None = None
     button: Literal["left", "right", "middle"] = "left"
 
+    template_fields: ClassVar[dict[str, bool]] = {
+        **BaseAction.template_fields,
+        "download_filename": True,
+    }
+
     @model_validator(mode="after")
     def set_download_filename(cls, model: "ClickElementAction"):
 
@@ -114,14 +109,6 @@ class ClickElementAction(BaseAction):
 
         return model
 
-    def replace(self, pattern: str, replacement: str):
-        super().replace(pattern, replacement)
-        if self.download_filename:
-            self.download_filename = self.download_filename.replace(
-                pattern, replacement
-            ).strip('"')
-        return self
-
 
 class InputTextAction(BaseAction):
     input_text: str | None = None
@@ -129,30 +116,24 @@ class InputTextAction(BaseAction):
     fill_or_type: Literal["fill", "type", "key_press"] = "fill"
     press_enter: bool = False
 
+    template_fields: ClassVar[dict[str, bool]] = {
+        **BaseAction.template_fields,
+        "input_text": True,
+    }
+
     @model_validator(mode="after")
     def validate_press_enter(self):
         if self.press_enter and self.command is None:
             raise ValueError("command is required when press_enter is True")
         return self
 
-    def replace(self, pattern: str, replacement: str):
-        super().replace(pattern, replacement)
-        if self.input_text:
-            self.input_text = self.input_text.replace(pattern, replacement).strip('"')
-        return self
 
-
-class DownloadUrlAsPdfAction(BaseModel):
+class DownloadUrlAsPdfAction(TemplatedModel):
     # Used when the current page is a PDF and we want to download it
     download_filename: str = Field(default_factory=lambda: str(uuid4()))
     url: str | None = None
 
-    def replace(self, pattern: str, replacement: str):
-        if self.download_filename:
-            self.download_filename = self.download_filename.replace(
-                pattern, replacement
-            ).strip('"')
-        return self
+    template_fields: ClassVar[dict[str, bool]] = {"download_filename": True}
 
 
 class ScrollAction(BaseModel):
@@ -162,20 +143,14 @@ class ScrollAction(BaseModel):
 class UploadFileAction(BaseAction):
     file_path: str
 
-    def replace(self, pattern: str, replacement: str):
-        if self.file_path:
-            self.file_path = self.file_path.replace(pattern, replacement).strip('"')
-        return self
+    template_fields: ClassVar[dict[str, bool]] = {"file_path": True}
 
 
-class GoToUrlAction(BaseModel):
+class GoToUrlAction(TemplatedModel):
     url: str
     new_tab: bool = False  # True to open in new tab, False to navigate in current tab
 
-    def replace(self, pattern: str, replacement: str):
-        if self.url:
-            self.url = self.url.replace(pattern, replacement).strip('"')
-        return self
+    template_fields: ClassVar[dict[str, bool]] = {"url": True}
 
 
 class GoBackAction(BaseModel):
@@ -194,10 +169,12 @@ class CloseAllButLastTabAction(BaseModel):
     pass
 
 
-class CloseTabsUntil(BaseModel):
+class CloseTabsUntil(TemplatedModel):
     matching_url: str | None = None
     tab_index: int | None = None
 
+    template_fields: ClassVar[dict[str, bool]] = {"matching_url": True}
+
     @model_validator(mode="after")
     def validate_one_of_matching_url_or_tab_index(self):
         non_null = [k for k, v in self.model_dump().items() if v is not None]
@@ -207,13 +184,6 @@ class CloseTabsUntil(BaseModel):
             )
         return self
 
-    def replace(self, pattern: str, replacement: str):
-        if self.matching_url:
-            self.matching_url = self.matching_url.replace(pattern, replacement).strip(
-                '"'
-            )
-        return self
-
 
 @unique
 class KeyPressType(str, Enum):
@@ -236,32 +206,26 @@ class KeyPressType(str, Enum):
     SPACE = "Space"
 
 
-class KeyPressAction(BaseModel):
+class KeyPressAction(TemplatedModel):
     type: KeyPressType | Any
 
+    template_fields: ClassVar[dict[str, bool]] = {"type": True}
+
     @model_validator(mode="after")
     def validate_type(self):
         if self.type is None:
             raise ValueError("type is required")
         return self
 
-    def replace(self, pattern: str, replacement: str):
-        if self.type:
-            self.type = self.type.replace(pattern, replacement).strip('"')
-        return self
 
-
-class AgenticTask(BaseModel):
+class AgenticTask(TemplatedModel):
     task: str
     max_steps: int
     backend: Literal["browser_use", "browserbase"]
     use_vision: bool = False
     keep_alive: bool = True
 
-    def replace(self, pattern: str, replacement: str):
-        if self.task:
-            self.task = self.task.replace(pattern, replacement).strip('"')
-        return self
+    template_fields: ClassVar[dict[str, bool]] = {"task": True}
 
 
 class CloseOverlayPopupAction(AgenticTask):
@@ -272,7 +236,7 @@ class CloseOverlayPopupAction(AgenticTask):
     keep_alive: bool = Field(default=True)
 
 
-class InteractionAction(BaseModel):
+class InteractionAction(TemplatedModel):
     max_tries: int = 10
     max_timeout_seconds_per_try: float = 1.0
     click_element: ClickElementAction | None = None
@@ -294,6 +258,22 @@ class InteractionAction(BaseModel):
     close_overlay_popup: CloseOverlayPopupAction | None = None
     key_press: KeyPressAction | None = None
 
+    template_fields: ClassVar[dict[str, bool]] = {
+        "click_element": False,
+        "input_text": False,
+        "select_option": False,
+        "check": False,
+        "uncheck": False,
+        "hover": False,
+        "download_url_as_pdf": False,
+        "close_tabs_until": False,
+        "agentic_task": False,
+        "close_overlay_popup": False,
+        "go_to_url": False,
+        "upload_file": False,
+        "key_press": False,
+    }
+
     @model_validator(mode="after")
     def validate_one_interaction(cls, model: "InteractionAction"):
         """Ensure exactly one of the interaction types is set and matches the type."""
@@ -332,33 +312,3 @@ class InteractionAction(BaseModel):
             model.max_tries = 5
 
         return model
-
-    def replace(self, pattern: str, replacement: str):
-        if self.click_element:
-            self.click_element.replace(pattern, replacement)
-        if self.input_text:
-            self.input_text.replace(pattern, replacement)
-        if self.select_option:
-            self.select_option.replace(pattern, replacement)
-        if self.check:
-            self.check.replace(pattern, replacement)
-        if self.uncheck:
-            self.uncheck.replace(pattern, replacement)
-        if self.hover:
-            self.hover.replace(pattern, replacement)
-        if self.download_url_as_pdf:
-            self.download_url_as_pdf.replace(pattern, replacement)
-        if self.close_tabs_until:
-            self.close_tabs_until.replace(pattern, replacement)
-        if self.agentic_task:
-            self.agentic_task.replace(pattern, replacement)
-        if self.close_overlay_popup:
-            self.close_overlay_popup.replace(pattern, replacement)
-        if self.go_to_url:
-            self.go_to_url.replace(pattern, replacement)
-        if self.upload_file:
-            self.upload_file.replace(pattern, replacement)
-        if self.key_press:
-            self.key_press.replace(pattern, replacement)
-
-        return self
@@ -1,12 +1,15 @@
 import logging
-from typing import Annotated, Any, ForwardRef, Literal
+from typing import Annotated, Any, ClassVar, ForwardRef, Iterator, Literal, Mapping
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
 
 from optexity.schema.actions.assertion_action import AssertionAction
 from optexity.schema.actions.extraction_action import ExtractionAction
 from optexity.schema.actions.interaction_action import InteractionAction
 from optexity.schema.actions.misc_action import PythonScriptAction, SleepAction
+from optexity.schema.condition import Condition
+from optexity.schema.memory import CapturePolicy
+from optexity.schema.template import ModelTemplate, Reference, TemplatedModel
 from optexity.utils.utils import get_onepassword_value, get_totp_code
 
 logger = logging.getLogger(__name__)
@@ -61,7 +64,34 @@ class SecureParameter(BaseModel):
         return self
 
 
-class ActionNode(BaseModel):
+async def resolve_variable_value(key: str, value: Any) -> str:
+    if isinstance(value, SecureParameter):
+        if value.onepassword:
+            str_value = await get_onepassword_value(
+                value.onepassword.vault_name,
+                value.onepassword.item_name,
+                value.onepassword.field_name,
+            )
+            if value.onepassword.type == "totp_secret":
+                str_value = get_totp_code(str_value, value.onepassword.digits)
+            return str_value
+        elif value.amazon_secrets_manager:
+            raise NotImplementedError("Amazon Secrets Manager is not implemented yet")
+        elif value.totp:
+            return get_totp_code(value.totp.totp_secret, value.totp.digits)
+
+    elif (
+        isinstance(value, str)
+        or isinstance(value, int)
+        or isinstance(value, float)
+        or isinstance(value, bool)
+    ):
+        return str(value)
+
+    raise ValueError(f"Invalid value type for {key}: {type(value)}")
+
+
+class ActionNode(TemplatedModel):
     type: Literal["action_node"]
     interaction_action: InteractionAction | None = None
     assertion_action: AssertionAction | None = None
@@ -70,9 +100,19 @@ class ActionNode(BaseModel):
     sleep_action: SleepAction | None = None
     before_sleep_time: float = 0.0
     end_sleep_time: float = 5.0
+    wait_for_settle: bool = False
     expect_new_tab: bool = False
     max_new_tab_wait_time: float = 0.0
     localized_axtree_string: str | None = None
+    capture_policy: CapturePolicy | None = None
+
+    # python_script_action and sleep_action take no placeholders.
+    template_fields: ClassVar[dict[str, bool]] = {
+        "interaction_action": False,
+        "assertion_action": False,
+        "extraction_action": False,
+    }
+    _template: ModelTemplate | None = PrivateAttr(default=None)
 
     @model_validator(mode="after")
     def validate_one_node(cls, model: "ActionNode"):
@@ -120,62 +160,63 @@ class ActionNode(BaseModel):
         return model
 
     def replace(self, pattern: str, replacement: str | int | float | bool | None):
-        replacement = str(replacement)
-        if self.interaction_action:
-            self.interaction_action.replace(pattern, replacement)
-        if self.assertion_action:
-            self.assertion_action.replace(pattern, replacement)
-        if self.extraction_action:
-            self.extraction_action.replace(pattern, replacement)
-        if self.python_script_action:
-            pass
-        if self.sleep_action:
-            pass
-
-        return self
+        return super().replace(pattern, str(replacement))
 
     async def replace_variables(
         self, variables: dict[str, list[str | SecureParameter]]
     ):
         for key, values in variables.items():
-
             for index, value in enumerate(values):
                 pattern = f"{{{key}[{index}]}}"
+                self.replace(pattern, await resolve_variable_value(key, value))
 
-                if isinstance(value, SecureParameter):
-                    if value.onepassword:
-                        str_value = await get_onepassword_value(
-                            value.onepassword.vault_name,
-                            value.onepassword.item_name,
-                            value.onepassword.field_name,
-                        )
-                        if value.onepassword.type == "totp_secret":
-                            str_value = get_totp_code(
-                                str_value, value.onepassword.digits
-                            )
-
-                    elif value.amazon_secrets_manager:
-                        raise NotImplementedError(
-                            "Amazon Secrets Manager is not implemented yet"
-                        )
-                    elif value.totp:
-                        str_value = get_totp_code(
-                            value.totp.totp_secret, value.totp.digits
-                        )
-
-                elif (
-                    isinstance(value, str)
-                    or isinstance(value, int)
-                    or isinstance(value, float)
-                    or isinstance(value, bool)
-                ):
-                    str_value = str(value)
-                else:
-                    raise ValueError(f"Invalid value type for {key}: {type(value)}")
+        return self
 
-                self.replace(pattern, str_value)
+    def template(self) -> ModelTemplate:
+        """Substitution plan of this node, compiled on first use."""
+        if self._template is None:
+            self._template = ModelTemplate(self)
+        return self._template
+
+    async def render(
+        self,
+        variables: list[dict[str, list[str | SecureParameter]]],
+        loop_indices: dict[str, int] | None = None,
+    ) -> "ActionNode":
+        """Return a copy of this node with its placeholders filled in.
+
+        The node is compiled into a substitution plan on first use and each
+        render is a single pass over its templated fields; the node itself is
+        never modified, so it can be rendered again for every loop iteration.
+        `{name[i]}` takes the value from the first of `variables` that has an
+        i-th value for name, and `loop_indices` fill `{name[index]}` and
+        `{index_of(name)}`. Only referenced values are resolved, so secure
+        parameters are fetched only by the nodes that use them.
+        """
+        loop_indices = loop_indices or {}
+        template = self.template()
 
-        return self
+        values: dict[Reference, str] = {}
+        for name, index in template.references(loop_indices):
+            if (name, index) in values:
+                continue
+            for source in variables:
+                if name in source and index < len(source[name]):
+                    values[(name, index)] = await resolve_variable_value(
+                        name, source[name][index]
+                    )
+                    break
+
+        # Quotes were stripped whenever any substitution ran, so keep doing so.
+        strip = bool(loop_indices) or any(
+            len(source_values) > 0
+            for source in variables
+            for source_values in source.values()
+        )
+        rendered = template.render(self, values, loop_indices, strip)
+        if rendered is not self:
+            rendered._template = None
+        return rendered
 
 
 class ForLoopNode(BaseModel):
@@ -187,6 +228,8 @@ class ForLoopNode(BaseModel):
         Annotated[ActionNode | IfElseNodeRef, Field(discriminator="type")]
     ] = []
     on_error_in_loop: Literal["continue", "break", "raise"] = "raise"
+    # Run up to this many iterations at once, each lane in its own tab.
+    parallelism: int = Field(default=1, ge=1)
 
     @model_validator(mode="before")
     def migrate_old_nodes(cls, data: dict[str, Any]):
@@ -238,6 +281,17 @@ class IfElseNode(BaseModel):
     if_nodes: list[ActionNode | IfElseNodeRef | ForLoopNodeRef]
     else_nodes: list[ActionNode | IfElseNodeRef | ForLoopNodeRef] = []
 
+    _condition: Condition | None = PrivateAttr(default=None)
+
+    def compiled_condition(self) -> Condition:
+        """The condition, compiled on first use."""
+        if self._condition is None or self._condition.source != self.condition:
+            self._condition = Condition(self.condition)
+        return self._condition
+
+    def evaluate_condition(self, variables: Mapping[str, Any]) -> bool:
+        return self.compiled_condition()(variables)
+
     @model_validator(mode="before")
     def migrate_old_nodes(cls, data: dict[str, Any]):
         for key in ["if_nodes", "else_nodes"]:
@@ -311,6 +365,10 @@ class Automation(BaseModel):
     browser_channel: Literal["chromium", "chrome"] = "chromium"
     expected_downloads: int = 0
     remove_empty_nodes_in_axtree: bool = True
+    capture_policy: CapturePolicy = "per_step"
+    # Content types whose response bodies are captured for network call
+    # extraction. None captures everything except static assets.
+    network_capture_content_types: list[str] | None = None
     url: str
     parameters: Parameters
     nodes: list[
@@ -377,6 +435,35 @@ class Automation(BaseModel):
                 )
         return self
 
+    def iter_action_nodes(self) -> Iterator[ActionNode]:
+        """All action nodes, including those nested in loops, branches and
+        post processing."""
+        stack: list = [*reversed(self.nodes), *reversed(self.post_processing_nodes)]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ActionNode):
+                yield node
+            elif isinstance(node, ForLoopNode):
+                stack.extend(reversed([*node.nodes, *node.reset_nodes]))
+            elif isinstance(node, IfElseNode):
+                stack.extend(reversed([*node.if_nodes, *node.else_nodes]))
+
+    def network_call_url_patterns(
+        self,
+    ) -> list[tuple[str, Literal["substring", "glob", "regex"]]] | None:
+        """(pattern, pattern_type) used by network call extractions, None if any
+        of them matches every URL."""
+        patterns = []
+        for node in self.iter_action_nodes():
+            if node.extraction_action and node.extraction_action.network_call:
+                network_call = node.extraction_action.network_call
+                if not network_call.url_pattern:
+                    return None
+                pattern = (network_call.url_pattern, network_call.url_pattern_type)
+                if pattern not in patterns:
+                    patterns.append(pattern)
+        return patterns
+
     def model_dump(self, *, sort_params_by_nodes: bool = False, **kwargs):
         """
         Extended model_dump with option to sort parameters by node order
@@ -0,0 +1,229 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+from optexity.schema.automation import (
+    ActionNode,
+    Automation,
+    ForLoopNode,
+    IfElseNode,
+    SecureParameter,
+)
+from optexity.schema.condition import FUNCTIONS, ConditionError
+
+
+class AutomationIssue(BaseModel):
+    severity: Literal["error", "warning"]
+    location: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.location}: {self.message}"
+
+
+def produced_variables(node: ActionNode) -> list[str]:
+    """Generated variables an action node adds to memory."""
+    assertion = node.assertion_action
+    if assertion is not None and assertion.llm is not None:
+        # LLM assertions run as LLM extractions and store their outputs too.
+        return list(assertion.llm.output_variable_names or [])
+    extraction = node.extraction_action
+    if extraction is None:
+        return []
+    if extraction.llm is not None and extraction.llm.output_variable_names:
+        return list(extraction.llm.output_variable_names)
+    if extraction.two_fa_action is not None:
+        return [extraction.two_fa_action.output_variable_name]
+    return []
+
+
+def check_automation(
+    automation: Automation,
+    input_parameters: dict[str, list] | None = None,
+    secure_parameters: dict[str, list[SecureParameter]] | None = None,
+) -> list[AutomationIssue]:
+    """Static def-use check of the variables an automation references.
+
+    Walks the nodes in execution order and follows which generated variables
+    have been produced at each point. For loops over variables that can never
+    be set and conditions that cannot be evaluated are errors, since the run
+    fails when it reaches them. Placeholders that will not be substituted are
+    warnings, as the run carries on with the placeholder text. Index bounds
+    are only checked when the task's parameter values are given.
+    """
+    return _AutomationChecker(automation, input_parameters, secure_parameters).run()
+
+
+class _AutomationChecker:
+    def __init__(
+        self,
+        automation: Automation,
+        input_parameters: dict[str, list] | None,
+        secure_parameters: dict[str, list[SecureParameter]] | None,
+    ):
+        self.automation = automation
+        self.bounds_known = input_parameters is not None
+        self.inputs = (
+            input_parameters
+            if input_parameters is not None
+            else automation.parameters.input_parameters
+        )
+        self.secure = (
+            secure_parameters
+            if secure_parameters is not None
+            else automation.parameters.secure_parameters
+        )
+        self.declared = set(automation.parameters.generated_parameters)
+        self.producible = {
+            name
+            for node in automation.iter_action_nodes()
+            for name in produced_variables(node)
+        }
+        self.produced: set[str] = set()
+        self.used: set[str] = set()
+        self.issues: list[AutomationIssue] = []
+
+    def run(self) -> list[AutomationIssue]:
+        self.check_nodes(self.automation.nodes, "nodes", ())
+        self.check_nodes(
+            self.automation.post_processing_nodes, "post_processing_nodes", ()
+        )
+        for name in self.inputs:
+            if name not in self.used:
+                self.warning("parameters", f"Input parameter {name} is never used")
+        return self.issues
+
+    def error(self, location: str, message: str):
+        self.issues.append(
+            AutomationIssue(severity="error", location=location, message=message)
+        )
+
+    def warning(self, location: str, message: str):
+        self.issues.append(
+            AutomationIssue(severity="warning", location=location, message=message)
+        )
+
+    def check_nodes(self, nodes: list, path: str, loops: tuple[str, ...]):
+        for i, node in enumerate(nodes):
+            location = f"{path}[{i}]"
+            if isinstance(node, ActionNode):
+                self.check_action_node(node, location, loops)
+            elif isinstance(node, ForLoopNode):
+                self.check_for_loop_node(node, location, loops)
+            elif isinstance(node, IfElseNode):
+                self.check_if_else_node(node, location, loops)
+
+    def check_action_node(
+        self, node: ActionNode, location: str, loops: tuple[str, ...]
+    ):
+        for kind, name, index in node.template().slots():
+            self.used.add(name)
+            if kind != "value":
+                if name not in loops:
+                    placeholder = (
+                        f"{{index_of({name})}}"
+                        if kind == "index_of"
+                        else f"{{{name}[index]}}"
+                    )
+                    self.warning(
+                        location,
+                        f"{placeholder} is used outside a for loop over {name}",
+                    )
+                continue
+
+            if name in self.inputs:
+                values = self.inputs[name]
+                if self.bounds_known and index >= len(values):
+                    self.warning(
+                        location,
+                        f"{{{name}[{index}]}} is out of range, input parameter "
+                        f"{name} has {len(values)} values",
+                    )
+            elif name in self.secure:
+                if index >= len(self.secure[name]):
+                    self.warning(
+                        location,
+                        f"{{{name}[{index}]}} is out of range, secure parameter "
+                        f"{name} has {len(self.secure[name])} values",
+                    )
+            elif name not in self.produced:
+                if name in self.producible:
+                    self.warning(
+                        location,
+                        f"{{{name}[{index}]}} is used before any node produces {name}",
+                    )
+                else:
+                    self.warning(
+                        location,
+                        f"{{{name}[{index}]}} references unknown variable {name}",
+                    )
+
+        self.produced.update(produced_variables(node))
+
+    def check_for_loop_node(
+        self, node: ForLoopNode, location: str, loops: tuple[str, ...]
+    ):
+        name = node.variable_name
+        self.used.add(name)
+        if name in self.secure:
+            self.error(
+                location, f"For loop cannot iterate over secure parameter {name}"
+            )
+        elif name in self.inputs or name in self.produced:
+            pass
+        elif name in self.producible:
+            # Inside an outer loop, a later node may produce it for the next
+            # outer iteration.
+            message = f"For loop variable {name} is only produced after the loop"
+            if loops:
+                self.warning(location, message)
+            else:
+                self.error(location, message)
+        elif name in self.declared:
+            self.error(
+                location,
+                f"For loop variable {name} is declared as a generated parameter "
+                "but no node produces it",
+            )
+        else:
+            self.error(
+                location,
+                f"For loop variable {name} is not an input parameter and no node "
+                "produces it",
+            )
+
+        self.check_nodes(node.nodes, f"{location}.nodes", (*loops, name))
+        self.check_nodes(node.reset_nodes, f"{location}.reset_nodes", (*loops, name))
+
+    def check_if_else_node(
+        self, node: IfElseNode, location: str, loops: tuple[str, ...]
+    ):
+        self.check_condition(node, location)
+
+        before = set(self.produced)
+        self.check_nodes(node.if_nodes, f"{location}.if_nodes", loops)
+        after_if = self.produced
+        self.produced = before
+        self.check_nodes(node.else_nodes, f"{location}.else_nodes", loops)
+        # A variable produced in either branch may be set afterwards.
+        self.produced |= after_if
+
+    def check_condition(self, node: IfElseNode, location: str):
+        try:
+            condition = node.compiled_condition()
+        except ConditionError as e:
+            self.error(location, str(e))
+            return
+
+        for name in sorted(condition.names):
+            if name in FUNCTIONS:
+                continue
+            self.used.add(name)
+            if name in self.inputs or name in self.produced:
+                continue
+            if name in self.producible:
+                self.warning(
+                    location, f"Condition uses {name} before any node produces it"
+                )
+            else:
+                self.error(location, f"Condition uses unknown variable {name}")
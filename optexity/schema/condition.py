@@ -0,0 +1,368 @@
+import ast
+import operator
+from typing import Any, Callable, Mapping
+
+# Largest value a condition may build with `*`, `str`, `sum` or
+# `str.replace`: characters of a string, or items of a container counting the
+# items and characters nested in it.
+MAX_REPEAT_LENGTH = 100_000
+
+FUNCTIONS: dict[str, Callable] = {
+    "abs": abs,
+    "all": all,
+    "any": any,
+    "bool": bool,
+    "float": float,
+    "int": int,
+    "len": len,
+    "list": list,
+    "max": max,
+    "min": min,
+    "round": round,
+    "set": set,
+    "sorted": sorted,
+    "str": lambda *args, **kwargs: _safe_str(*args, **kwargs),
+    "sum": lambda *args, **kwargs: _safe_sum(*args, **kwargs),
+    "tuple": tuple,
+}
+
+# Methods that may be called on str, list, tuple and dict values.
+METHODS = {
+    "casefold",
+    "count",
+    "endswith",
+    "get",
+    "index",
+    "isalpha",
+    "isdigit",
+    "isnumeric",
+    "items",
+    "keys",
+    "lower",
+    "lstrip",
+    "replace",
+    "rstrip",
+    "split",
+    "startswith",
+    "strip",
+    "upper",
+    "values",
+}
+METHOD_TYPES = (str, list, tuple, dict)
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: lambda a, b: _repeat_safe_mul(a, b),
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: lambda a, b: _safe_mod(a, b),
+}
+UNARY_OPERATORS = {
+    ast.Not: operator.not_,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+COMPARE_OPERATORS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+}
+
+Evaluator = Callable[[Mapping[str, Any]], Any]
+
+
+class ConditionError(ValueError):
+    pass
+
+
+class Condition:
+    """A condition expression compiled once into nested closures.
+
+    Only literals, variable names, subscripts, boolean, comparison and
+    arithmetic operators, conditional expressions and whitelisted functions
+    and methods are allowed, so evaluating an untrusted automation cannot
+    reach anything else. Names are looked up in the mapping passed at
+    evaluation time, which is never copied.
+    """
+
+    __slots__ = ("source", "names", "_evaluate")
+
+    def __init__(self, source: str):
+        self.source = source
+        try:
+            tree = ast.parse(source.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ConditionError(f"Condition {source!r} is not valid: {e.msg}")
+        # Names the condition reads, other than called functions.
+        self.names: set[str] = set()
+        self._evaluate = self._compile(tree.body)
+
+    def evaluate(self, variables: Mapping[str, Any]) -> Any:
+        return self._evaluate(variables)
+
+    def __call__(self, variables: Mapping[str, Any]) -> bool:
+        return bool(self._evaluate(variables))
+
+    def _compile(self, node: ast.expr) -> Evaluator:
+        if isinstance(node, ast.Constant):
+            value = node.value
+            return lambda variables: value
+
+        if isinstance(node, ast.Name):
+            return self._compile_name(node.id)
+
+        if isinstance(node, ast.BoolOp):
+            operands = [self._compile(value) for value in node.values]
+            if isinstance(node.op, ast.And):
+                return lambda variables: _and(operands, variables)
+            return lambda variables: _or(operands, variables)
+
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            unary = UNARY_OPERATORS[type(node.op)]
+            operand = self._compile(node.operand)
+            return lambda variables: unary(operand(variables))
+
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            binary = BINARY_OPERATORS[type(node.op)]
+            left, right = self._compile(node.left), self._compile(node.right)
+            return lambda variables: binary(left(variables), right(variables))
+
+        if isinstance(node, ast.Compare):
+            return self._compile_compare(node)
+
+        if isinstance(node, ast.IfExp):
+            test = self._compile(node.test)
+            body, orelse = self._compile(node.body), self._compile(node.orelse)
+            return lambda variables: (
+                body(variables) if test(variables) else orelse(variables)
+            )
+
+        if isinstance(node, ast.Subscript):
+            value = self._compile(node.value)
+            index = self._compile(node.slice)
+            return lambda variables: value(variables)[index(variables)]
+
+        if isinstance(node, ast.Slice):
+            parts = [
+                self._compile(part) if part is not None else None
+                for part in (node.lower, node.upper, node.step)
+            ]
+            return lambda variables: slice(
+                *(part(variables) if part is not None else None for part in parts)
+            )
+
+        if isinstance(node, ast.Set) and _is_placeholder(node):
+            # {name[0]}, the placeholder syntax of action nodes, reads the
+            # variable rather than building a one element set.
+            return self._compile(node.elts[0])
+
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            items = [self._compile(item) for item in node.elts]
+            factory = {ast.List: list, ast.Tuple: tuple, ast.Set: set}[type(node)]
+            return lambda variables: factory(item(variables) for item in items)
+
+        if isinstance(node, ast.Dict) and None not in node.keys:
+            keys = [self._compile(key) for key in node.keys]
+            values = [self._compile(value) for value in node.values]
+            return lambda variables: {
+                key(variables): value(variables) for key, value in zip(keys, values)
+            }
+
+        if isinstance(node, ast.Call):
+            return self._compile_call(node)
+
+        raise ConditionError(
+            f"{type(node).__name__} is not allowed in condition {self.source!r}"
+        )
+
+    def _compile_name(self, name: str) -> Evaluator:
+        self.names.add(name)
+
+        def lookup(variables: Mapping[str, Any]):
+            try:
+                return variables[name]
+            except KeyError:
+                if name in FUNCTIONS:
+                    return FUNCTIONS[name]
+                raise NameError(f"name '{name}' is not defined") from None
+
+        return lookup
+
+    def _compile_compare(self, node: ast.Compare) -> Evaluator:
+        if any(type(op) not in COMPARE_OPERATORS for op in node.ops):
+            raise ConditionError(f"Unsupported comparison in {self.source!r}")
+        left = self._compile(node.left)
+        comparisons = [
+            (COMPARE_OPERATORS[type(op)], self._compile(comparator))
+            for op, comparator in zip(node.ops, node.comparators)
+        ]
+
+        def compare(variables: Mapping[str, Any]) -> bool:
+            current = left(variables)
+            for compare_op, comparator in comparisons:
+                value = comparator(variables)
+                if not compare_op(current, value):
+                    return False
+                current = value
+            return True
+
+        return compare
+
+    def _compile_call(self, node: ast.Call) -> Evaluator:
+        if any(isinstance(arg, ast.Starred) for arg in node.args) or any(
+            keyword.arg is None for keyword in node.keywords
+        ):
+            raise ConditionError(
+                f"Argument unpacking is not allowed in {self.source!r}"
+            )
+        args = [self._compile(arg) for arg in node.args]
+        kwargs = {
+            keyword.arg: self._compile(keyword.value) for keyword in node.keywords
+        }
+
+        def arguments(variables: Mapping[str, Any]):
+            return (
+                [arg(variables) for arg in args],
+                {name: value(variables) for name, value in kwargs.items()},
+            )
+
+        if isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS:
+            function = FUNCTIONS[node.func.id]
+
+            def call(variables: Mapping[str, Any]):
+                call_args, call_kwargs = arguments(variables)
+                return function(*call_args, **call_kwargs)
+
+            return call
+
+        if isinstance(node.func, ast.Attribute) and node.func.attr in METHODS:
+            target = self._compile(node.func.value)
+            method_name = node.func.attr
+
+            def call_method(variables: Mapping[str, Any]):
+                value = target(variables)
+                if not isinstance(value, METHOD_TYPES):
+                    raise ConditionError(
+                        f"Method {method_name} cannot be called on "
+                        f"{type(value).__name__} in {self.source!r}"
+                    )
+                call_args, call_kwargs = arguments(variables)
+                if method_name == "replace" and isinstance(value, str):
+                    return _safe_replace(value, *call_args, **call_kwargs)
+                return getattr(value, method_name)(*call_args, **call_kwargs)
+
+            return call_method
+
+        raise ConditionError(f"Call is not allowed in condition {self.source!r}")
+
+
+def _is_placeholder(node: ast.Set) -> bool:
+    if len(node.elts) != 1 or not isinstance(node.elts[0], ast.Subscript):
+        return False
+    subscript = node.elts[0]
+    return (
+        isinstance(subscript.value, ast.Name)
+        and isinstance(subscript.slice, ast.Constant)
+        and isinstance(subscript.slice.value, int)
+    )
+
+
+def _and(operands: list[Evaluator], variables: Mapping[str, Any]) -> Any:
+    value = None
+    for operand in operands:
+        value = operand(variables)
+        if not value:
+            return value
+    return value
+
+
+def _or(operands: list[Evaluator], variables: Mapping[str, Any]) -> Any:
+    value = None
+    for operand in operands:
+        value = operand(variables)
+        if value:
+            return value
+    return value
+
+
+def _size(value: Any, limit: int = MAX_REPEAT_LENGTH) -> int:
+    """Characters of a string, or items of a container plus the sizes of its
+    items; counting stops once past `limit`."""
+    if isinstance(value, str):
+        return len(value)
+    if not isinstance(value, (list, tuple, set, frozenset, dict)):
+        return 0
+    size = len(value)
+    items = (
+        (item for pair in value.items() for item in pair)
+        if isinstance(value, dict)
+        else value
+    )
+    for item in items:
+        if size > limit:
+            break
+        size += _size(item, limit - size)
+    return size
+
+
+def _check_size(size: int):
+    if size > MAX_REPEAT_LENGTH:
+        raise ConditionError(
+            f"Building a value past {MAX_REPEAT_LENGTH} items is not allowed"
+        )
+
+
+def _repeat_safe_mul(left: Any, right: Any) -> Any:
+    for sequence, count in ((left, right), (right, left)):
+        if isinstance(sequence, (str, list, tuple)) and isinstance(count, int):
+            # Repeating a list repeats references to its items, but str() or
+            # sum() would copy them.
+            _check_size(_size(sequence) * count)
+    return left * right
+
+
+def _safe_str(*args: Any, **kwargs: Any) -> str:
+    # The text of a container is at least as long as the items in it.
+    if args and isinstance(args[0], (list, tuple, set, frozenset, dict)):
+        _check_size(_size(args[0]))
+    return str(*args, **kwargs)
+
+
+def _safe_sum(values: Any, start: Any = 0) -> Any:
+    # Summing sequences concatenates them, copying every item.
+    if isinstance(start, (list, tuple)):
+        values = list(values)
+        size = _size(start)
+        for value in values:
+            size += _size(value)
+            _check_size(size)
+    return sum(values, start)
+
+
+def _safe_replace(value: str, old: Any, new: Any, count: Any = -1) -> str:
+    # Replacing "" or chaining replaces grows the string like `*` does.
+    if isinstance(old, str) and isinstance(new, str) and isinstance(count, int):
+        replaced = value.count(old)
+        if count >= 0:
+            replaced = min(replaced, count)
+        if len(value) + replaced * (len(new) - len(old)) > MAX_REPEAT_LENGTH:
+            raise ConditionError(
+                f"Building a string past {MAX_REPEAT_LENGTH} characters is not "
+                "allowed"
+            )
+    return value.replace(old, new, count)
+
+
+def _safe_mod(left: Any, right: Any) -> Any:
+    # printf-style formatting can allocate arbitrarily wide fields.
+    if isinstance(left, str):
+        raise ConditionError("String formatting is not allowed in conditions")
+    return left % right
@@ -1,15 +1,25 @@
 import asyncio
 import os
+import time
+from copy import deepcopy
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Literal
 
 import psutil
 from playwright.async_api import Download
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
 
+from optexity.schema.screenshot import Screenshot
 from optexity.schema.token_usage import TokenUsage
 
+# When a screenshot is taken for the browser state of a node:
+# per_step: before every node and again right before each interaction
+# per_interaction: only right before interactions
+# on_error: only when the node fails
+# none: never (LLM calls still take the screenshots they need)
+CapturePolicy = Literal["none", "on_error", "per_step", "per_interaction"]
+
 
 class NetworkRequest(BaseModel):
     url: str
@@ -37,6 +47,7 @@ class AutomationState(BaseModel):
     step_index: int = Field(default_factory=lambda: -1)
     try_index: int = Field(default_factory=lambda: -1)
     start_2fa_time: datetime | None = Field(default=None)
+    capture_policy: CapturePolicy = Field(default="per_step")
 
     @model_validator(mode="after")
     def validate_start_2fa_time(self):
@@ -49,12 +60,50 @@ class AutomationState(BaseModel):
 
 class SystemInfo(BaseModel):
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    total_system_memory: float = Field(
-        default_factory=lambda: SystemInfo.get_effective_memory_mb()[1]
-    )  # convert to MB
-    total_system_memory_used: float = Field(
-        default_factory=lambda: SystemInfo.get_effective_memory_mb()[0]
-    )  # convert to MB
+    total_system_memory: float = Field(...)  # convert to MB
+    total_system_memory_used: float = Field(...)  # convert to MB
+    # Set on samples downsampled from several readings; total_system_memory_used
+    # is then their average.
+    sample_count: int = Field(default=1)
+    total_system_memory_used_min: float | None = Field(default=None)
+    total_system_memory_used_max: float | None = Field(default=None)
+
+    @model_validator(mode="before")
+    @classmethod
+    def read_memory(cls, data: Any):
+        # One cgroup read fills both memory fields.
+        if isinstance(data, dict) and (
+            "total_system_memory" not in data or "total_system_memory_used" not in data
+        ):
+            used, total = SystemInfo.get_effective_memory_mb()
+            data = {
+                "total_system_memory": total,
+                "total_system_memory_used": used,
+                **data,
+            }
+        return data
+
+    def merge(self, other: "SystemInfo") -> "SystemInfo":
+        """One sample covering this one and the later `other`."""
+        count = self.sample_count + other.sample_count
+        return SystemInfo(
+            timestamp=self.timestamp,
+            total_system_memory=other.total_system_memory,
+            total_system_memory_used=(
+                self.total_system_memory_used * self.sample_count
+                + other.total_system_memory_used * other.sample_count
+            )
+            / count,
+            sample_count=count,
+            total_system_memory_used_min=min(
+                self.total_system_memory_used_min or self.total_system_memory_used,
+                other.total_system_memory_used_min or other.total_system_memory_used,
+            ),
+            total_system_memory_used_max=max(
+                self.total_system_memory_used_max or self.total_system_memory_used,
+                other.total_system_memory_used_max or other.total_system_memory_used,
+            ),
+        )
 
     @staticmethod
     def get_effective_memory_mb():
@@ -106,17 +155,19 @@ class SystemInfo(BaseModel):
 class BrowserState(BaseModel):
     url: str = Field(...)
     title: str | None = Field(default=None)
-    screenshot: str | None = Field(default=None)
+    screenshot: Screenshot | None = Field(default=None)
     html: str | None = Field(default=None)
     axtree: str | None = Field(default=None)
     final_prompt: str | None = Field(default=None)
     llm_response: str | dict | None = Field(default=None)
-    system_info: SystemInfo = Field(default_factory=SystemInfo)
+    wait_times: dict[str, float] = Field(default_factory=dict)
+    # The memory's latest sample (Memory.update_system_info), not a new reading.
+    system_info: SystemInfo | None = Field(default=None)
 
 
 class ScreenshotData(BaseModel):
     filename: str = Field(...)
-    base64: str = Field(...)
+    image: Screenshot = Field(...)
 
 
 class OutputData(BaseModel):
@@ -140,6 +191,34 @@ class Variables(BaseModel):
     generated_variables: dict = Field(default_factory=dict)
 
 
+class CommandStats(BaseModel):
+    """Outcome and latency of command based actions, per locator command."""
+
+    runs: int = 0
+    successes: int = 0
+    tries: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    last_error: str | None = None
+
+    def record(self, success: bool, tries: int, seconds: float, error: str | None):
+        self.runs += 1
+        self.successes += int(success)
+        self.tries += tries
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        if error is not None:
+            self.last_error = error
+
+    def merge(self, other: "CommandStats"):
+        self.runs += other.runs
+        self.successes += other.successes
+        self.tries += other.tries
+        self.total_seconds += other.total_seconds
+        self.max_seconds = max(self.max_seconds, other.max_seconds)
+        self.last_error = other.last_error or self.last_error
+
+
 class Memory(BaseModel):
     variables: Variables = Field(default_factory=Variables)
     automation_state: AutomationState = Field(default_factory=AutomationState)
@@ -151,14 +230,92 @@ class Memory(BaseModel):
     )
     urls_to_downloads: list[tuple[str, str]] = Field(default_factory=list)
     downloads: list[Path] = Field(default_factory=list)
-    final_screenshot: str | None = Field(default=None)
+    final_screenshot: Screenshot | None = Field(default=None)
     system_info_tracking: list[SystemInfo] = Field(default_factory=list)
+    command_stats: dict[str, CommandStats] = Field(default_factory=dict)
     unique_child_arn: str
+    # Bounds for long runs: older browser states are dropped (their files are
+    # already in the step directories) and older system info is downsampled.
+    max_browser_states: int = Field(default=20, ge=1)
+    max_system_info_samples: int = Field(default=200, ge=2)
+    system_info_min_interval: float = Field(default=1.0)
+    # Step directories go under this subdirectory of the task's logs, e.g. for
+    # the lanes of a parallel for loop.
+    logs_subdirectory: str | None = Field(default=None)
+    _last_system_info_time: float | None = PrivateAttr(default=None)
+    _latest_system_info: SystemInfo | None = PrivateAttr(default=None)
 
     model_config = {
         "arbitrary_types_allowed": True,
         "exclude": {"download_lock"},
     }
 
-    def update_system_info(self):
-        self.system_info_tracking.append(SystemInfo())
+    def fork(self, logs_subdirectory: str) -> "Memory":
+        """Fresh memory for a parallel lane, starting from this memory's
+        generated variables and logging its steps under `logs_subdirectory`."""
+        if self.logs_subdirectory:
+            logs_subdirectory = f"{self.logs_subdirectory}/{logs_subdirectory}"
+        return Memory(
+            variables=Variables(
+                generated_variables=deepcopy(self.variables.generated_variables)
+            ),
+            unique_child_arn=self.unique_child_arn,
+            max_browser_states=self.max_browser_states,
+            max_system_info_samples=self.max_system_info_samples,
+            system_info_min_interval=self.system_info_min_interval,
+            logs_subdirectory=logs_subdirectory,
+        )
+
+    def release_screenshots(self, keep_last: int):
+        """Drop the bytes of screenshots older than the last `keep_last` browser
+        states from memory, for those already written to disk."""
+        recent = {
+            id(state.screenshot)
+            for state in self.browser_states[-keep_last:]
+            if keep_last > 0 and state.screenshot is not None
+        }
+        for state in self.browser_states[
+            : max(len(self.browser_states) - keep_last, 0)
+        ]:
+            if state.screenshot is not None and id(state.screenshot) not in recent:
+                state.screenshot.release()
+
+    def add_browser_state(self, browser_state: BrowserState):
+        self.browser_states.append(browser_state)
+        if len(self.browser_states) > self.max_browser_states:
+            del self.browser_states[: -self.max_browser_states]
+
+    def update_system_info(self) -> SystemInfo:
+        """Record a system info sample and return the latest one.
+
+        Rate limited, since each sample reads cgroup files: within
+        system_info_min_interval of the last sample, that sample is returned.
+        """
+        now = time.monotonic()
+        if (
+            self._latest_system_info is not None
+            and now - self._last_system_info_time < self.system_info_min_interval
+        ):
+            return self._latest_system_info
+        self._last_system_info_time = now
+        self._latest_system_info = SystemInfo()
+        self.system_info_tracking.append(self._latest_system_info)
+        if len(self.system_info_tracking) > self.max_system_info_samples:
+            self._downsample_system_info()
+        return self._latest_system_info
+
+    def _downsample_system_info(self):
+        # Merge neighbours into windows of up to `window` samples, keeping
+        # min/max/average, doubling the window until the series is halved.
+        samples = self.system_info_tracking
+        window = max(sample.sample_count for sample in samples)
+        while len(samples) > self.max_system_info_samples // 2:
+            merged: list[SystemInfo] = []
+            for sample in samples:
+                if merged and merged[-1].sample_count + sample.sample_count <= window:
+                    merged[-1] = merged[-1].merge(sample)
+                else:
+                    merged.append(sample)
+            samples = merged
+            window *= 2
+        self.system_info_tracking = samples
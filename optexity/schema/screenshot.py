@@ -0,0 +1,123 @@
+import base64
+import io
+from pathlib import Path
+from typing import Any, Literal
+
+from pydantic_core import core_schema
+
+ScreenshotFormat = Literal["png", "jpeg", "webp"]
+
+
+def detect_format(data: bytes) -> ScreenshotFormat:
+    if data.startswith(b"\xff\xd8"):
+        return "jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return "png"
+
+
+def is_base64_image(data: str) -> bool:
+    """Whether `data` is a base64 encoded image Pillow can open."""
+    try:
+        from PIL import Image
+
+        Image.open(io.BytesIO(base64.b64decode(data, validate=True)))
+        return True
+    except Exception:
+        return False
+
+
+class Screenshot:
+    """Encoded image bytes of a screenshot.
+
+    Screenshots are kept as raw bytes rather than base64 text; `base64()`
+    encodes on demand where an API needs it. Once the bytes have been written
+    to a file (`attach_file`), `release()` drops them from memory and `data`
+    reads them back from that file when needed.
+
+    In pydantic models a Screenshot field also accepts raw bytes or a base64
+    string, and serializes to base64 in JSON mode.
+    """
+
+    __slots__ = ("format", "_data", "_path")
+
+    def __init__(self, data: bytes, format: ScreenshotFormat | None = None):
+        self.format: ScreenshotFormat = format or detect_format(data)
+        self._data: bytes | None = data
+        self._path: Path | None = None
+
+    @classmethod
+    def from_base64(cls, encoded: str) -> "Screenshot":
+        return cls(base64.b64decode(encoded))
+
+    @property
+    def data(self) -> bytes:
+        if self._data is not None:
+            return self._data
+        return self._path.read_bytes()
+
+    @property
+    def mime_type(self) -> str:
+        return f"image/{self.format}"
+
+    @property
+    def extension(self) -> str:
+        return "jpg" if self.format == "jpeg" else self.format
+
+    @property
+    def in_memory(self) -> bool:
+        return self._data is not None
+
+    def base64(self) -> str:
+        return base64.b64encode(self.data).decode("utf-8")
+
+    def attach_file(self, path: Path):
+        """Record a file that holds exactly these bytes."""
+        if self._path is None:
+            self._path = path
+
+    def release(self) -> bool:
+        """Drop the in-memory bytes if they can be read back from disk."""
+        if self._data is None:
+            return True
+        if self._path is None or not self._path.exists():
+            return False
+        self._data = None
+        return True
+
+    def convert(self, format: ScreenshotFormat, quality: int) -> "Screenshot":
+        """Re-encode to another format (needs Pillow for anything but a no-op)."""
+        if format == self.format:
+            return self
+
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(self.data))
+        if format == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, format=format.upper(), quality=quality)
+        return Screenshot(output.getvalue(), format)
+
+    def __repr__(self) -> str:
+        location = "memory" if self._data is not None else str(self._path)
+        return f"Screenshot(format={self.format!r}, in {location})"
+
+    @classmethod
+    def _validate(cls, value: Any) -> "Screenshot":
+        if isinstance(value, Screenshot):
+            return value
+        if isinstance(value, bytes):
+            return cls(value)
+        if isinstance(value, str):
+            return cls.from_base64(value)
+        raise ValueError("screenshot must be bytes or a base64 encoded string")
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any):
+        return core_schema.no_info_plain_validator_function(
+            cls._validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                lambda screenshot: screenshot.base64(), when_used="json"
+            ),
+        )
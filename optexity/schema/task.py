@@ -1,17 +1,15 @@
-import base64
 import json
 import string
 import uuid
 from datetime import datetime
-from io import BytesIO
 from pathlib import Path
 from typing import Literal, Optional
 
-from PIL import Image
 from pydantic import BaseModel, Field, computed_field, model_validator
 
 from optexity.schema.automation import Automation, SecureParameter
 from optexity.schema.memory import ForLoopStatus, SystemInfo
+from optexity.schema.screenshot import is_base64_image
 from optexity.schema.token_usage import TokenUsage
 
 BASE62 = string.digits + string.ascii_lowercase + string.ascii_uppercase
@@ -99,6 +97,12 @@ class Task(BaseModel):
     def log_file_path(self) -> Path:
         return self.logs_directory / "optexity.log"
 
+    def download_staging_directory(self, slot: int) -> Path:
+        # Beside the task directory, so moving a download into
+        # downloads_directory is a rename, and outside it, so staged partial
+        # files never end up in the uploaded trajectory.
+        return self.save_directory / ".download_staging" / f"{self.task_id}_{slot}"
+
     @model_validator(mode="after")
     def validate_unique_parameters(self):
         ## TODO: we do not do dedup using secure parameters yet, need to add support for that
@@ -201,6 +205,7 @@ class TaskOutputDataRequest(BaseModel):
     for_loop_status: list[list[ForLoopStatus]] | None = None
     system_info: list[SystemInfo] | None = None
     unique_child_arn: str | None = None
+    trace_summary: dict | None = None
 
     @model_validator(mode="after")
     def must_have_valid_final_screenshot(self):
@@ -211,11 +216,4 @@ class TaskOutputDataRequest(BaseModel):
         return self
 
     def is_valid_base64_image(self, data: str) -> bool:
-        try:
-            # Decode the base64 string
-            decoded = base64.b64decode(data, validate=True)
-            # Try to open it as an image
-            Image.open(BytesIO(decoded))
-            return True
-        except Exception as e:
-            return False
+        return is_base64_image(data)
@@ -0,0 +1,203 @@
+import re
+from typing import ClassVar, Iterator, Mapping
+
+from pydantic import BaseModel
+
+# {name[0]}, {name[index]} (the current index of the loop over name) and
+# {index_of(name)}.
+PLACEHOLDER_PATTERN = re.compile(
+    r"\{(?:index_of\((?P<loop>[^{}\[\]()]+)\)"
+    r"|(?P<name>[^{}\[\]]+)\[(?P<index>\d+|index)\])\}"
+)
+
+Reference = tuple[str, int]
+
+
+class Template:
+    """A string parsed once into literal text and placeholder slots.
+
+    Rendering fills every slot in a single pass. Slots without a value are
+    rendered back as placeholders, with a loop index already filled in.
+    """
+
+    __slots__ = ("parts",)
+
+    def __init__(self, text: str):
+        self.parts: list[str | tuple[str, str, int | None]] = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            if match.start() > position:
+                self.parts.append(text[position : match.start()])
+            if match["loop"] is not None:
+                self.parts.append(("index_of", match["loop"], None))
+            elif match["index"] == "index":
+                self.parts.append(("loop_value", match["name"], None))
+            else:
+                self.parts.append(("value", match["name"], int(match["index"])))
+            position = match.end()
+        if position < len(text):
+            self.parts.append(text[position:])
+
+    @property
+    def has_slots(self) -> bool:
+        return any(not isinstance(part, str) for part in self.parts)
+
+    def slots(self) -> Iterator[tuple[str, str, int | None]]:
+        """(kind, name, index) of every placeholder; kind is "value",
+        "loop_value" or "index_of"."""
+        for part in self.parts:
+            if not isinstance(part, str):
+                yield part
+
+    def references(self, loop_indices: Mapping[str, int]) -> Iterator[Reference]:
+        for part in self.parts:
+            if isinstance(part, str):
+                continue
+            kind, name, index = part
+            if kind == "value":
+                yield name, index
+            elif kind == "loop_value" and name in loop_indices:
+                yield name, loop_indices[name]
+
+    def render(
+        self, values: Mapping[Reference, str], loop_indices: Mapping[str, int]
+    ) -> str:
+        rendered = []
+        for part in self.parts:
+            if isinstance(part, str):
+                rendered.append(part)
+                continue
+
+            kind, name, index = part
+            if kind == "index_of":
+                if name in loop_indices:
+                    rendered.append(str(loop_indices[name]))
+                else:
+                    rendered.append(f"{{index_of({name})}}")
+                continue
+            if kind == "loop_value":
+                if name not in loop_indices:
+                    rendered.append(f"{{{name}[index]}}")
+                    continue
+                index = loop_indices[name]
+
+            value = values.get((name, index))
+            rendered.append(value if value is not None else f"{{{name}[{index}]}}")
+        return "".join(rendered)
+
+
+class TemplatedModel(BaseModel):
+    # Fields that may hold placeholders, mapped to whether double quotes around
+    # the value are stripped after substitution. Nested templated models are
+    # listed too.
+    template_fields: ClassVar[dict[str, bool]] = {}
+
+    def replace(self, pattern: str, replacement: str):
+        for name, strip in self.template_fields.items():
+            value = getattr(self, name)
+            if not value:
+                continue
+            if isinstance(value, TemplatedModel):
+                value.replace(pattern, replacement)
+            elif isinstance(value, str):
+                setattr(self, name, _replace(value, pattern, replacement, strip))
+            elif isinstance(value, list):
+                setattr(
+                    self,
+                    name,
+                    [_replace(item, pattern, replacement, strip) for item in value],
+                )
+        return self
+
+
+def _replace(value: str, pattern: str, replacement: str, strip: bool) -> str:
+    value = value.replace(pattern, replacement)
+    return value.strip('"') if strip else value
+
+
+class ModelTemplate:
+    """Compiled substitution plan for the templated fields of a model tree.
+
+    Built once per model. Rendering copies only the models along the paths
+    that change and shares everything else with the original, which is left
+    untouched.
+    """
+
+    __slots__ = ("fields",)
+
+    def __init__(self, model: TemplatedModel):
+        self.fields: list[tuple[str, "ModelTemplate | Template | list", bool]] = []
+        for name, strip in model.template_fields.items():
+            value = getattr(model, name)
+            if not value:
+                continue
+            if isinstance(value, TemplatedModel):
+                nested = ModelTemplate(value)
+                if nested.fields:
+                    self.fields.append((name, nested, strip))
+            elif isinstance(value, str):
+                template = Template(value)
+                if template.has_slots or strip:
+                    self.fields.append((name, template, strip))
+            elif isinstance(value, list):
+                templates = [Template(item) for item in value]
+                if strip or any(template.has_slots for template in templates):
+                    self.fields.append((name, templates, strip))
+
+    def slots(self) -> Iterator[tuple[str, str, int | None]]:
+        for _, plan, _ in self.fields:
+            for template in plan if isinstance(plan, list) else [plan]:
+                yield from template.slots()
+
+    def references(self, loop_indices: Mapping[str, int]) -> Iterator[Reference]:
+        for _, plan, _ in self.fields:
+            if isinstance(plan, list):
+                for template in plan:
+                    yield from template.references(loop_indices)
+            else:
+                yield from plan.references(loop_indices)
+
+    def render(
+        self,
+        model: TemplatedModel,
+        values: Mapping[Reference, str],
+        loop_indices: Mapping[str, int],
+        strip: bool,
+    ) -> TemplatedModel:
+        """Render `model`, the model this plan was built from.
+
+        `strip` turns quote stripping on for the fields that ask for it.
+        """
+        updates = {}
+        for name, plan, strip_field in self.fields:
+            current = getattr(model, name)
+            if isinstance(plan, ModelTemplate):
+                rendered = plan.render(current, values, loop_indices, strip)
+                if rendered is not current:
+                    updates[name] = rendered
+                continue
+
+            strip_field = strip and strip_field
+            if isinstance(plan, list):
+                rendered = [
+                    _render(template, values, loop_indices, strip_field)
+                    for template in plan
+                ]
+            else:
+                rendered = _render(plan, values, loop_indices, strip_field)
+            if rendered != current:
+                updates[name] = rendered
+
+        if not updates:
+            return model
+        return model.model_copy(update=updates)
+
+
+def _render(
+    template: Template,
+    values: Mapping[Reference, str],
+    loop_indices: Mapping[str, int],
+    strip: bool,
+) -> str:
+    rendered = template.render(values, loop_indices)
+    return rendered.strip('"') if strip else rendered
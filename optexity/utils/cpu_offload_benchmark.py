@@ -0,0 +1,128 @@
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from optexity.inference.core.trajectory import tar_gz_member
+from optexity.inference.infra.cpu_offload import (
+    convert_image,
+    encode_json,
+    run_cpu,
+    shutdown_cpu_executor,
+    start_cpu_executor,
+)
+from optexity.inference.infra.tracing import LoopLagMonitor
+
+LAG_TICK_S = 0.001
+MODES = ["inline", "thread", "process"]
+
+# (name, function, argument tuples); one call per argument tuple.
+Workload = tuple[str, Callable, list[tuple]]
+
+
+def _compressible(size: int) -> bytes:
+    words = [b"price", b"status", b"success", b"url", b"title", b"value", b"12.50"]
+    chunks = []
+    while sum(map(len, chunks)) < size:
+        chunks.append(b'"%s": "%s", ' % (random.choice(words), random.choice(words)))
+    return b"".join(chunks)[:size]
+
+
+def _screenshot_png() -> bytes | None:
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    import io
+
+    image = Image.frombytes("RGB", (1280, 800), os.urandom(1280 * 800 * 3 // 8) * 8)
+    output = io.BytesIO()
+    image.save(output, format="PNG", compress_level=1)
+    return output.getvalue()
+
+
+def build_workloads(directory: Path, files: int) -> list[Workload]:
+    member_args = []
+    for i in range(files):
+        # A step directory: a screenshot-sized incompressible file and state.
+        for name, data in [
+            (f"step_{i}/screenshot.png", os.urandom(400_000)),
+            (f"step_{i}/state.json", _compressible(300_000)),
+        ]:
+            path = directory / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            stat = path.stat()
+            member_args.append((str(path), name, [stat.st_size, stat.st_mtime_ns], 6))
+
+    body = {
+        "task_id": "benchmark",
+        "output_data": [{"json_data": {"rows": _compressible(200_000).decode()}}],
+    }
+    workloads: list[Workload] = [
+        ("trajectory members", tar_gz_member, member_args),
+        (
+            "output body",
+            encode_json,
+            [(body, {"final_screenshot": os.urandom(3_000_000)})] * 4,
+        ),
+    ]
+    png = _screenshot_png()
+    if png is not None:
+        workloads.append(("webp conversion", convert_image, [(png, "webp", 80)] * 4))
+    return workloads
+
+
+async def _run_workload(mode: str, func: Callable, calls: list[tuple]) -> Any:
+    if mode == "inline":
+        for args in calls:
+            func(*args)
+            await asyncio.sleep(0)
+    elif mode == "thread":
+        await asyncio.gather(*(asyncio.to_thread(func, *args) for args in calls))
+    else:
+        await asyncio.gather(*(run_cpu(func, *args) for args in calls))
+
+
+async def benchmark(
+    workloads: list[Workload],
+) -> list[tuple[str, str, float, float, float]]:
+    rows = []
+    for name, func, calls in workloads:
+        for mode in MODES:
+            with LoopLagMonitor(LAG_TICK_S) as monitor:
+                start = time.perf_counter()
+                await _run_workload(mode, func, calls)
+                wall = time.perf_counter() - start
+            rows.append((name, mode, wall, *monitor.summary()))
+    return rows
+
+
+def run_cpu_offload_benchmark(workers: int = 2, files: int = 20) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        workloads = build_workloads(Path(directory), files)
+        start_cpu_executor(max(1, workers))
+        try:
+            rows = asyncio.run(benchmark(workloads))
+        finally:
+            shutdown_cpu_executor()
+
+    print(f"Event loop lag ({workers} CPU offload workers, {os.cpu_count()} CPUs)")
+    print(
+        f"  {'workload':<20} {'mode':<8} {'wall':>10} {'max lag':>10} {'p99 lag':>10}"
+    )
+    for name, mode, wall, max_lag, p99_lag in rows:
+        print(
+            f"  {name:<20} {mode:<8} {wall * 1000:8.1f}ms "
+            f"{max_lag * 1000:8.1f}ms {p99_lag * 1000:8.1f}ms"
+        )
+    inline = [row[3] for row in rows if row[1] == "inline"]
+    offloaded = [row[3] for row in rows if row[1] == "process"]
+    print(
+        f"Mean max lag: {statistics.mean(inline) * 1000:.1f} ms inline, "
+        f"{statistics.mean(offloaded) * 1000:.1f} ms in the CPU offload pool"
+    )
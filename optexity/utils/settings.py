@@ -2,7 +2,7 @@ import logging
 import os
 from typing import Literal
 
-from pydantic import model_validator
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings
 
 logger = logging.getLogger(__name__)
@@ -31,6 +31,50 @@ class Settings(BaseSettings):
     API_KEY: str
 
     CHILD_PORT_OFFSET: int = 9000
+    BROWSER_DEBUG_PORT_OFFSET: int = 9222
+    MAX_CONCURRENT_TASKS: int = 1
+    TASK_ADMISSION_MAX_MEMORY_FRACTION: float = 0.6
+    BROWSER_POOL_SIZE: int = 0
+    BROWSER_POOL_CHANNEL: Literal["chromium", "chrome"] = "chromium"
+    USE_PERSISTENT_WORKER: bool = True
+    PAGE_SETTLE_QUIET_TIME: float = 0.5
+    PAGE_SETTLE_MAX_REQUEST_AGE: float = 5.0
+    PAGE_SETTLE_POLL_INTERVAL: float = 0.1
+    NETWORK_CAPTURE_MAX_BYTES: int = 64 * 1024 * 1024
+    NETWORK_CAPTURE_MAX_BODY_BYTES: int = 16 * 1024 * 1024
+    NETWORK_CAPTURE_MAX_CALLS: int = Field(default=5000, ge=1)
+    NETWORK_CAPTURE_COOKIE_TTL: float = 1.0
+    NETWORK_DOWNLOAD_CONCURRENCY: int = 8
+    NETWORK_DOWNLOAD_TIMEOUT: float = 60.0
+    CONTROL_PLANE_TIMEOUT: float = 30.0
+    CONTROL_PLANE_HTTP2: bool = True
+    CONTROL_PLANE_MAX_CONNECTIONS: int = 10
+    CONTROL_PLANE_KEEPALIVE_EXPIRY: float = 60.0
+    CONTROL_PLANE_MAX_RETRIES: int = 3
+    CONTROL_PLANE_INITIAL_BACKOFF: float = 0.5
+    # "delta" uploads only files changed since the last trajectory upload, with
+    # a delta_index form field; the server must merge the deltas of a task.
+    TRAJECTORY_UPLOAD_MODE: Literal["full", "delta"] = "full"
+    # gzip levels (1-9) of the trajectory and downloads archives.
+    TRAJECTORY_COMPRESSLEVEL: int = 6
+    DOWNLOADS_COMPRESSLEVEL: int = 6
+    # Processes per task that compression, encoding and image conversion run
+    # in; 0 runs that work on threads.
+    CPU_OFFLOAD_WORKERS: int = 2
+    # Span tree and event loop lag of each task, stored as trace.json in the
+    # step directories and summarized with the output data.
+    TRACE_ENABLED: bool = True
+    TRACE_LOOP_LAG_INTERVAL: float = 0.05
+    # OTLP/HTTP traces endpoint to export to, e.g. http://localhost:4318/v1/traces.
+    TRACE_OTLP_ENDPOINT: str | None = None
+    # Format of screenshots taken for step states, outputs and the final page;
+    # jpeg and webp use SCREENSHOT_QUALITY (webp needs Pillow).
+    SCREENSHOT_FORMAT: Literal["png", "jpeg", "webp"] = "png"
+    SCREENSHOT_QUALITY: int = 80
+    SCREENSHOTS_IN_MEMORY: int = 5
+    MEMORY_MAX_BROWSER_STATES: int = Field(default=20, ge=1)
+    MEMORY_MAX_SYSTEM_INFO_SAMPLES: int = Field(default=200, ge=2)
+    SYSTEM_INFO_MIN_INTERVAL: float = 1.0
     DEPLOYMENT: Literal["dev", "prod"]
     LOCAL_CALLBACK_URL: str | None = None
 
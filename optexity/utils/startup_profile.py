@@ -0,0 +1,114 @@
+import importlib
+import re
+import subprocess
+import sys
+import time
+from typing import Callable
+
+# Imported in this order, so each stage only pays for what earlier stages did not.
+IMPORT_STAGES = [
+    ("settings", "optexity.utils.settings"),
+    ("schema", "optexity.schema.task"),
+    ("web server", "uvicorn"),
+    ("control plane", "optexity.inference.child_process"),
+    ("inference stack", "optexity.inference.core.run_automation"),
+]
+
+SERVER_COLD_START_TARGET_S = 1.0
+
+
+def _timed(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def profile_imports() -> list[tuple[str, float]]:
+    return [
+        (f"import {label} ({module})", _timed(lambda: importlib.import_module(module)))
+        for label, module in IMPORT_STAGES
+    ]
+
+
+def profile_init(include_llm: bool) -> list[tuple[str, float]]:
+    from optexity.inference.child_process import get_app_with_endpoints
+
+    timings = [
+        (
+            "init app (get_app_with_endpoints)",
+            _timed(lambda: get_app_with_endpoints(is_aws=False, child_id=0)),
+        )
+    ]
+    if not include_llm:
+        return timings
+
+    from optexity.inference.core.interaction.handle_select_utils import (
+        get_select_value_prediction_agent,
+    )
+    from optexity.inference.core.interaction.utils import get_index_prediction_agent
+    from optexity.inference.core.run_interaction import get_error_handler_agent
+    from optexity.inference.core.run_two_fa import get_two_fa_extraction_agent
+    from optexity.inference.models import GeminiModels, get_llm_model
+
+    timings.append(
+        (
+            "init LLM model",
+            _timed(lambda: get_llm_model(GeminiModels.GEMINI_2_5_FLASH, True)),
+        )
+    )
+    for get_agent in [
+        get_error_handler_agent,
+        get_index_prediction_agent,
+        get_select_value_prediction_agent,
+        get_two_fa_extraction_agent,
+    ]:
+        timings.append((f"init {get_agent.__name__[4:]}", _timed(get_agent)))
+    return timings
+
+
+def slowest_imports(module: str, top: int) -> list[tuple[str, float]]:
+    """Run `python -X importtime` in a fresh interpreter and return the slowest
+    modules by self time."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+)\s+\|\s+\d+\s+\|\s+(.+)$", line)
+        if match:
+            rows.append((match.group(2).strip(), int(match.group(1)) / 1e6))
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return rows[:top]
+
+
+def _print_section(title: str, timings: list[tuple[str, float]]):
+    print(title)
+    for name, seconds in timings:
+        print(f"  {seconds * 1000:9.1f} ms  {name}")
+
+
+def run_startup_profile(include_llm: bool = False, top: int = 15) -> None:
+    import_timings = profile_imports()
+    init_timings = profile_init(include_llm)
+
+    _print_section("Import time", import_timings)
+    _print_section("Init time", init_timings)
+
+    cold_start = sum(
+        seconds
+        for name, seconds in import_timings + init_timings[:1]
+        if "inference stack" not in name
+    )
+    status = "ok" if cold_start < SERVER_COLD_START_TARGET_S else "over target"
+    print(
+        f"Server cold start: {cold_start * 1000:.1f} ms "
+        f"(target {SERVER_COLD_START_TARGET_S * 1000:.0f} ms, {status})"
+    )
+
+    if top > 0:
+        _print_section(
+            f"Slowest modules imported by the server (self time, top {top})",
+            slowest_imports("optexity.inference.child_process", top),
+        )
@@ -8,9 +8,10 @@ from urllib.parse import urlparse
 import aiofiles
 import pyotp
 from async_lru import alru_cache
-from onepassword import Client as OnePasswordClient
 from pydantic import create_model
 
+from optexity.schema.screenshot import Screenshot
+
 logger = logging.getLogger(__name__)
 
 _onepassword_client = None
@@ -19,6 +20,8 @@ _onepassword_client = None
 async def get_onepassword_client():
     global _onepassword_client
     if _onepassword_client is None:
+        from onepassword import Client as OnePasswordClient
+
         token = os.getenv("OP_SERVICE_ACCOUNT_TOKEN")
         if token is None:
             raise ValueError("OP_SERVICE_ACCOUNT_TOKEN is not set")
@@ -49,11 +52,14 @@ def build_model(schema: dict, model_name="AutoModel"):
     return create_model(model_name, **fields)
 
 
-async def save_screenshot(screenshot: str, path: Path | str):
-    """Asynchronously save a base64-encoded screenshot to disk."""
+async def save_screenshot(screenshot: Screenshot | str, path: Path | str):
+    """Asynchronously save a screenshot (or a base64-encoded one) to disk."""
+    data = (
+        base64.b64decode(screenshot) if isinstance(screenshot, str) else screenshot.data
+    )
     # Ensure we write bytes and use aiofiles for non-blocking I/O
     async with aiofiles.open(path, "wb") as f:
-        await f.write(base64.b64decode(screenshot))
+        await f.write(data)
 
 
 async def save_and_clear_downloaded_files(content: bytes | str, filename: Path):
@@ -0,0 +1,5 @@
+import os
+
+# Settings are read when optexity is imported and need these to be set.
+os.environ.setdefault("API_KEY", "test")
+os.environ.setdefault("DEPLOYMENT", "dev")
@@ -0,0 +1,163 @@
+from optexity.schema.automation import Automation
+from optexity.schema.automation_check import check_automation
+
+
+def _automation(nodes: list[dict], **parameters) -> Automation:
+    return Automation.model_validate(
+        {
+            "url": "https://example.com",
+            "parameters": {
+                "input_parameters": parameters.get("input_parameters", {}),
+                "generated_parameters": parameters.get("generated_parameters", {}),
+            },
+            "nodes": nodes,
+        }
+    )
+
+
+def _hover(prompt: str) -> dict:
+    return {
+        "type": "action_node",
+        "interaction_action": {"hover": {"prompt_instructions": prompt}},
+    }
+
+
+def _llm_extraction(*names: str) -> dict:
+    return {
+        "type": "action_node",
+        "extraction_action": {
+            "llm": {
+                "extraction_format": {name: "list[str]" for name in names},
+                "extraction_instructions": "Extract the rows",
+                "output_variable_names": list(names),
+            }
+        },
+    }
+
+
+def _llm_assertion(*names: str) -> dict:
+    return {
+        "type": "action_node",
+        "assertion_action": {
+            "llm": {
+                "extraction_format": {
+                    "assertion_result": "bool",
+                    "assertion_reason": "str",
+                    **{name: "list[str]" for name in names},
+                },
+                "extraction_instructions": "The table is shown",
+                "output_variable_names": list(names),
+            }
+        },
+    }
+
+
+def _messages(automation: Automation, **kwargs) -> list[tuple[str, str, str]]:
+    return [
+        (issue.severity, issue.location, issue.message)
+        for issue in check_automation(automation, **kwargs)
+    ]
+
+
+def test_clean_automation_has_no_issues():
+    automation = _automation(
+        [
+            _hover("Hover {name[0]}"),
+            _llm_extraction("rows"),
+            {
+                "type": "for_loop_node",
+                "variable_name": "rows",
+                "nodes": [_hover("Row {index_of(rows)}: {rows[index]}")],
+            },
+        ],
+        input_parameters={"name": ["Ann"]},
+    )
+
+    assert _messages(automation) == []
+
+
+def test_variables_produced_by_llm_assertions_are_known():
+    automation = _automation(
+        [
+            _llm_assertion("rows"),
+            {
+                "type": "if_else_node",
+                "condition": "len(rows) > 0",
+                "if_nodes": [
+                    {
+                        "type": "for_loop_node",
+                        "variable_name": "rows",
+                        "nodes": [_hover("{rows[index]}")],
+                    }
+                ],
+            },
+        ]
+    )
+
+    assert _messages(automation) == []
+
+
+def test_unknown_and_late_variables_are_errors():
+    automation = _automation(
+        [
+            {"type": "for_loop_node", "variable_name": "rows", "nodes": []},
+            {"type": "for_loop_node", "variable_name": "missing", "nodes": []},
+            {
+                "type": "if_else_node",
+                "condition": "ghost == 1",
+                "if_nodes": [_hover("x")],
+            },
+            _llm_extraction("rows"),
+        ]
+    )
+
+    assert _messages(automation) == [
+        ("error", "nodes[0]", "For loop variable rows is only produced after the loop"),
+        (
+            "error",
+            "nodes[1]",
+            "For loop variable missing is not an input parameter and no node "
+            "produces it",
+        ),
+        ("error", "nodes[2]", "Condition uses unknown variable ghost"),
+    ]
+
+
+def test_placeholder_issues_are_warnings():
+    automation = _automation(
+        [
+            _hover("{name[1]} {rows[0]} {ghost[0]} {rows[index]}"),
+            _llm_extraction("rows"),
+        ],
+        input_parameters={"name": ["Ann"], "unused": ["x"]},
+    )
+
+    assert _messages(
+        automation, input_parameters={"name": ["Ann"], "unused": ["x"]}
+    ) == [
+        (
+            "warning",
+            "nodes[0]",
+            "{name[1]} is out of range, input parameter name has 1 values",
+        ),
+        ("warning", "nodes[0]", "{rows[0]} is used before any node produces rows"),
+        ("warning", "nodes[0]", "{ghost[0]} references unknown variable ghost"),
+        ("warning", "nodes[0]", "{rows[index]} is used outside a for loop over rows"),
+        ("warning", "parameters", "Input parameter unused is never used"),
+    ]
+
+
+def test_variable_produced_in_either_branch_is_known_after_if_else():
+    automation = _automation(
+        [
+            {
+                "type": "if_else_node",
+                "condition": "True",
+                "if_nodes": [_hover("x")],
+                "else_nodes": [_llm_extraction("rows")],
+            },
+            {"type": "for_loop_node", "variable_name": "rows", "nodes": []},
+        ]
+    )
+
+    assert _messages(automation) == []
@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+from optexity.inference.infra.browser import Browser
+from optexity.schema.memory import Memory
+
+
+class FakePage:
+    def __init__(self):
+        self.screenshots = 0
+
+    async def screenshot(self, **kwargs) -> bytes:
+        self.screenshots += 1
+        return b"\x89PNG" + bytes([self.screenshots])
+
+
+def _browser(page: FakePage) -> Browser:
+    browser = Browser(memory=Memory(unique_child_arn="test"))
+
+    async def get_current_page():
+        return page
+
+    async def get_page_fingerprint():
+        return "https://example.com|doc|0|0|0|1280|720"
+
+    browser.get_current_page = get_current_page
+    browser.get_page_fingerprint = get_page_fingerprint
+    return browser
+
+
+def test_screenshot_dedup_reuses_unchanged_page():
+    async def run():
+        page = FakePage()
+        browser = _browser(page)
+        first = await browser.get_screenshot(dedup=True)
+        assert await browser.get_screenshot(dedup=True) is first
+        assert page.screenshots == 1
+
+        await browser.get_screenshot()
+        assert page.screenshots == 2
+
+    asyncio.run(run())
+
+
+def test_screenshot_retaken_after_interaction():
+    async def run():
+        page = FakePage()
+        browser = _browser(page)
+        first = await browser.get_screenshot(dedup=True)
+        browser.invalidate_page_caches()
+        second = await browser.get_screenshot(dedup=True)
+        assert second is not first
+        assert page.screenshots == 2
+
+    asyncio.run(run())
+
+
+class FakeBrowserSession:
+    def __init__(self):
+        self.snapshots = 0
+
+    async def get_browser_state_summary(self, **kwargs):
+        self.snapshots += 1
+        return SimpleNamespace(index=self.snapshots)
+
+
+def test_dom_snapshot_cached_until_interaction():
+    async def run():
+        browser = _browser(FakePage())
+        session = FakeBrowserSession()
+        browser.backend_agent = SimpleNamespace(browser_session=session)
+
+        first = await browser.get_browser_state_summary()
+        assert await browser.get_browser_state_summary() is first
+
+        browser.invalidate_page_caches()
+        second = await browser.get_browser_state_summary()
+        assert second is not first
+        assert await browser.get_browser_state_summary() is second
+        assert (await browser.get_browser_state_summary(use_cache=False)).index == 3
+
+    asyncio.run(run())
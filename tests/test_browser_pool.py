@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from optexity.inference.infra import browser_pool
+from optexity.inference.infra.browser_pool import BrowserPool
+
+
+class FakeBrowser:
+    def __init__(self, channel, unique_child_arn, port, **kwargs):
+        self.unique_child_arn = unique_child_arn
+        self.port = port
+        self.stopped = False
+
+    async def start(self):
+        pass
+
+    async def stop(self, graceful: bool = False):
+        self.stopped = True
+
+    async def check_browser_alive(self) -> bool:
+        return not self.stopped
+
+
+@pytest.fixture(autouse=True)
+def fake_browsers(monkeypatch):
+    monkeypatch.setattr(browser_pool, "ActualBrowser", FakeBrowser)
+    monkeypatch.setattr(BrowserPool, "_memory_exceeded", lambda self: False)
+
+
+async def _refilled(pool: BrowserPool):
+    pool.schedule_refill()
+    await pool._refill_task
+
+
+def test_refill_uses_free_ports():
+    async def run():
+        pool = BrowserPool("arn-1", size=2, get_ports=lambda: [9300, 9301, 9302])
+        await _refilled(pool)
+        assert [b.port for b in pool.warm_browsers] == [9300, 9301]
+
+        leased = await pool.acquire("chromium")
+        await _refilled(pool)
+        assert leased.port == 9300
+        assert [b.port for b in pool.warm_browsers] == [9301, 9302]
+
+    asyncio.run(run())
+
+
+def test_acquire_other_channel_cold_starts():
+    async def run():
+        pool = BrowserPool("arn-1", size=1, get_ports=lambda: [9300])
+        await _refilled(pool)
+        assert await pool.acquire("chrome") is None
+        assert len(pool.warm_browsers) == 1
+
+    asyncio.run(run())
+
+
+def test_reset_relaunches_on_new_ports():
+    async def run():
+        ports = [9300, 9301]
+        pool = BrowserPool("arn-1", size=2, get_ports=lambda: ports)
+        await _refilled(pool)
+        old = list(pool.warm_browsers)
+
+        ports = [9400, 9401]
+        await pool.reset("arn-2")
+        await pool._refill_task
+
+        assert all(b.stopped for b in old)
+        assert [b.port for b in pool.warm_browsers] == [9400, 9401]
+        assert {b.unique_child_arn for b in pool.warm_browsers} == {"arn-2"}
+        await pool.close()
+        assert not pool.warm_browsers
+
+    asyncio.run(run())
@@ -0,0 +1,159 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from optexity.inference import child_process
+from optexity.inference.core.logging import delete_download_staging
+from optexity.schema.task import Task
+
+
+def _task(save_directory) -> Task:
+    return Task.model_validate(
+        {
+            "task_id": "t1",
+            "user_id": "u",
+            "recording_id": "r",
+            "endpoint_name": "e",
+            "automation": {
+                "url": "https://example.com",
+                "parameters": {"input_parameters": {}, "generated_parameters": {}},
+                "nodes": [],
+            },
+            "input_parameters": {},
+            "secure_parameters": {},
+            "unique_parameter_names": [],
+            "created_at": datetime.now(timezone.utc),
+            "status": "queued",
+            "api_key": "key",
+            "company_id": "c",
+            "save_directory": save_directory,
+        }
+    )
+
+
+def test_download_staging_directory_is_outside_the_task_directory(tmp_path):
+    task = _task(tmp_path)
+    staging = task.download_staging_directory(9222)
+
+    assert staging == tmp_path / ".download_staging" / "t1_9222"
+    assert staging.parent.parent == task.task_directory.parent
+    assert task.task_directory not in staging.parents
+
+    (staging / "sub").mkdir(parents=True)
+    (staging / "sub" / "partial.crdownload").write_bytes(b"x")
+    task.downloads_directory.mkdir(parents=True, exist_ok=True)
+    asyncio.run(delete_download_staging(task, 9222))
+
+    assert not staging.exists()
+    assert task.downloads_directory.exists()
+    # Already gone is fine.
+    asyncio.run(delete_download_staging(task, 9222))
+
+
+def test_killed_task_staging_directory_is_removed(tmp_path, monkeypatch):
+    task = _task(tmp_path)
+    task.logs_directory.mkdir(parents=True, exist_ok=True)
+    staging = task.download_staging_directory(9300)
+    staging.mkdir(parents=True)
+    (staging / "partial.crdownload").write_bytes(b"x")
+
+    class HungWorker:
+        waits = 0
+
+        async def submit(self, *args):
+            return 4321
+
+        async def wait(self):
+            self.waits += 1
+            if self.waits == 1:
+                raise asyncio.TimeoutError
+            return -9
+
+    async def noop(*args, **kwargs):
+        return None
+
+    killed = []
+    monkeypatch.setattr(child_process.settings, "USE_PERSISTENT_WORKER", True)
+    monkeypatch.setattr(child_process, "setup_browser", noop)
+    monkeypatch.setattr(child_process, "complete_task_in_server", noop)
+    monkeypatch.setattr(child_process, "save_trajectory_in_server", noop)
+    monkeypatch.setattr(child_process, "log_system_info", lambda comment: None)
+    monkeypatch.setattr(child_process.os, "killpg", lambda *args: killed.append(args))
+    slot = SimpleNamespace(
+        actual_browser=SimpleNamespace(port=9300), worker=HungWorker()
+    )
+    task.is_dedicated = True
+
+    returncode = asyncio.run(
+        child_process.run_automation_in_process(task, slot, "arn", 0)
+    )
+
+    assert returncode == -1
+    assert task.status == "killed"
+    assert killed and killed[0][0] == 4321
+    assert not staging.exists()
+
+
+def _layout(monkeypatch, child_id: int, slots: int, pool_size: int):
+    monkeypatch.setattr(child_process.settings, "BROWSER_DEBUG_PORT_OFFSET", 9222)
+    monkeypatch.setattr(child_process, "child_process_id", child_id)
+    monkeypatch.setattr(child_process, "max_concurrent_tasks", slots)
+    monkeypatch.setattr(child_process, "browser_pool_size", pool_size)
+    slot_ports = [child_process.TaskSlot(i).debug_port for i in range(slots)]
+    return slot_ports, child_process.browser_pool_ports()
+
+
+def test_slot_and_pool_ports_do_not_overlap(monkeypatch):
+    assert _layout(monkeypatch, 0, 1, 0) == ([9222], [])
+    assert _layout(monkeypatch, 1, 2, 0) == ([9224, 9225], [])
+
+    # Each slot may hold a pooled browser while the pool launches its
+    # replacement, so the pool gets one port per warm browser and per slot.
+    slot_ports, pool_ports = _layout(monkeypatch, 1, 2, 3)
+    assert child_process.ports_per_child() == 7
+    assert slot_ports == [9229, 9230]
+    assert pool_ports == [9231, 9232, 9233, 9234, 9235]
+
+    used = set()
+    for child_id in range(3):
+        slot_ports, pool_ports = _layout(monkeypatch, child_id, 2, 3)
+        ports = slot_ports + pool_ports
+        assert len(set(ports)) == len(ports) and used.isdisjoint(ports)
+        used.update(ports)
+
+
+def test_admission_waits_for_memory_while_other_slots_run(monkeypatch):
+    slots = [child_process.TaskSlot(0), child_process.TaskSlot(1)]
+    monkeypatch.setattr(child_process, "task_slots", slots)
+    monkeypatch.setattr(
+        child_process.settings, "TASK_ADMISSION_MAX_MEMORY_FRACTION", 0.6
+    )
+    fractions = [0.9, 0.7, 0.5]
+    monkeypatch.setattr(child_process, "memory_used_fraction", lambda: fractions[0])
+    waits = []
+
+    async def sleep(seconds):
+        waits.append(seconds)
+        fractions.pop(0)
+
+    monkeypatch.setattr(child_process.asyncio, "sleep", sleep)
+
+    # Alone, a slot is admitted whatever the memory use.
+    asyncio.run(child_process.wait_for_admission(slots[1]))
+    assert waits == []
+
+    slots[0].task_running = True
+    asyncio.run(child_process.wait_for_admission(slots[1]))
+    assert waits == [5, 5]
+    assert fractions == [0.5]
+
+    # Admitted once the other slot is done, even with memory still high.
+    fractions[:] = [0.9]
+
+    async def finish_other_slot(seconds):
+        waits.append(seconds)
+        slots[0].task_running = False
+
+    monkeypatch.setattr(child_process.asyncio, "sleep", finish_other_slot)
+    asyncio.run(child_process.wait_for_admission(slots[1]))
+    assert waits == [5, 5, 5]
@@ -0,0 +1,100 @@
+import pytest
+
+from optexity.schema.condition import MAX_REPEAT_LENGTH, Condition, ConditionError
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        ("len(rows) > 1 and rows[0] == 'a'", True),
+        ("{rows[0]} == 'a'", True),
+        ("rows[-1].upper() in ['B', 'C']", True),
+        ("count + 1 if count else 0", 3),
+        ("sum([count, 2]) * 2", 8),
+        ("rows[0:1] == ['a']", True),
+        ("'x'.replace('x', 'y') * 2", "yy"),
+        ("sorted(rows, reverse=True)[0]", "b"),
+        ("1 < count <= 2", True),
+    ],
+)
+def test_evaluate(source, expected):
+    condition = Condition(source)
+
+    assert condition.evaluate({"rows": ["a", "b"], "count": 2}) == expected
+
+
+def test_names_exclude_called_functions():
+    condition = Condition("len(rows) > limit")
+
+    assert condition.names == {"rows", "limit"}
+    with pytest.raises(NameError):
+        condition({"rows": []})
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "__import__('os')",
+        "rows.__class__",
+        "(lambda: 1)()",
+        "[x for x in rows]",
+        "open('/etc/passwd')",
+        "rows.pop()",
+        "len(*rows)",
+        "a := 1",
+        "1 +",
+    ],
+)
+def test_disallowed_syntax_is_rejected_at_compile_time(source):
+    with pytest.raises(ConditionError):
+        Condition(source)
+
+
+def test_methods_only_run_on_plain_containers():
+    with pytest.raises(ConditionError):
+        Condition("value.count(1)")({"value": object()})
+
+
+def test_repetition_is_bounded():
+    assert len(Condition("'a' * n").evaluate({"n": MAX_REPEAT_LENGTH})) == (
+        MAX_REPEAT_LENGTH
+    )
+    with pytest.raises(ConditionError):
+        Condition("'a' * n")({"n": MAX_REPEAT_LENGTH + 1})
+    with pytest.raises(ConditionError):
+        Condition("n * [0]")({"n": MAX_REPEAT_LENGTH + 1})
+    # Repeating a list of long strings counts the characters of its items.
+    with pytest.raises(ConditionError):
+        Condition("len(str(['x' * 99999] * 100000)) > 0")({})
+
+
+def test_str_and_sum_of_containers_are_bounded():
+    assert Condition("str([1, 'a'])").evaluate({}) == "[1, 'a']"
+    assert Condition("len(sum([[0] * 100] * 100, []))").evaluate({}) == 10_000
+    assert Condition("sum([1, 2.5])").evaluate({}) == 3.5
+    rows = [["x" * 40_000]] * 3
+    with pytest.raises(ConditionError):
+        Condition("len(str(rows)) > 0")({"rows": rows})
+    with pytest.raises(ConditionError):
+        Condition("len(sum(rows, [])) > 0")({"rows": rows})
+
+
+def test_replace_is_bounded():
+    text = "a" * 1000
+
+    assert Condition("text.replace('a', 'bb', 10)").evaluate({"text": text}) == (
+        "bb" * 10 + "a" * 990
+    )
+    with pytest.raises(ConditionError):
+        Condition("text.replace('', text)")({"text": text})
+    with pytest.raises(ConditionError):
+        Condition(
+            "text.replace('a', 'aaaaaaaaaa').replace('a', 'aaaaaaaaaa')"
+            ".replace('a', 'aaaaaaaaaa')"
+        )({"text": text})
+
+
+def test_string_formatting_is_rejected():
+    with pytest.raises(ConditionError):
+        Condition("'%999999999d' % 1")({})
+    assert Condition("7 % 3").evaluate({}) == 1
@@ -0,0 +1,103 @@
+import asyncio
+import io
+
+import httpx
+import pytest
+
+from optexity.inference.infra import control_plane
+from optexity.inference.infra.control_plane import ControlPlaneClient
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+
+    monkeypatch.setattr(control_plane.asyncio, "sleep", sleep)
+    monkeypatch.setattr(control_plane.settings, "CONTROL_PLANE_INITIAL_BACKOFF", 0.5)
+    return delays
+
+
+def _client(responses: list) -> tuple[ControlPlaneClient, list[httpx.Request]]:
+    """A client whose server answers with `responses` in order; exceptions in
+    the list are raised instead."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        request.read()
+        requests.append(request)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return httpx.Response(response)
+
+    client = ControlPlaneClient(
+        base_url="http://control-plane",
+        transport=httpx.MockTransport(handler),
+        max_retries=2,
+    )
+    return client, requests
+
+
+def _run(client: ControlPlaneClient, *args, **kwargs):
+    async def main():
+        try:
+            return await client.post(*args, **kwargs)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+def test_idempotent_requests_retry_gateway_errors_with_backoff(delays):
+    client, requests = _client([503, 502, 200])
+
+    response = _run(client, "api/v1/get_callback_data", json={}, idempotent=True)
+
+    assert response.status_code == 200
+    assert len(requests) == 3
+    assert delays == [0.5, 1.0]
+    summary = client.metrics_summary()["/api/v1/get_callback_data"]
+    assert (summary["count"], summary["errors"], summary["retries"]) == (1, 0, 2)
+    assert summary["last_status"] == 200
+
+
+def test_retries_stop_at_max_retries(delays):
+    client, requests = _client([503, 503, 503])
+
+    response = _run(client, "api/v1/get_callback_data", idempotent=True)
+
+    assert response.status_code == 503
+    assert len(requests) == 3
+    assert client.metrics["/api/v1/get_callback_data"].errors == 1
+
+
+def test_non_idempotent_posts_are_not_retried_once_sent(delays):
+    client, requests = _client([502])
+    assert _run(client, "api/v1/complete_task", json={}).status_code == 502
+    assert len(requests) == 1
+
+    client, requests = _client([httpx.RemoteProtocolError("dropped")])
+    with pytest.raises(httpx.RemoteProtocolError):
+        _run(client, "api/v1/complete_task", json={})
+    assert len(requests) == 1
+    assert client.metrics["/api/v1/complete_task"].last_status is None
+    assert delays == []
+
+
+def test_connection_errors_are_retried_and_files_resent(delays):
+    client, requests = _client([httpx.ConnectError("refused"), 200])
+    upload = io.BytesIO(b"archive")
+
+    response = _run(
+        client,
+        "api/v1/save_trajectory",
+        files={"compressed_trajectory": ("t.tar.gz", upload, "application/gzip")},
+    )
+
+    assert response.status_code == 200
+    assert len(requests) == 2
+    assert b"archive" in requests[1].content
+    assert delays == [0.5]
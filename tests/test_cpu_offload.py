@@ -0,0 +1,65 @@
+import asyncio
+import os
+import threading
+
+import httpx
+import pytest
+
+from optexity.inference.infra import cpu_offload
+from optexity.inference.infra.cpu_offload import (
+    encode_json,
+    run_cpu,
+    shutdown_cpu_executor,
+    start_cpu_executor,
+)
+
+
+def _exit_if_worker(parent_pid: int) -> str:
+    if os.getpid() != parent_pid:
+        os._exit(1)
+    return "thread"
+
+
+@pytest.fixture(autouse=True)
+def no_executor():
+    shutdown_cpu_executor()
+    yield
+    shutdown_cpu_executor()
+
+
+def test_run_cpu_uses_threads_without_a_pool():
+    assert start_cpu_executor(0) is None
+
+    async def main():
+        return await run_cpu(threading.get_ident)
+
+    assert asyncio.run(main()) != threading.get_ident()
+
+
+def test_run_cpu_uses_the_pool_once_started():
+    executor = start_cpu_executor(1)
+    assert start_cpu_executor(1) is executor
+
+    async def main():
+        return await run_cpu(os.getpid)
+
+    assert asyncio.run(main()) != os.getpid()
+
+
+def test_broken_pool_falls_back_to_threads():
+    start_cpu_executor(1)
+
+    async def main():
+        first = await run_cpu(_exit_if_worker, os.getpid())
+        second = await run_cpu(_exit_if_worker, os.getpid())
+        return first, second
+
+    assert asyncio.run(main()) == ("thread", "thread")
+    assert cpu_offload._executor is None
+
+
+def test_encode_json_matches_httpx():
+    body = {"a": "é", "b": [1, 2.5, None]}
+    request = httpx.Request("POST", "http://x", json={**body, "img": "AAE="})
+
+    assert encode_json(body, {"img": b"\x00\x01"}) == request.read()
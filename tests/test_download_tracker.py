@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+from optexity.inference.infra.download_tracker import (
+    DownloadTracker,
+    available_path,
+    move_download,
+)
+
+
+class FakeCDPSession:
+    def __init__(self):
+        self.handlers = {}
+        self.sent = []
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def send(self, method, params):
+        self.sent.append((method, params))
+
+    def emit(self, event, params):
+        self.handlers[event](params)
+
+
+def _begin(session, guid, frame_id=None, filename="report.pdf"):
+    session.emit(
+        "Browser.downloadWillBegin",
+        {
+            "guid": guid,
+            "url": f"https://example.com/{filename}",
+            "suggestedFilename": filename,
+            "frameId": frame_id,
+        },
+    )
+
+
+def _progress(session, guid, state="inProgress", received=0):
+    session.emit(
+        "Browser.downloadProgress",
+        {"guid": guid, "state": state, "receivedBytes": received, "totalBytes": 10},
+    )
+
+
+async def _attached(tmp_path):
+    tracker = DownloadTracker(str(tmp_path))
+    session = FakeCDPSession()
+    await tracker.attach(session)
+    return tracker, session
+
+
+def test_attach_routes_downloads_into_the_directory(tmp_path):
+    async def main():
+        return await _attached(tmp_path)
+
+    _, session = asyncio.run(main())
+
+    assert session.sent == [
+        (
+            "Browser.setDownloadBehavior",
+            {
+                "behavior": "allowAndName",
+                "downloadPath": str(tmp_path),
+                "eventsEnabled": True,
+            },
+        )
+    ]
+
+
+def test_expected_download_completes(tmp_path):
+    async def main():
+        tracker, session = await _attached(tmp_path)
+        async with tracker.expect() as expectation:
+            _begin(session, "g1")
+            _progress(session, "g1", received=5)
+            assert [d.guid for d in tracker.in_progress()] == ["g1"]
+            _progress(session, "g1", state="completed", received=10)
+            download = await expectation.wait(begin_timeout=1, stall_timeout=1)
+        return tracker, download
+
+    tracker, download = asyncio.run(main())
+
+    assert download.claimed and download.state == "completed"
+    assert download.path == tmp_path / "g1"
+    assert download.received_bytes == 10
+    assert tracker.in_progress() == []
+
+
+def test_downloads_go_to_the_expectation_of_their_tab(tmp_path):
+    async def main():
+        tracker, session = await _attached(tmp_path)
+        async with tracker.expect("lane") as lane, tracker.expect() as main_browser:
+            _begin(session, "from_main", frame_id="main")
+            _begin(session, "from_lane", frame_id="lane")
+            _begin(session, "unexpected")
+            return (
+                lane.started.result().guid,
+                main_browser.started.result().guid,
+                tracker.downloads["unexpected"].claimed,
+            )
+
+    assert asyncio.run(main()) == ("from_lane", "from_main", False)
+
+
+def test_stalled_download_times_out(tmp_path):
+    async def main():
+        tracker, session = await _attached(tmp_path)
+        async with tracker.expect() as expectation:
+            _begin(session, "g1")
+            with pytest.raises(asyncio.TimeoutError):
+                await expectation.wait(begin_timeout=1, stall_timeout=0.05)
+        assert not await tracker.wait_idle(0.01)
+        tracker.close()
+        assert await tracker.wait_idle(0.01)
+
+    asyncio.run(main())
+
+
+def test_expectation_without_download_times_out_and_is_removed(tmp_path):
+    async def main():
+        tracker, _ = await _attached(tmp_path)
+        async with tracker.expect() as expectation:
+            with pytest.raises(asyncio.TimeoutError):
+                await expectation.wait(begin_timeout=0.01)
+        assert tracker._expectations == []
+        assert expectation.started.cancelled()
+
+    asyncio.run(main())
+
+
+def test_available_path_numbers_taken_names(tmp_path):
+    assert available_path(tmp_path, "a.pdf") == tmp_path / "a.pdf"
+    (tmp_path / "a.pdf").touch()
+    (tmp_path / "a (1).pdf").touch()
+
+    assert available_path(tmp_path, "a.pdf") == tmp_path / "a (2).pdf"
+
+
+def test_move_download(tmp_path):
+    src = tmp_path / "guid"
+    src.write_bytes(b"pdf")
+    dest = tmp_path / "out" / "a.pdf"
+    dest.parent.mkdir()
+
+    move_download(src, dest)
+
+    assert dest.read_bytes() == b"pdf" and not src.exists()
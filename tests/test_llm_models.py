@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+from optexity.inference import models
+from optexity.inference.models import (
+    GeminiModels,
+    gemini,
+    get_llm_model,
+    reset_llm_connections,
+)
+
+
+class FakeClient:
+    instances = []
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self.list_calls = 0
+        self.models = SimpleNamespace(list=self._list)
+        FakeClient.instances.append(self)
+
+    def _list(self):
+        self.list_calls += 1
+
+
+def test_reset_llm_connections_replaces_clients_without_network(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "key")
+    monkeypatch.setattr(gemini.genai, "Client", FakeClient)
+    monkeypatch.setattr(models, "_model_cache", {})
+    FakeClient.instances.clear()
+
+    model = get_llm_model(GeminiModels.GEMINI_2_5_FLASH, True)
+    parent_client = model.client
+    reset_llm_connections()
+
+    assert get_llm_model(GeminiModels.GEMINI_2_5_FLASH, True) is model
+    assert model.client is not parent_client
+    assert model.client.api_key == "key"
+    # Only building the model checks the key over the network.
+    assert [client.list_calls for client in FakeClient.instances] == [1, 0]
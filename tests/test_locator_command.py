@@ -0,0 +1,74 @@
+import re
+
+import pytest
+
+from optexity.inference.infra.locator_command import (
+    LocatorCommand,
+    LocatorCommandError,
+    compile_locator_command,
+)
+
+
+class FakeLocator:
+    """Records the chain of locator calls and properties it was built from."""
+
+    def __init__(self, chain: tuple = ()):
+        self.chain = chain
+
+    def __getattr__(self, name: str):
+        if name in {"first", "last", "owner", "content_frame"}:
+            return FakeLocator((*self.chain, name))
+
+        def method(*args, **kwargs):
+            return FakeLocator((*self.chain, (name, args, kwargs)))
+
+        return method
+
+
+def test_build_replays_the_chain():
+    command = LocatorCommand(
+        'get_by_role("button", name="Submit", exact=True).nth(1).first'
+    )
+
+    assert command.build(FakeLocator()).chain == (
+        ("get_by_role", ("button",), {"name": "Submit", "exact": True}),
+        ("nth", (1,), {}),
+        "first",
+    )
+
+
+def test_regex_and_nested_page_arguments():
+    command = LocatorCommand(
+        'locator("li").filter(has_text=re.compile("total", re.I | re.M), '
+        'has=page.get_by_text("x"))'
+    )
+
+    _, (name, _, kwargs) = command.build(FakeLocator()).chain
+    assert name == "filter"
+    assert kwargs["has_text"] == re.compile("total", re.IGNORECASE | re.MULTILINE)
+    assert kwargs["has"].chain == (("get_by_text", ("x",), {}),)
+
+
+def test_commands_are_compiled_once():
+    command = 'get_by_text("once")'
+
+    assert compile_locator_command(command) is compile_locator_command(command)
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        'get_by_role("button"',
+        'evaluate("alert(1)")',
+        "context.browser",
+        'locator(__import__("os").getcwd())',
+        "get_by_text(**kwargs)",
+        'get_by_text(re.compile("("))',
+        'get_by_text(re.compile("a", re.X))',
+        "get_by_text(name)",
+        '__class__("x")',
+    ],
+)
+def test_unsafe_or_invalid_commands_are_rejected(command):
+    with pytest.raises(LocatorCommandError):
+        LocatorCommand(command)
@@ -0,0 +1,99 @@
+import itertools
+
+import pytest
+from pydantic import ValidationError
+
+from optexity.schema.memory import BrowserState, Memory, SystemInfo
+
+
+@pytest.fixture
+def readings(monkeypatch):
+    """Memory readings of 1, 2, 3, ... MB used, counting cgroup reads."""
+    counter = itertools.count(1)
+    reads = []
+
+    def get_effective_memory_mb():
+        reads.append(1)
+        return float(next(counter)), 1000.0
+
+    monkeypatch.setattr(
+        SystemInfo, "get_effective_memory_mb", staticmethod(get_effective_memory_mb)
+    )
+    return reads
+
+
+def _memory(**kwargs) -> Memory:
+    return Memory(unique_child_arn="test", **kwargs)
+
+
+def test_system_info_downsampled_within_bound(readings):
+    memory = _memory(max_system_info_samples=10, system_info_min_interval=0)
+    for _ in range(1000):
+        memory.update_system_info()
+
+    samples = memory.system_info_tracking
+    assert len(samples) <= 10
+    assert sum(sample.sample_count for sample in samples) == 1000
+    assert (
+        min(
+            s.total_system_memory_used_min or s.total_system_memory_used
+            for s in samples
+        )
+        == 1
+    )
+    assert (
+        max(
+            s.total_system_memory_used_max or s.total_system_memory_used
+            for s in samples
+        )
+        == 1000
+    )
+    # Averages are weighted by sample count.
+    total = sum(s.total_system_memory_used * s.sample_count for s in samples)
+    assert total == pytest.approx(sum(range(1, 1001)))
+
+
+def test_smallest_system_info_bound_terminates(readings):
+    memory = _memory(max_system_info_samples=2, system_info_min_interval=0)
+    for _ in range(50):
+        memory.update_system_info()
+    assert len(memory.system_info_tracking) <= 2
+    assert sum(s.sample_count for s in memory.system_info_tracking) == 50
+
+
+def test_bounds_must_leave_room_for_samples():
+    with pytest.raises(ValidationError):
+        _memory(max_system_info_samples=1)
+    with pytest.raises(ValidationError):
+        _memory(max_system_info_samples=0)
+    with pytest.raises(ValidationError):
+        _memory(max_browser_states=0)
+
+
+def test_update_system_info_is_rate_limited(readings):
+    memory = _memory(system_info_min_interval=60)
+    first = memory.update_system_info()
+    assert memory.update_system_info() is first
+    assert len(readings) == 1
+    assert len(memory.system_info_tracking) == 1
+
+
+def test_browser_state_does_not_read_system_info(readings):
+    state = BrowserState(url="https://example.com")
+    assert state.system_info is None
+    assert readings == []
+
+    memory = _memory(system_info_min_interval=60)
+    latest = memory.update_system_info()
+    for _ in range(3):
+        memory.add_browser_state(
+            BrowserState(url="https://example.com", system_info=latest)
+        )
+    assert len(readings) == 1
+
+
+def test_browser_states_bounded():
+    memory = _memory(max_browser_states=3)
+    for i in range(10):
+        memory.add_browser_state(BrowserState(url=f"https://example.com/{i}"))
+    assert [s.url[-1] for s in memory.browser_states] == ["7", "8", "9"]
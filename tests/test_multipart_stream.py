@@ -0,0 +1,80 @@
+import asyncio
+import io
+import tarfile
+from email.parser import BytesParser
+from email.policy import HTTP
+
+from optexity.inference.infra.multipart_stream import MultipartStream, tar_gz_stream
+
+
+async def _collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+def _parse(body: MultipartStream, content: bytes) -> list:
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {body.content_type}\r\n\r\n".encode() + content
+    )
+    return [
+        (
+            part.get_param("name", header="content-disposition"),
+            part.get_filename(),
+            part.get_content_type(),
+            part.get_payload(decode=True),
+        )
+        for part in message.iter_parts()
+    ]
+
+
+def test_multipart_body_parts():
+    async def chunks():
+        yield b"first,"
+        yield b"second"
+
+    body = MultipartStream(
+        {"task_id": "t1", "note": 'a "b"'},
+        [
+            ("file", ("data.bin", b"\x00\r\n--raw", "application/octet-stream")),
+            ("stream", ('log "1".txt', chunks, "text/plain")),
+        ],
+    )
+    content = asyncio.run(_collect(body))
+
+    assert _parse(body, content) == [
+        ("task_id", None, "text/plain", b"t1"),
+        ("note", None, "text/plain", b'a "b"'),
+        ("file", "data.bin", "application/octet-stream", b"\x00\r\n--raw"),
+        ("stream", "log %221%22.txt", "text/plain", b"first,second"),
+    ]
+    # Iterating again restarts the streams, as a retried request does.
+    assert asyncio.run(_collect(body)) == content
+
+
+def test_tar_gz_stream_round_trip(tmp_path):
+    directory = tmp_path / "trajectory"
+    (directory / "step_1").mkdir(parents=True)
+    (directory / "step_1" / "state.json").write_text("{}")
+    (directory / "big.bin").write_bytes(bytes(range(256)) * 4096)
+
+    content = asyncio.run(_collect(tar_gz_stream(directory, "task", compresslevel=1)))
+
+    with tarfile.open(fileobj=io.BytesIO(content), mode="r:gz") as tar:
+        assert sorted(tar.getnames()) == [
+            "task",
+            "task/big.bin",
+            "task/step_1",
+            "task/step_1/state.json",
+        ]
+        assert tar.extractfile("task/big.bin").read() == bytes(range(256)) * 4096
+
+
+def test_tar_gz_stream_can_be_abandoned(tmp_path):
+    (tmp_path / "big.bin").write_bytes(bytes(range(256)) * 8192)
+
+    async def main():
+        stream = tar_gz_stream(tmp_path, "task", compresslevel=0)
+        first = await anext(stream)
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(main())
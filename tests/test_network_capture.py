@@ -0,0 +1,121 @@
+from optexity.inference.infra.network_capture import NetworkCapture, parse_body
+from optexity.schema.memory import NetworkRequest, NetworkResponse
+
+
+def _response(url: str, method: str = "GET") -> NetworkResponse:
+    return NetworkResponse(
+        url=url, status=200, headers={}, method=method, content_length=0
+    )
+
+
+def _request(url: str, method: str = "POST") -> NetworkRequest:
+    return NetworkRequest(url=url, method=method, headers={}, body=None)
+
+
+def test_matches_url():
+    assert NetworkCapture().matches_url("https://example.com/a")
+    assert not NetworkCapture(url_patterns=[]).enabled
+
+    capture = NetworkCapture(
+        url_patterns=[
+            ("/api/orders", "substring"),
+            ("https://*.example.com/v?/*", "glob"),
+            (r"/items/\d+$", "regex"),
+        ]
+    )
+    assert capture.matches_url("https://shop.com/api/orders?page=2")
+    assert capture.matches_url("https://cdn.example.com/v2/data")
+    assert capture.matches_url("https://shop.com/items/42")
+    assert not capture.matches_url("https://shop.com/items/42/reviews")
+
+
+def test_wants_body():
+    capture = NetworkCapture(max_body_bytes=100)
+    assert capture.wants_body({"content-type": "application/json"})
+    assert not capture.wants_body({"content-type": "image/png"})
+    assert not capture.wants_body({"content-type": "text/javascript"})
+    assert not capture.wants_body(
+        {"content-type": "application/json", "content-length": "101"}
+    )
+    assert capture.wants_body({"content-length": "not a number"})
+
+    pdf_only = NetworkCapture(content_types=["application/pdf"])
+    assert pdf_only.wants_body({"content-type": "application/pdf"})
+    assert not pdf_only.wants_body({"content-type": "application/json"})
+
+
+def test_find_by_declared_pattern_host_and_scan():
+    capture = NetworkCapture(url_patterns=[("/api/", "substring")])
+    capture.append(_request("https://a.com/api/orders"), 0)
+    capture.append(_response("https://a.com/api/orders"), 0)
+    capture.append(_response("https://b.com/api/orders"), 0)
+
+    assert len(capture.find("/api/")) == 3
+    assert [c.url for c in capture.find("https://b.com/api")] == [
+        "https://b.com/api/orders"
+    ]
+    assert capture.find("https://c.com/api") == []
+    assert len(capture.find("orders", kind="response")) == 2
+    assert len(capture.find(method="post")) == 1
+    assert len(capture.find(r"a\.com/api/orders$", pattern_type="regex")) == 2
+
+
+def test_oldest_calls_dropped_over_max_bytes():
+    # Each call takes its 19 byte URL plus 40 bytes of body.
+    capture = NetworkCapture(url_patterns=[("/api/", "substring")], max_bytes=130)
+    for i in range(4):
+        capture.append(_response(f"https://a.com/api/{i}"), 40)
+
+    assert len(capture) == 2
+    assert [c.url for c in capture.find("/api/")] == [
+        "https://a.com/api/2",
+        "https://a.com/api/3",
+    ]
+
+    # A single call larger than the limit is still kept.
+    capture.append(_response("https://a.com/api/big"), 1000)
+    assert [c.url for c in capture] == ["https://a.com/api/big"]
+
+
+def test_headers_count_towards_max_bytes():
+    capture = NetworkCapture(max_bytes=1000)
+    for i in range(3):
+        capture.append(
+            NetworkRequest(
+                url=f"https://a.com/{i}",
+                method="GET",
+                headers={"cookie": "x" * 400},
+                body=None,
+            ),
+            0,
+        )
+
+    assert [c.url for c in capture] == ["https://a.com/1", "https://a.com/2"]
+
+
+def test_oldest_calls_dropped_over_max_calls_and_unindexed():
+    capture = NetworkCapture(url_patterns=[("/api/", "substring")], max_calls=2)
+    capture.append(_response("https://old.com/api/0"), 0)
+    for i in range(1, 5):
+        capture.append(_response(f"https://a.com/api/{i}"), 0)
+
+    assert [c.url for c in capture] == ["https://a.com/api/3", "https://a.com/api/4"]
+    assert list(capture._by_pattern[("/api/", "substring")]) == [3, 4]
+    assert list(capture._by_host) == ["a.com"]
+    assert capture.find("https://old.com/api") == []
+
+
+def test_clear():
+    capture = NetworkCapture()
+    capture.append(_response("https://a.com/x"), 10)
+    capture.clear()
+    assert len(capture) == 0
+    assert capture.find("https://a.com") == []
+    capture.append(_response("https://a.com/y"), 10)
+    assert [c.url for c in capture.find("https://a.com")] == ["https://a.com/y"]
+
+
+def test_parse_body():
+    assert parse_body(b'{"a": 1}') == {"a": 1}
+    assert parse_body(b"plain") == "plain"
+    assert parse_body(b"\xff\xfe") is None
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+from optexity.inference.core.run_automation import ForLoopIterationResult
+from optexity.inference.infra.browser import Browser
+from optexity.schema.memory import ForLoopStatus, Memory, OutputData
+
+
+class FakePage:
+    pass
+
+
+class ServiceWorkerRequest:
+    @property
+    def frame(self):
+        raise RuntimeError("Service Worker requests do not have an associated frame")
+
+
+def _event(page: FakePage) -> SimpleNamespace:
+    return SimpleNamespace(frame=SimpleNamespace(page=page))
+
+
+def test_context_handlers_skip_lane_tabs():
+    browser = Browser(memory=Memory(unique_child_arn="test"))
+    main_page, lane_page = FakePage(), FakePage()
+    browser._lane_pages.add(lane_page)
+
+    seen = []
+    handler = browser._skip_lanes(seen.append)
+    for event in [_event(main_page), _event(lane_page), ServiceWorkerRequest()]:
+        handler(event)
+
+    assert [type(e) for e in seen] == [SimpleNamespace, ServiceWorkerRequest]
+    assert seen[0].frame.page is main_page
+
+
+def test_fork_starts_lane_from_generated_variables():
+    memory = Memory(
+        unique_child_arn="test",
+        max_browser_states=5,
+        logs_subdirectory="outer",
+    )
+    memory.variables.generated_variables["ids"] = [1, 2]
+    memory.variables.output_data.append(OutputData(text="before loop"))
+
+    lane = memory.fork("for_loop_1_lane_0")
+    lane.variables.generated_variables["ids"].append(3)
+
+    assert lane.logs_subdirectory == "outer/for_loop_1_lane_0"
+    assert lane.max_browser_states == 5
+    assert lane.variables.output_data == []
+    assert memory.variables.generated_variables["ids"] == [1, 2]
+
+
+def test_iteration_result_merges_only_what_the_iteration_added(tmp_path):
+    memory = Memory(unique_child_arn="test")
+    memory.variables.generated_variables["kept"] = "main"
+    lane = memory.fork("lane_0")
+    lane.variables.output_data.append(OutputData(text="earlier iteration"))
+
+    result = ForLoopIterationResult(lane)
+    lane.variables.output_data.append(OutputData(text="this iteration"))
+    lane.variables.for_loop_status.append(
+        [ForLoopStatus(variable_name="x", index=0, value=1, status="success")]
+    )
+    lane.downloads.append(tmp_path / "a.pdf")
+    lane.urls_to_downloads.append(("https://example.com/b.pdf", "b.pdf"))
+    lane.variables.generated_variables["total"] = 10
+    result.finish()
+    result.merge_into(memory)
+
+    assert [o.text for o in memory.variables.output_data] == ["this iteration"]
+    assert len(memory.variables.for_loop_status) == 1
+    assert memory.downloads == [tmp_path / "a.pdf"]
+    assert memory.urls_to_downloads == [("https://example.com/b.pdf", "b.pdf")]
+    assert memory.variables.generated_variables == {"kept": "main", "total": 10}
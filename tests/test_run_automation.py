@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from optexity.inference.core import run_automation
+from optexity.schema.automation import ForLoopNode
+from optexity.schema.memory import BrowserState, Memory
+from optexity.schema.task import Task
+
+
+def _task(save_directory) -> Task:
+    return Task.model_validate(
+        {
+            "task_id": "t1",
+            "user_id": "u",
+            "recording_id": "r",
+            "endpoint_name": "e",
+            "automation": {
+                "url": "https://example.com",
+                "parameters": {
+                    "input_parameters": {"rows": ["a", "b"]},
+                    "secure_parameters": {
+                        "code": [{"totp": {"totp_secret": "JBSWY3DPEHPK3PXP"}}]
+                    },
+                    "generated_parameters": {},
+                },
+                "nodes": [],
+            },
+            "input_parameters": {"rows": ["a", "b"]},
+            "secure_parameters": {
+                "code": [{"totp": {"totp_secret": "JBSWY3DPEHPK3PXP"}}]
+            },
+            "unique_parameter_names": [],
+            "created_at": datetime.now(timezone.utc),
+            "status": "running",
+            "api_key": "key",
+            "company_id": "c",
+            "save_directory": save_directory,
+        }
+    )
+
+
+def test_recorded_automation_holds_rendered_nodes(tmp_path, monkeypatch):
+    ran = []
+
+    async def capture_browser_state(memory, browser, stage):
+        return BrowserState(url="https://example.com")
+
+    async def run_extraction_action(extraction_action, memory, browser, task):
+        ran.append(extraction_action.llm.extraction_instructions)
+
+    async def noop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(run_automation, "capture_browser_state", capture_browser_state)
+    monkeypatch.setattr(run_automation, "run_extraction_action", run_extraction_action)
+    monkeypatch.setattr(run_automation, "save_latest_memory_state_locally", noop)
+
+    loop = ForLoopNode.model_validate(
+        {
+            "type": "for_loop_node",
+            "variable_name": "rows",
+            "nodes": [
+                {
+                    "type": "action_node",
+                    "before_sleep_time": 0,
+                    "extraction_action": {
+                        "llm": {
+                            "extraction_format": {"total": "str"},
+                            "extraction_instructions": (
+                                "Row {index_of(rows)}: {rows[index]} with {code[0]}"
+                            ),
+                        }
+                    },
+                }
+            ],
+        }
+    )
+    task = _task(tmp_path)
+    memory = Memory(unique_child_arn="test")
+    browser = SimpleNamespace(handle_new_tabs=noop)
+    full_automation = []
+
+    asyncio.run(
+        run_automation.handle_for_loop_node(
+            loop, memory, task, browser, full_automation
+        )
+    )
+
+    recorded = [
+        node["extraction_action"]["llm"]["extraction_instructions"]
+        for node in full_automation
+    ]
+    # Loop values are filled in; secure parameters stay placeholders.
+    assert recorded == ["Row 0: a with {code[0]}", "Row 1: b with {code[0]}"]
+    assert [text[: -len("123456")] for text in ran] == [
+        "Row 0: a with ",
+        "Row 1: b with ",
+    ]
+    assert all(text[-6:].isdigit() for text in ran)
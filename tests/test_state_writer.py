@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+
+from optexity.inference.core import logging as task_logging
+from optexity.inference.core.state_writer import MemoryStateWriter, StepSnapshot
+from optexity.schema.screenshot import Screenshot
+
+
+def test_writes_snapshots_in_background(tmp_path):
+    async def run():
+        writer = MemoryStateWriter()
+        screenshot = Screenshot(b"\x89PNGdata", "png")
+        await writer.submit(
+            StepSnapshot(
+                tmp_path / "step_0",
+                {
+                    "state.json": (lambda: '{"step_index": 0}', None),
+                    "axtree.txt": ("tree", None),
+                    "screenshot.png": (screenshot, screenshot),
+                },
+            )
+        )
+        await writer.flush()
+        return screenshot
+
+    screenshot = asyncio.run(run())
+    step = tmp_path / "step_0"
+    assert (step / "state.json").read_text() == '{"step_index": 0}'
+    assert (step / "axtree.txt").read_text() == "tree"
+    assert (step / "screenshot.png").read_bytes() == b"\x89PNGdata"
+    assert not list(step.glob(".*.tmp"))
+    # The screenshot is now backed by its file.
+    assert screenshot.data == b"\x89PNGdata"
+
+
+def test_unchanged_files_are_hard_linked(tmp_path):
+    async def run():
+        writer = MemoryStateWriter()
+        for step in range(3):
+            await writer.submit(
+                StepSnapshot(
+                    tmp_path / f"step_{step}",
+                    {
+                        "input_parameters.json": ("{}", "{}"),
+                        "state.json": (f"{step}", None),
+                    },
+                )
+            )
+        await writer.flush()
+
+    asyncio.run(run())
+    inputs = [tmp_path / f"step_{step}" / "input_parameters.json" for step in range(3)]
+    assert len({path.stat().st_ino for path in inputs}) == 1
+    states = [tmp_path / f"step_{step}" / "state.json" for step in range(3)]
+    assert len({path.stat().st_ino for path in states}) == 3
+    assert [path.read_text() for path in states] == ["0", "1", "2"]
+
+
+def test_queued_snapshots_of_a_step_are_merged(tmp_path):
+    async def run():
+        writer = MemoryStateWriter()
+        step = tmp_path / "step_0"
+        await writer.submit(StepSnapshot(step, {"a.txt": ("1", None)}))
+        await writer.submit(StepSnapshot(step, {"a.txt": ("2", None)}))
+        await writer.submit(StepSnapshot(step, {"b.txt": ("3", None)}))
+        await writer.flush()
+
+    asyncio.run(run())
+    assert (tmp_path / "step_0" / "a.txt").read_text() == "2"
+    assert (tmp_path / "step_0" / "b.txt").read_text() == "3"
+
+
+def test_write_errors_do_not_stop_the_writer(tmp_path):
+    async def run():
+        writer = MemoryStateWriter()
+
+        def fail():
+            raise RuntimeError("boom")
+
+        await writer.submit(StepSnapshot(tmp_path / "step_0", {"x": (fail, None)}))
+        await writer.submit(StepSnapshot(tmp_path / "step_1", {"x": ("ok", None)}))
+        await writer.flush()
+
+    asyncio.run(run())
+    assert (tmp_path / "step_1" / "x").read_text() == "ok"
+
+
+def test_release_task_logging_drops_task_state(tmp_path):
+    async def run():
+        task = SimpleNamespace(task_id="task-1", task_directory=tmp_path)
+        lane = SimpleNamespace(logs_subdirectory="lane_0")
+        task_logging.get_trajectory_store(task)
+        task_logging.get_state_writer(task, SimpleNamespace(logs_subdirectory=None))
+        task_logging.get_state_writer(task, lane)
+
+        await task_logging.release_task_logging(task)
+
+        assert "task-1" not in task_logging._trajectory_stores
+        assert not [k for k in task_logging._state_writers if k[0] == "task-1"]
+
+    asyncio.run(run())
@@ -0,0 +1,93 @@
+from typing import ClassVar
+
+from optexity.schema.template import ModelTemplate, Template, TemplatedModel
+
+
+class Inner(TemplatedModel):
+    text: str | None = None
+    template_fields: ClassVar[dict[str, bool]] = {"text": False}
+
+
+class Outer(TemplatedModel):
+    command: str | None = None
+    values: list[str] = []
+    inner: Inner | None = None
+    untouched: str = "{name[0]}"
+    template_fields: ClassVar[dict[str, bool]] = {
+        "command": True,
+        "values": True,
+        "inner": False,
+    }
+
+
+def test_template_parses_literals_and_slots():
+    template = Template("Hi {name[0]}, row {index_of(rows)}: {rows[index]}!")
+
+    assert template.parts == [
+        "Hi ",
+        ("value", "name", 0),
+        ", row ",
+        ("index_of", "rows", None),
+        ": ",
+        ("loop_value", "rows", None),
+        "!",
+    ]
+    assert list(template.references({"rows": 2})) == [("name", 0), ("rows", 2)]
+    assert list(template.references({})) == [("name", 0)]
+    assert not Template("{plain} text").has_slots
+
+
+def test_template_render_fills_values_and_keeps_missing_placeholders():
+    template = Template("{name[0]} {rows[index]} {index_of(rows)} {other[1]}")
+
+    assert (
+        template.render({("name", 0): "Ann", ("rows", 3): "r3"}, {"rows": 3})
+        == "Ann r3 3 {other[1]}"
+    )
+    assert (
+        template.render({}, {}) == "{name[0]} {rows[index]} {index_of(rows)} {other[1]}"
+    )
+    # A loop index is filled in even when its value is missing.
+    assert template.render({}, {"rows": 1}) == "{name[0]} {rows[1]} 1 {other[1]}"
+
+
+def test_model_template_renders_copies_and_leaves_model_untouched():
+    model = Outer(
+        command='"{name[0]}"',
+        values=["{rows[index]}", "static"],
+        inner=Inner(text="inner {name[0]}"),
+    )
+    plan = ModelTemplate(model)
+
+    assert list(plan.references({"rows": 0})) == [
+        ("name", 0),
+        ("rows", 0),
+        ("name", 0),
+    ]
+    rendered = plan.render(
+        model, {("name", 0): "Ann", ("rows", 0): "r0"}, {"rows": 0}, True
+    )
+
+    assert rendered.command == "Ann"
+    assert rendered.values == ["r0", "static"]
+    assert rendered.inner.text == "inner Ann"
+    assert rendered.untouched == "{name[0]}"
+    assert model.command == '"{name[0]}"'
+    assert model.inner.text == "inner {name[0]}"
+
+
+def test_model_template_shares_unchanged_models():
+    model = Outer(command="static", inner=Inner(text="no slots"))
+    plan = ModelTemplate(model)
+
+    assert plan.render(model, {}, {}, False) is model
+    # Quote stripping alone is a change.
+    stripped = Outer(command='"quoted"')
+    assert ModelTemplate(stripped).render(stripped, {}, {}, True).command == "quoted"
+
+
+def test_templated_model_replace_strips_only_marked_fields():
+    model = Outer(command='"{x}"', inner=Inner(text='"{x}"')).replace("{x}", "1")
+
+    assert model.command == "1"
+    assert model.inner.text == '"1"'
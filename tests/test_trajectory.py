@@ -0,0 +1,79 @@
+import asyncio
+import io
+import json
+import tarfile
+
+from optexity.inference.core import trajectory
+from optexity.inference.core.trajectory import MANIFEST_FILENAME, TrajectoryStore
+
+
+def _upload(store: TrajectoryStore, delta: bool) -> dict[str, bytes] | None:
+    """Prepare and commit an upload; the archive's files by name."""
+
+    async def prepare():
+        return await store.prepare(delta)
+
+    tar_file, manifest, current = asyncio.run(prepare())
+    if tar_file is None:
+        return None
+    with tar_file, tarfile.open(fileobj=io.BytesIO(tar_file.read())) as tar:
+        files = {m.name: tar.extractfile(m).read() for m in tar.getmembers()}
+    store.commit(manifest, current, delta)
+    return files
+
+
+def _delta_index(directory) -> int:
+    return json.loads((directory / MANIFEST_FILENAME).read_text())["delta_index"]
+
+
+def test_full_uploads_reuse_cached_members(tmp_path, monkeypatch):
+    monkeypatch.setattr(trajectory, "MAX_CACHED_MEMBER_SIZE", 1000)
+    (tmp_path / "step_1").mkdir()
+    (tmp_path / "step_1" / "state.json").write_text("{}")
+    (tmp_path / "big.bin").write_bytes(b"x" * 5000)
+    store = TrajectoryStore(tmp_path, "task")
+
+    assert _upload(store, delta=False) == {
+        "task/big.bin": b"x" * 5000,
+        "task/step_1/state.json": b"{}",
+    }
+    assert _upload(store, delta=False) is None
+
+    (tmp_path / "step_2.json").write_text("[1]")
+    files = _upload(store, delta=False)
+    assert sorted(files) == [
+        "task/big.bin",
+        "task/step_1/state.json",
+        "task/step_2.json",
+    ]
+    assert files["task/step_2.json"] == b"[1]"
+    # Only small files are cached, and not in memory.
+    assert sorted(store._members) == ["step_1/state.json", "step_2.json"]
+    assert _delta_index(tmp_path) == 0
+
+
+def test_delta_uploads_send_changes_and_drop_the_cache(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    store = TrajectoryStore(tmp_path, "task")
+
+    assert _upload(store, delta=True) == {"task/a.txt": b"a"}
+    assert store._members == {} and store._cache is None
+
+    (tmp_path / "b.txt").write_text("b")
+    assert _upload(store, delta=True) == {"task/b.txt": b"b"}
+    assert _upload(store, delta=True) is None
+    assert _delta_index(tmp_path) == 2
+
+
+def test_cache_is_compacted(tmp_path):
+    path = tmp_path / "state.json"
+    store = TrajectoryStore(tmp_path, "task")
+    for i in range(5):
+        path.write_text(str(i) * (100 + i))
+        files = _upload(store, delta=False)
+        assert files == {"task/state.json": str(i).encode() * (100 + i)}
+
+    _, _, length = store._members["state.json"]
+    assert store._cache_size <= 3 * length
+    store.close()
+    assert store._cache is None